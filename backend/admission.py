@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Admission control for the answer routes
+
+Each question holds a processing slot from admission until its pipeline run
+finishes (even if the client already got the timeout fallback), so at most
+max_concurrent questions compete for CPU and memory. Beyond that:
+
+- up to max_queue requests wait for a slot, at most queue_timeout seconds
+- further requests are rejected at once with 503 + Retry-After instead of
+  piling up in the server's accept queue until the worker timeout
+- each client has a token bucket (rate_per_minute, burst); an empty bucket
+  means 429 + Retry-After
+
+Retry-After for 503 is estimated from the recent service time and queue depth.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class AdmissionRejected(Exception):
+    """Request not admitted; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(forwarded_for, remote_addr, trusted_proxies=1):
+    """Rate-limit key: the address our trusted_proxies-th proxy (counted from the right) saw.
+
+    Proxies append to X-Forwarded-For, so everything left of their entries is
+    whatever the caller sent and must not pick the bucket.
+    """
+    hops = [h.strip() for h in (forwarded_for or "").split(",") if h.strip()]
+    if trusted_proxies > 0 and hops:
+        return hops[-min(trusted_proxies, len(hops))]
+    return remote_addr or "unknown"
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, burst, now):
+        self.rate = rate_per_second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, now):
+        """Spend one token; returns 0.0 on success, else seconds until one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class Ticket:
+    """A processing slot; release() exactly once when the work is done (extra calls are ignored)."""
+
+    def __init__(self, controller, wait_seconds):
+        self._controller = controller
+        self.wait_seconds = wait_seconds
+        self.admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self.admitted_at)
+
+
+class AdmissionController:
+    """Bounded concurrency + bounded FIFO-ish wait queue + per-client token buckets."""
+
+    def __init__(self, max_concurrent=2, max_queue=4, queue_timeout=5.0, rate_per_minute=30.0, burst=10,
+                 max_clients=10000):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self._service_seconds = 1.0  # EWMA of slot hold time, seeds Retry-After
+        self._buckets = OrderedDict()
+        self._cond = threading.Condition()
+
+    def _retry_after(self):
+        ahead = self.waiting + 1
+        return max(1, math.ceil(self._service_seconds * ahead / max(1, self.max_concurrent)))
+
+    def _check_rate(self, client_id, now):
+        if self.rate <= 0 or client_id is None:
+            return
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = self._buckets[client_id] = TokenBucket(self.rate, self.burst, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        wait = bucket.take(now)
+        if wait > 0:
+            self.rejected["rate_limited"] += 1
+            raise AdmissionRejected(429, "Too many questions, please slow down", max(1, math.ceil(wait)))
+
+    def admit(self, client_id=None):
+        """Return a Ticket once a slot is free; raises AdmissionRejected (429/503) instead of queueing unboundedly."""
+        start = time.monotonic()
+        with self._cond:
+            self._check_rate(client_id, start)
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return Ticket(self, 0.0)
+            if self.waiting >= self.max_queue:
+                self.rejected["queue_full"] += 1
+                raise AdmissionRejected(503, "Server busy, please retry", self._retry_after())
+
+            self.waiting += 1
+            deadline = start + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected["queue_timeout"] += 1
+                        raise AdmissionRejected(503, "Server busy, please retry", self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+        return Ticket(self, time.monotonic() - start)
+
+    def _release(self, service_seconds):
+        with self._cond:
+            self.active -= 1
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * service_seconds
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "active": self.active,
+                "waiting": self.waiting,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "service_seconds": round(self._service_seconds, 3),
+                "clients": len(self._buckets),
+            }
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Semantic answer cache keyed on question embeddings
+
+Near-duplicate questions ("how to create a BOM" / "create BOM") map to
+embeddings with high cosine similarity, so an earlier answer can be reused
+without another Qdrant query or LLM round-trip.
+
+Memory-friendly for the 512 MB tier:
+- Vectors live in one preallocated float32 matrix (max_entries x dim)
+- LRU + TTL eviction, plus a byte budget covering vectors, answer text and
+  the retrieved chunks stored with each answer (usually the largest part)
+- Whole cache is dropped when the collection fingerprint changes
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Rough per-object overhead of the dicts / lists / numbers held in an entry
+_OBJECT_BYTES = 64
+_SCALAR_BYTES = 8
+
+
+def _payload_bytes(value):
+    """Approximate bytes held by a JSON-like value (chunk dicts, lists, strings, numbers)."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return _OBJECT_BYTES + sum(_payload_bytes(k) + _payload_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return _OBJECT_BYTES + sum(_payload_bytes(v) for v in value)
+    return _SCALAR_BYTES
+
+
+class SemanticAnswerCache:
+    """Bounded LRU/TTL cache returning stored answers for similar question vectors."""
+
+    def __init__(self, dim, threshold=0.92, max_entries=256, ttl_seconds=3600.0,
+                 max_bytes=4 * 1024 * 1024):
+        self.dim = dim
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._entries = OrderedDict()  # slot -> entry dict, oldest first
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._bytes = 0
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector):
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(v))
+        if norm == 0.0:
+            return None  # zero-vector fallback from embed_text: never cache
+        return v / norm
+
+    def _entry_bytes(self, entry):
+        return (self.dim * 4 + len(entry["question"].encode("utf-8")) + len(entry["answer"].encode("utf-8"))
+                + _payload_bytes(entry["retrieved"]))
+
+    def _evict_slot(self, slot):
+        entry = self._entries.pop(slot)
+        self._valid[slot] = False
+        self._free.append(slot)
+        self._bytes -= entry["nbytes"]
+
+    def get(self, vector):
+        """Return the cached entry for the most similar question, or None."""
+        q = self._normalize(vector)
+        with self._lock:
+            if q is None or not self._entries:
+                self.misses += 1
+                return None
+
+            sims = self._vectors @ q
+            sims[~self._valid] = -1.0
+            slot = int(np.argmax(sims))
+            score = float(sims[slot])
+            if score < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[slot]
+            if time.monotonic() - entry["created"] > self.ttl_seconds:
+                self._evict_slot(slot)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return dict(entry, similarity=score)
+
+    def put(self, question, vector, answer, retrieved=None):
+        """Store an answer for the question vector, evicting LRU entries as needed."""
+        v = self._normalize(vector)
+        if v is None:
+            return
+        entry = {
+            "question": question,
+            "answer": answer,
+            "retrieved": retrieved or [],
+            "created": time.monotonic(),
+        }
+        entry["nbytes"] = self._entry_bytes(entry)
+        if entry["nbytes"] > self.max_bytes:
+            return
+
+        with self._lock:
+            while self._entries and (not self._free or self._bytes + entry["nbytes"] > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._evict_slot(oldest)
+                self.evictions += 1
+
+            slot = self._free.pop()
+            self._vectors[slot] = v
+            self._valid[slot] = True
+            self._entries[slot] = entry
+            self._bytes += entry["nbytes"]
+
+    def shrink(self, fraction=0.5):
+        """Evict the least recently used share of entries (memory pressure)."""
+        with self._lock:
+            for slot in list(self._entries)[:int(len(self._entries) * fraction)]:
+                self._evict_slot(slot)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._valid[:] = False
+            self._free = list(range(self.max_entries - 1, -1, -1))
+            self._bytes = 0
+            self.invalidations += 1
+
+    def check_fingerprint(self, fingerprint):
+        """Drop all entries if the source collection changed since the last check."""
+        with self._lock:
+            changed = self._fingerprint is not None and fingerprint != self._fingerprint
+            self._fingerprint = fingerprint
+        if changed:
+            self.clear()
+        return changed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes + self._vectors.nbytes,
+                "max_bytes": self.max_bytes + self._vectors.nbytes,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -5,10 +5,13 @@ This wraps the query_bot_lite functionality in a memory-efficient Flask app
 """
 
 import os
+import hmac
 import json
-import gc
+import time
+import queue
+import threading
 from pathlib import Path
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 
@@ -23,6 +26,8 @@ PROJECT_ROOT = BACKEND_DIR.parent
 sys.path.insert(0, str(BACKEND_DIR))
 
 import query_bot_lite
+import metrics
+from admission import AdmissionController, AdmissionRejected, client_key
 
 app = Flask(__name__, static_folder=str(PROJECT_ROOT / 'frontend'), static_url_path='')
 CORS(app)
@@ -30,6 +35,118 @@ CORS(app)
 # Get port from environment variable (Render sets this)
 PORT = int(os.environ.get('PORT', 8000))
 
+# Debug mode: attach per-stage timings and LLM token usage to every JSON response (or send "debug": true per request)
+DEBUG_TIMINGS = os.environ.get('DEBUG_TIMINGS', '0') == '1'
+
+# Warm-up: "preload" loads the embedding model and opens connections before gunicorn forks
+# (workers share the model pages copy-on-write): at import time, or once the port is bound when
+# gunicorn runs with gunicorn.conf.py (it sets WARMUP_AFTER_BIND); "background" warms up in a
+# thread after start, "off" keeps fully lazy loading
+WARMUP = os.environ.get('WARMUP', 'preload').lower()
+WARMUP_AFTER_BIND = os.environ.get('WARMUP_AFTER_BIND') == '1'
+
+# Streaming: the fallback fires only if the first token takes longer than this
+FIRST_TOKEN_TIMEOUT = float(os.environ.get('FIRST_TOKEN_TIMEOUT', 15))
+# Once tokens flow, give up if the stream stalls for longer than this
+STREAM_IDLE_TIMEOUT = float(os.environ.get('STREAM_IDLE_TIMEOUT', 60))
+
+# Admission control: questions processed at once, how many may wait for a slot (and how long),
+# and a per-client token bucket; everything beyond is rejected fast with 503/429 + Retry-After
+ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 2))
+ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 4))
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5))
+RATE_LIMIT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_PER_MINUTE', 30))  # 0 disables
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 10))
+# Reverse proxies in front of the app that append to X-Forwarded-For (Render: 1); 0 uses the peer address
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1))
+
+admission = AdmissionController(
+    max_concurrent=ADMISSION_MAX_CONCURRENT,
+    max_queue=ADMISSION_MAX_QUEUE,
+    queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    rate_per_minute=RATE_LIMIT_PER_MINUTE,
+    burst=RATE_LIMIT_BURST,
+)
+# Batch API: off unless BATCH_API_TOKEN is set (a batch spends up to BATCH_MAX_QUESTIONS LLM calls);
+# callers send "Authorization: Bearer <token>"
+BATCH_API_TOKEN = os.environ.get('BATCH_API_TOKEN', '')
+BATCH_MAX_QUESTIONS = int(os.environ.get('BATCH_MAX_QUESTIONS', 500))
+
+# Shared pool: one thread per admitted question (no executor per request)
+answer_executor = ThreadPoolExecutor(max_workers=ADMISSION_MAX_CONCURRENT, thread_name_prefix='answer')
+
+
+def _admission_collector():
+    stats = admission.stats()
+    yield ('quoteplan_admission_active', 'gauge', 'Questions holding a processing slot', [({}, stats['active'])])
+    yield ('quoteplan_admission_waiting', 'gauge', 'Questions waiting for a processing slot',
+           [({}, stats['waiting'])])
+
+
+metrics.register_collector(_admission_collector)
+metrics.describe('quoteplan_queue_wait_seconds', 'Time admitted questions waited for a processing slot')
+metrics.describe('quoteplan_admission_rejected_total', 'Questions rejected by admission control')
+
+
+def _client_id():
+    """Caller identity for rate limiting: the X-Forwarded-For hop added by our proxy, not a client-sent one."""
+    return client_key(request.headers.get('X-Forwarded-For', ''), request.remote_addr, TRUSTED_PROXY_COUNT)
+
+
+def _parse_question(data):
+    """(question, top_k, None) from a parsed JSON body, or (None, None, 400 response)."""
+    if data is None:
+        return None, None, (jsonify({'error': 'Invalid JSON in request'}), 400)
+    if not isinstance(data, dict):
+        return None, None, (jsonify({'error': 'Request body must be a JSON object'}), 400)
+    question = data.get('question') or ''
+    if not isinstance(question, str) or not question.strip():
+        return None, None, (jsonify({'error': 'Question is required'}), 400)
+    try:
+        top_k = int(data.get('top_k', 5))
+    except (TypeError, ValueError):
+        return None, None, (jsonify({'error': 'top_k must be an integer'}), 400)
+    return question.strip(), top_k, None
+
+
+def _admit(route):
+    """Return (ticket, None) or (None, error response) for the current request."""
+    try:
+        ticket = admission.admit(_client_id())
+    except AdmissionRejected as e:
+        reason = 'rate_limited' if e.status == 429 else 'busy'
+        metrics.inc('quoteplan_admission_rejected_total', route=route, reason=reason)
+        metrics.inc('quoteplan_requests_total', route=route, outcome='rejected')
+        response = jsonify({'success': False, 'error': e.reason, 'retry_after': e.retry_after})
+        response.status_code = e.status
+        response.headers['Retry-After'] = str(e.retry_after)
+        return None, response
+    metrics.observe('quoteplan_queue_wait_seconds', ticket.wait_seconds, route=route)
+    return ticket, None
+
+
+def _rewarm_connections_in_worker():
+    """Runs in each forked worker: sockets opened by the parent must not be shared."""
+    threading.Thread(target=query_bot_lite.warm_up_connections, kwargs={'reset': True},
+                     name='warm-up-connections', daemon=True).start()
+
+
+def warm_up_after_bind():
+    """gunicorn when_ready hook (gunicorn.conf.py): the deferred preload, once the port is bound."""
+    if WARMUP == 'preload' and WARMUP_AFTER_BIND:
+        query_bot_lite.warm_up()
+
+
+if WARMUP == 'preload':
+    if not WARMUP_AFTER_BIND:
+        query_bot_lite.warm_up()
+    os.register_at_fork(after_in_child=_rewarm_connections_in_worker)
+elif WARMUP == 'background':
+    threading.Thread(target=query_bot_lite.warm_up, name='warm-up', daemon=True).start()
+else:
+    query_bot_lite.mark_ready()
+
+
 def fallback_response(question: str) -> dict:
     """Return a safe, generic answer when the online model does not respond"""
     generic_answer = (
@@ -56,26 +173,30 @@ def serve_static(path):
 
 @app.route('/api', methods=['POST', 'OPTIONS'])
 def api():
-    """Handle API requests with memory optimization"""
+    """Handle API requests (memory is managed by query_bot_lite.memory_governor)"""
     if request.method == 'OPTIONS':
         return '', 200
     
     try:
-        data = request.get_json()
-        question = data.get('question', '').strip()
+        data = request.get_json(silent=True)
+        question, top_k, error = _parse_question(data)
+        if error is not None:
+            return error
 
-        if not question:
-            return jsonify({'error': 'Question is required'}), 400
+        ticket, rejection = _admit('/api')
+        if rejection is not None:
+            return rejection
 
-        # Memory-efficient executor (single worker)
-        executor = ThreadPoolExecutor(max_workers=1)
-        future = executor.submit(
+        future = answer_executor.submit(
             query_bot_lite.answer_structured,
             question,
-            int(data.get('top_k', 5)),
-            False
+            top_k,
+            False,
+            data.get('session_id')
         )
-        
+        # The slot stays taken until the pipeline finishes, even after a timeout fallback
+        future.add_done_callback(lambda _: ticket.release())
+
         try:
             # Give the model 15 seconds
             out = future.result(timeout=15)
@@ -88,28 +209,222 @@ def api():
                 if 'retrieved' in out:
                     out = dict(out)
                     out.pop('retrieved', None)
+                if not (DEBUG_TIMINGS or data.get('debug')):
+                    out.pop('timings', None)
+                    out.pop('usage', None)
+                else:
+                    out = dict(out)
+                    out['timings'] = dict(out.get('timings') or {}, queue_wait=round(ticket.wait_seconds * 1000, 2))
 
-            # Memory cleanup after response
-            gc.collect()
+            metrics.inc('quoteplan_requests_total', route='/api', outcome='ok' if out.get('success') else 'error')
             return jsonify(out)
 
         except FuturesTimeout:
             future.cancel()
             print("[SERVER] Fallback mode is ON (model timed out after 15 s)")
+            metrics.inc('quoteplan_timeouts_total', route='/api')
+            metrics.inc('quoteplan_fallbacks_total', route='/api')
+            metrics.inc('quoteplan_requests_total', route='/api', outcome='fallback')
             fallback = fallback_response(question)
-            gc.collect()
             return jsonify(fallback), 200
 
         except Exception as e:
-            gc.collect()
+            metrics.inc('quoteplan_requests_total', route='/api', outcome='error')
             return jsonify({'success': False, 'error': f'Server error: {e}'}), 500
 
     except json.JSONDecodeError:
         return jsonify({'error': 'Invalid JSON in request'}), 400
     except Exception as e:
         print(f"[SERVER] Unexpected error: {e}")
-        gc.collect()
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before"""
+    state = query_bot_lite.readiness()
+    return jsonify(state), (200 if state['ready'] else 503)
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint: stage latencies, counters, RSS and GC stats"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Semantic answer cache hit/miss counters (for tuning the threshold)"""
+    return jsonify(query_bot_lite.answer_cache_stats())
+
+
+@app.route('/api/admission/stats', methods=['GET'])
+def admission_stats():
+    """Slots in use, queue depth and rejection counters"""
+    return jsonify(admission.stats())
+
+
+@app.route('/api/session/stats', methods=['GET'])
+def session_stats():
+    """Per-session memory usage (sessions held, characters stored)"""
+    return jsonify(query_bot_lite.session_memory_stats())
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+@app.route('/api/stream', methods=['POST', 'OPTIONS'])
+def api_stream():
+    """Stream answer tokens as newline-delimited JSON events"""
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json(silent=True)
+    question, top_k, error = _parse_question(data)
+    if error is not None:
+        return error
+    session_id = data.get('session_id')
+    debug = DEBUG_TIMINGS or bool(data.get('debug'))
+
+    ticket, rejection = _admit('/api/stream')
+    if rejection is not None:
+        return rejection
+
+    # Producer thread runs the (blocking) pipeline and hands events over a queue
+    events = queue.Queue()
+    done = threading.Event()
+
+    def produce():
+        try:
+            for event in query_bot_lite.answer_stream(question, top_k, False, session_id):
+                if done.is_set():
+                    break  # client went away or we timed out
+                events.put(event)
+        finally:
+            ticket.release()
+            events.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    def generate():
+        timeout = FIRST_TOKEN_TIMEOUT
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=timeout)
+                except queue.Empty:
+                    if timeout == FIRST_TOKEN_TIMEOUT:
+                        print(f"[SERVER] Fallback mode is ON (no first token after {FIRST_TOKEN_TIMEOUT:.0f} s)")
+                        metrics.inc('quoteplan_timeouts_total', route='/api/stream')
+                        metrics.inc('quoteplan_fallbacks_total', route='/api/stream')
+                        metrics.inc('quoteplan_requests_total', route='/api/stream', outcome='fallback')
+                        fallback = fallback_response(question)
+                        yield _ndjson({'type': 'token', 'text': fallback['answer']})
+                        yield _ndjson(dict(fallback, type='done'))
+                    else:
+                        print(f"[SERVER] Stream stalled for {STREAM_IDLE_TIMEOUT:.0f} s, closing")
+                        metrics.inc('quoteplan_timeouts_total', route='/api/stream')
+                        metrics.inc('quoteplan_requests_total', route='/api/stream', outcome='stalled')
+                        yield _ndjson({'type': 'error', 'success': False, 'error': 'Stream timed out'})
+                    return
+                if event is None:
+                    return
+                timeout = STREAM_IDLE_TIMEOUT
+                if event.get('type') in ('done', 'error'):
+                    event = dict(event)
+                    event.pop('retrieved', None)
+                    if not debug:
+                        event.pop('timings', None)
+                        event.pop('usage', None)
+                    else:
+                        event['timings'] = dict(event.get('timings') or {},
+                                                queue_wait=round(ticket.wait_seconds * 1000, 2))
+                    if event['type'] == 'error':
+                        event['error'] = event.get('answer') or 'Unknown error'
+                    metrics.inc('quoteplan_requests_total', route='/api/stream',
+                                outcome='ok' if event['type'] == 'done' else 'error')
+                yield _ndjson(event)
+        finally:
+            done.set()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+def _batch_questions(data):
+    """Questions from {"questions": [...]} JSON or an NDJSON body of {"id", "question"} lines."""
+    if data is not None:
+        return data.get('questions') or []
+    lines = request.get_data(as_text=True).splitlines()
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+@app.route('/api/batch', methods=['POST', 'OPTIONS'])
+def api_batch():
+    """Answer many questions; streams one NDJSON result per question as answers complete"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    if not BATCH_API_TOKEN:
+        return jsonify({'error': 'Batch API is disabled (set BATCH_API_TOKEN)'}), 403
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not hmac.compare_digest(supplied.encode(), BATCH_API_TOKEN.encode()):
+        return jsonify({'error': 'Invalid batch API token'}), 401
+
+    data = request.get_json(silent=True)
+    if data is not None and not isinstance(data, dict):
+        return jsonify({'error': 'JSON body must be an object: {"questions": [...]}'}), 400
+    try:
+        questions = _batch_questions(data)
+    except json.JSONDecodeError:
+        return jsonify({'error': 'Invalid NDJSON in request'}), 400
+    if not isinstance(questions, list) or not questions:
+        return jsonify({'error': 'questions are required'}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        return jsonify({'error': f'At most {BATCH_MAX_QUESTIONS} questions per batch'}), 413
+    data = data or {}
+    try:
+        top_k = int(data.get('top_k', 5))
+        concurrency = min(int(data.get('concurrency') or query_bot_lite.BATCH_CONCURRENCY),
+                          query_bot_lite.BATCH_CONCURRENCY)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'top_k and concurrency must be integers'}), 400
+    debug = DEBUG_TIMINGS or bool(data.get('debug'))
+
+    # One admission slot for the whole batch; its LLM calls are bounded by BATCH_CONCURRENCY
+    ticket, rejection = _admit('/api/batch')
+    if rejection is not None:
+        return rejection
+
+    def generate():
+        started = time.perf_counter()
+        counts = {'ok': 0, 'error': 0}
+        try:
+            for result in query_bot_lite.answer_batch(questions, top_k=top_k, concurrency=concurrency):
+                counts['ok' if result['success'] else 'error'] += 1
+                if not debug:
+                    result.pop('usage', None)
+                yield _ndjson(dict(result, type='result'))
+            metrics.inc('quoteplan_requests_total', route='/api/batch', outcome='ok')
+            yield _ndjson({'type': 'done', 'questions': len(questions), 'answered': counts['ok'],
+                           'failed': counts['error'], 'seconds': round(time.perf_counter() - started, 2)})
+        except Exception as e:
+            metrics.inc('quoteplan_requests_total', route='/api/batch', outcome='error')
+            yield _ndjson({'type': 'error', 'success': False, 'error': f'Server error: {e}'})
+        finally:
+            ticket.release()
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+    response.call_on_close(ticket.release)  # also covers a client that leaves before the first line
+    return response
+
+
 if __name__ == '__main__':
+    warm_up_after_bind()  # no gunicorn hook here: warm before serving
     app.run(host='0.0.0.0', port=PORT, debug=False)
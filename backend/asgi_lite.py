@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point serving the asyncio answer pipeline
+
+Same routes as app_lite (/api, /api/stream, /ready, the stats routes and the
+static frontend), but requests are handled on one event loop: a timeout
+cancels the in-flight Qdrant/LLM call, and at most ASGI_MAX_IN_FLIGHT
+questions are processed at once instead of one at a time.
+
+Questions go through app_lite's admission controller (per-client rate limit,
+bounded queue, 429/503 + Retry-After) with ASGI_MAX_IN_FLIGHT slots, and
+record the same /metrics data (stage timings, token usage, provider latency,
+hedged streams when HEDGING=1). The batch API is only served by app_lite.
+
+Run with:
+    uvicorn asgi_lite:app --app-dir backend --host 0.0.0.0 --port $PORT
+"""
+
+import asyncio
+import json
+import mimetypes
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+PROJECT_ROOT = BACKEND_DIR.parent
+FRONTEND_DIR = (PROJECT_ROOT / "frontend").resolve()
+sys.path.insert(0, str(BACKEND_DIR))
+
+import metrics
+import query_bot_lite
+from admission import AdmissionRejected, client_key
+from app_lite import DEBUG_TIMINGS, TRUSTED_PROXY_COUNT, admission, fallback_response  # also runs the WARMUP phase
+from async_pipeline import AsyncPipeline
+
+REQUEST_TIMEOUT = float(os.environ.get("REQUEST_TIMEOUT", 15))
+FIRST_TOKEN_TIMEOUT = float(os.environ.get("FIRST_TOKEN_TIMEOUT", 15))
+STREAM_IDLE_TIMEOUT = float(os.environ.get("STREAM_IDLE_TIMEOUT", 60))
+MAX_IN_FLIGHT = int(os.environ.get("ASGI_MAX_IN_FLIGHT", 32))
+MAX_BODY_BYTES = 64 * 1024
+
+pipeline = AsyncPipeline(max_in_flight=MAX_IN_FLIGHT)
+# One event loop holds many more questions at once than app_lite's answer threads
+admission.max_concurrent = MAX_IN_FLIGHT
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+]
+
+
+async def _send_response(send, status, body, content_type="application/json", headers=()):
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    headers = [(b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())] + list(headers)
+    await send({"type": "http.response.start", "status": status, "headers": headers + CORS_HEADERS})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            break
+    return json.loads(body or b"null")
+
+
+def _clean(out, debug=False):
+    """Same output normalization as app_lite.api."""
+    out = dict(out)
+    if not out.get("success", True) and "error" not in out:
+        out["error"] = out.get("answer") or "Unknown error"
+    out.pop("retrieved", None)
+    if not debug:
+        out.pop("timings", None)
+        out.pop("usage", None)
+    return out
+
+
+async def _parse_question(receive, send):
+    try:
+        data = await _read_json(receive)
+    except ValueError:
+        await _send_response(send, 400, {"error": "Invalid JSON in request"})
+        return None, None, None, None
+    if not isinstance(data, dict):
+        await _send_response(send, 400, {"error": "Request body must be a JSON object"})
+        return None, None, None, None
+    question = data.get("question") or ""
+    if not isinstance(question, str) or not question.strip():
+        await _send_response(send, 400, {"error": "Question is required"})
+        return None, None, None, None
+    try:
+        top_k = int(data.get("top_k", 5))
+    except (TypeError, ValueError):
+        await _send_response(send, 400, {"error": "top_k must be an integer"})
+        return None, None, None, None
+    return question.strip(), top_k, data.get("session_id"), DEBUG_TIMINGS or bool(data.get("debug"))
+
+
+def _client_id(scope):
+    """Same rate-limit key as app_lite._client_id, from the ASGI scope."""
+    headers = dict(scope.get("headers") or [])
+    peer = (scope.get("client") or (None,))[0]
+    return client_key(headers.get(b"x-forwarded-for", b"").decode("latin-1"), peer, TRUSTED_PROXY_COUNT)
+
+
+async def _admit(scope, send, route):
+    """Return a Ticket, or None after sending the 429/503 response.
+
+    admission.admit() blocks while queued, so it waits on a worker thread; if this
+    request is cancelled meanwhile, the slot is handed back as soon as it is granted.
+    """
+    pending = asyncio.get_running_loop().run_in_executor(None, admission.admit, _client_id(scope))
+    try:
+        ticket = await asyncio.shield(pending)
+    except AdmissionRejected as e:
+        reason = "rate_limited" if e.status == 429 else "busy"
+        metrics.inc("quoteplan_admission_rejected_total", route=route, reason=reason)
+        metrics.inc("quoteplan_requests_total", route=route, outcome="rejected")
+        await _send_response(send, e.status, {"success": False, "error": e.reason, "retry_after": e.retry_after},
+                             headers=[(b"retry-after", str(e.retry_after).encode())])
+        return None
+    except asyncio.CancelledError:
+        pending.add_done_callback(lambda f: f.cancelled() or f.exception() or f.result().release())
+        raise
+    metrics.observe("quoteplan_queue_wait_seconds", ticket.wait_seconds, route=route)
+    return ticket
+
+
+async def handle_api(scope, receive, send):
+    question, top_k, session_id, debug = await _parse_question(receive, send)
+    if question is None:
+        return
+    ticket = await _admit(scope, send, "/api")
+    if ticket is None:
+        return
+    metrics.start_trace()  # in the request task: the pipeline task below copies this context
+    try:
+        # wait_for cancels the pipeline task, closing its HTTP requests
+        out = await asyncio.wait_for(pipeline.answer_structured(question, top_k, session_id), REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"[SERVER] Fallback mode is ON (model timed out after {REQUEST_TIMEOUT:.0f} s, request cancelled)")
+        metrics.inc("quoteplan_timeouts_total", route="/api")
+        metrics.inc("quoteplan_fallbacks_total", route="/api")
+        metrics.inc("quoteplan_requests_total", route="/api", outcome="fallback")
+        await _send_response(send, 200, fallback_response(question))
+        return
+    finally:
+        ticket.release()
+    metrics.inc("quoteplan_requests_total", route="/api", outcome="ok" if out.get("success") else "error")
+    await _send_response(send, 200, _clean(out, debug))
+
+
+async def handle_stream(scope, receive, send):
+    question, top_k, session_id, debug = await _parse_question(receive, send)
+    if question is None:
+        return
+    ticket = await _admit(scope, send, "/api/stream")
+    if ticket is None:
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"application/x-ndjson"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ] + CORS_HEADERS,
+    })
+
+    async def emit(event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        await send({"type": "http.response.body", "body": line.encode("utf-8"), "more_body": True})
+
+    metrics.start_trace()  # before the first step: each wait_for(__anext__) runs in a copy of this context
+    events = pipeline.answer_stream(question, top_k, session_id)
+    timeout = FIRST_TOKEN_TIMEOUT
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(events.__anext__(), timeout)
+            except StopAsyncIteration:
+                break
+            except asyncio.TimeoutError:
+                if timeout == FIRST_TOKEN_TIMEOUT:
+                    print(f"[SERVER] Fallback mode is ON (no first token after {FIRST_TOKEN_TIMEOUT:.0f} s)")
+                    metrics.inc("quoteplan_timeouts_total", route="/api/stream")
+                    metrics.inc("quoteplan_fallbacks_total", route="/api/stream")
+                    metrics.inc("quoteplan_requests_total", route="/api/stream", outcome="fallback")
+                    fallback = fallback_response(question)
+                    await emit({"type": "token", "text": fallback["answer"]})
+                    await emit(dict(fallback, type="done"))
+                else:
+                    print(f"[SERVER] Stream stalled for {STREAM_IDLE_TIMEOUT:.0f} s, closing")
+                    metrics.inc("quoteplan_timeouts_total", route="/api/stream")
+                    metrics.inc("quoteplan_requests_total", route="/api/stream", outcome="stalled")
+                    await emit({"type": "error", "success": False, "error": "Stream timed out"})
+                break
+            timeout = STREAM_IDLE_TIMEOUT
+            if event.get("type") in ("done", "error"):
+                event = _clean(event, debug)
+                metrics.inc("quoteplan_requests_total", route="/api/stream",
+                            outcome="ok" if event["type"] == "done" else "error")
+            await emit(event)
+    finally:
+        ticket.release()
+        await events.aclose()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def handle_static(path, send):
+    relative = path.lstrip("/") or "index.html"
+    target = (FRONTEND_DIR / relative).resolve()
+    if FRONTEND_DIR not in target.parents or not target.is_file():
+        await _send_response(send, 404, "Not Found", "text/plain")
+        return
+    content_type = mimetypes.guess_type(str(target))[0] or "application/octet-stream"
+    await _send_response(send, 200, target.read_bytes(), content_type)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await pipeline.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await pipeline.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    if method == "OPTIONS":
+        await _send_response(send, 200, b"", "text/plain")
+    elif path == "/api" and method == "POST":
+        await handle_api(scope, receive, send)
+    elif path == "/api/stream" and method == "POST":
+        await handle_stream(scope, receive, send)
+    elif path == "/ready" and method == "GET":
+        state = query_bot_lite.readiness()
+        await _send_response(send, 200 if state["ready"] else 503, state)
+    elif path == "/metrics" and method == "GET":
+        await _send_response(send, 200, metrics.render(), "text/plain; version=0.0.4")
+    elif path == "/api/cache/stats" and method == "GET":
+        await _send_response(send, 200, query_bot_lite.answer_cache_stats())
+    elif path == "/api/session/stats" and method == "GET":
+        await _send_response(send, 200, query_bot_lite.session_memory_stats())
+    elif path == "/api/admission/stats" and method == "GET":
+        await _send_response(send, 200, admission.stats())
+    elif method in ("GET", "HEAD"):
+        await handle_static(path, send)
+    else:
+        await _send_response(send, 405, {"error": "Method not allowed"})
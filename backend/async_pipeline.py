@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Asyncio version of the answer pipeline (embed -> Qdrant search -> LLM call)
+
+Same behaviour as query_bot_lite.answer_structured, but every network hop is
+awaitable (AsyncQdrantClient, httpx.AsyncClient), so one process can serve
+many concurrent chats and a timeout really cancels the in-flight request
+instead of leaving a stuck thread behind. Served by asgi_lite.
+"""
+
+import asyncio
+import json
+import time
+
+import httpx
+from qdrant_client import AsyncQdrantClient
+
+import metrics
+import query_bot_lite as bot
+from chat_providers import CircuitOpenError, RETRY_STATUSES, hedge_delay, record_usage
+from intent_router import FOLLOW_UP, GREETING
+
+
+class AsyncProviderClient:
+    """Async OpenAI-compatible chat client sharing one pooled httpx.AsyncClient."""
+
+    def __init__(self, sync_provider, http):
+        # Reuse the sync provider's config, circuit breaker and latency histograms so both
+        # paths agree on health and the hedge delay learns from every call
+        self.name = sync_provider.name
+        self.url = sync_provider.url
+        self.api_key = sync_provider.api_key
+        self.model = sync_provider.model
+        self.breaker = sync_provider.breaker
+        self.latency = sync_provider.latency
+        self.first_token = sync_provider.first_token
+        self.extra_payload = sync_provider.extra_payload
+        self.http = http
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    def _payload(self, messages, stream):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": 800,
+            "temperature": 0.0,
+        }
+        payload.update(self.extra_payload)
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    async def _post_with_retry(self, messages, stream):
+        """Send the request, retrying 429/5xx with exponential backoff; returns an open response."""
+        attempt = 0
+        while True:
+            request = self.http.build_request("POST", self.url, headers=self.headers,
+                                              json=self._payload(messages, stream))
+            response = await self.http.send(request, stream=True)
+            if response.status_code not in RETRY_STATUSES or attempt >= bot.PROVIDER_MAX_RETRIES:
+                return response
+            await response.aclose()
+            await asyncio.sleep(bot.PROVIDER_BACKOFF * (2 ** attempt))
+            attempt += 1
+
+    async def complete(self, messages, usage=None):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open, skipping")
+        start = time.perf_counter()
+        try:
+            response = await self._post_with_retry(messages, stream=False)
+            try:
+                await response.aread()
+                response.raise_for_status()
+                body = response.json()
+                content = body["choices"][0]["message"]["content"]
+            finally:
+                await response.aclose()
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.release_probe()  # request cancelled / consumer gone: no verdict
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="cancelled")
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="error")
+            raise
+        self.breaker.record_success()
+        self.latency.observe(time.perf_counter() - start)
+        metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="ok")
+        record_usage(self.name, body.get("usage"), usage)
+
+        if isinstance(content, dict):
+            return json.dumps(content, ensure_ascii=False)
+        return content.strip()
+
+    async def stream(self, messages, usage=None):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open, skipping")
+        start = time.perf_counter()
+        first = True
+        reported = {}
+        try:
+            response = await self._post_with_retry(messages, stream=True)
+            try:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if chunk.get("usage"):
+                        reported.update(chunk["usage"])
+                    choices = chunk.get("choices") or []
+                    if not choices:
+                        continue
+                    delta = (choices[0].get("delta") or {}).get("content")
+                    if delta:
+                        if first:
+                            self.first_token.observe(time.perf_counter() - start)
+                            first = False
+                        yield delta
+            finally:
+                await response.aclose()
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.release_probe()  # request cancelled / lost a hedge race / consumer gone: no verdict
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="cancelled")
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="error")
+            raise
+        self.breaker.record_success()
+        self.latency.observe(time.perf_counter() - start)
+        metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="ok")
+        record_usage(self.name, reported, usage)
+
+
+async def _race_worker(provider, messages, events, usage=None):
+    """Pump one provider's stream into the shared queue until done; cancel the task to stop it."""
+    try:
+        async for token in provider.stream(messages, usage):
+            events.put_nowait((provider, "token", token))
+        events.put_nowait((provider, "done", None))
+    except Exception as e:
+        events.put_nowait((provider, "error", e))
+
+
+async def stream_hedged(primary, backup, messages, label, usage=None, **delay_options):
+    """Async counterpart of chat_providers.stream_hedged: the loser's task is cancelled,
+    which closes its httpx response."""
+    delay = hedge_delay(primary, **delay_options)
+
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    tasks = {}
+
+    def start(provider):
+        tasks[provider.name] = asyncio.ensure_future(_race_worker(provider, messages, events, usage))
+
+    print(f"[{label}] Streaming from {primary.name} (async, hedge after {delay:.2f}s)...")
+    start(primary)
+
+    winner = None
+    errors = []
+    deadline = loop.time() + delay
+    try:
+        while winner is None:
+            try:
+                if backup.name in tasks:
+                    provider, kind, value = await events.get()
+                else:
+                    provider, kind, value = await asyncio.wait_for(events.get(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                print(f"[{label}] Hedging: no first token from {primary.name}, starting {backup.name}")
+                start(backup)
+                continue
+
+            if kind == "token":
+                winner = provider
+                for name, task in tasks.items():
+                    if name != provider.name:
+                        task.cancel()
+                print(f"[{label}] {provider.name} answered first")
+                yield value
+            elif kind == "done":
+                winner = provider  # empty completion
+            else:
+                print(f"[{label}] {provider.name} stream failed: {value}")
+                errors.append(f"{provider.name}: {value}")
+                if backup.name not in tasks:
+                    start(backup)  # primary failed fast: no point waiting for the hedge delay
+                elif len(errors) == len(tasks):
+                    raise Exception(f"All chat API options exhausted ({'; '.join(errors)})")
+
+        while True:
+            provider, kind, value = await events.get()
+            if provider is not winner:
+                continue  # late events from the cancelled loser
+            if kind == "token":
+                yield value
+            elif kind == "done":
+                return
+            else:
+                raise value
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+class AsyncPipeline:
+    """Holds the async clients and a bound on concurrently processed questions."""
+
+    def __init__(self, max_in_flight=32):
+        self.max_in_flight = max_in_flight
+        self._semaphore = None
+        self._http = None
+        self._qdrant = None
+        self.providers = []
+        self._inflight = {}  # coalescing key -> {"task", "waiters"}
+        self.coalesced = 0
+
+    async def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(bot.PROVIDER_READ_TIMEOUT, connect=bot.PROVIDER_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=bot.PROVIDER_POOL_SIZE * 4,
+                                max_keepalive_connections=bot.PROVIDER_POOL_SIZE),
+        )
+        self._qdrant = AsyncQdrantClient(url=bot.QDRANT_HOST, api_key=bot.QDRANT_API_KEY)
+        self.providers = [AsyncProviderClient(p, self._http) for p in bot.CHAT_PROVIDERS]
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+        if self._qdrant is not None:
+            await self._qdrant.close()
+
+    @property
+    def in_flight(self):
+        if self._semaphore is None:
+            return 0
+        return self.max_in_flight - self._semaphore._value
+
+    async def embed(self, question):
+        # CPU-bound: run off the event loop (and through the micro-batcher)
+        return await asyncio.to_thread(bot.embed_text, question)
+
+    async def search(self, query_embedding, top_k=5, query_text=None):
+        if query_text and bot.lexical_index is not None and (
+                bot.lexical_index.ready or await asyncio.to_thread(bot.load_lexical_index)):
+            dense = await self._search_dense(query_embedding, max(top_k, bot.HYBRID_CANDIDATES))
+            # BM25 scoring is pure-Python CPU work: keep it off the event loop too
+            return await asyncio.to_thread(bot.fuse_with_lexical, dense, query_text, top_k)
+        return await self._search_dense(query_embedding, top_k)
+
+    async def lookup_answer(self, q_emb):
+        """FAQ tier, then the semantic answer cache (which may call Qdrant for the fingerprint)."""
+        return await asyncio.to_thread(lambda: bot.lookup_faq(q_emb) or bot.lookup_cached_answer(q_emb))
+
+    async def rerank(self, question, retrieved, top_k):
+        if bot.reranker is None:
+            return retrieved
+        # Blocks for at most RERANK_BUDGET_MS, but keep it off the event loop
+        return await asyncio.to_thread(bot.rerank_results, question, retrieved, top_k)
+
+    async def _search_dense(self, query_embedding, top_k):
+        if bot.local_index is not None and (bot.local_index.ready or await asyncio.to_thread(bot.load_local_index)):
+            bot._maybe_refresh_local_index()
+            return bot.local_index.search(query_embedding, top_k=top_k)
+        method = "query_points" if hasattr(self._qdrant, "query_points") else "search"
+        start = time.perf_counter()
+        if method == "query_points":
+            res = await self._qdrant.query_points(
+                collection_name=bot.COLLECTION_NAME,
+                query=query_embedding,
+                limit=top_k,
+                with_payload=True,
+            )
+            hits = getattr(res, "points", res)
+        else:
+            hits = await self._qdrant.search(
+                collection_name=bot.COLLECTION_NAME,
+                query_vector=query_embedding,
+                limit=top_k,
+                with_payload=True,
+            )
+        metrics.observe("quoteplan_qdrant_seconds", time.perf_counter() - start, method=method)
+        return bot._hits_to_results(hits)
+
+    def _hedge_pair(self):
+        """(primary, backup) to race when HEDGING=1 and two providers are usable, else None."""
+        if not bot.HEDGING:
+            return None
+        # state, not allow(): the half-open probe is claimed by the call itself
+        candidates = [p for p in self.providers if p.available and p.breaker.state != "open"]
+        return tuple(candidates[:2]) if len(candidates) >= 2 else None
+
+    async def complete(self, messages, label):
+        """Primary -> fallback chain, or a hedged race between them when HEDGING=1."""
+        usage = metrics.current_usage()  # this request's token accounting
+        pair = self._hedge_pair()
+        if pair:
+            tokens = [t async for t in stream_hedged(*pair, messages, label, usage, **bot._hedge_options())]
+            return "".join(tokens).strip()
+        errors = []
+        for provider in self.providers:
+            if not provider.available:
+                continue
+            try:
+                print(f"[{label}] Attempting {provider.name} {provider.model} (async)...")
+                return await provider.complete(messages, usage)
+            except Exception as e:
+                print(f"[{label}] {provider.name} failed: {e}")
+                errors.append(f"{provider.name}: {e}")
+        raise Exception(f"All chat API options exhausted ({'; '.join(errors) or 'no provider configured'})")
+
+    async def stream(self, messages, label):
+        usage = metrics.current_usage()
+        pair = self._hedge_pair()
+        if pair:
+            async for token in stream_hedged(*pair, messages, label, usage, **bot._hedge_options()):
+                yield token
+            return
+        errors = []
+        for provider in self.providers:
+            if not provider.available:
+                continue
+            started = False
+            try:
+                print(f"[{label}] Streaming from {provider.name} {provider.model} (async)...")
+                async for token in provider.stream(messages, usage):
+                    started = True
+                    yield token
+                return
+            except Exception as e:
+                if started:
+                    raise
+                print(f"[{label}] {provider.name} stream failed: {e}")
+                errors.append(f"{provider.name}: {e}")
+        raise Exception(f"All chat API options exhausted ({'; '.join(errors) or 'no provider configured'})")
+
+    async def _rag_answer(self, question, top_k):
+        """Embed -> FAQ -> answer cache -> search -> LLM; returns (answer_text, retrieved)."""
+        with metrics.stage("embed"):
+            q_emb = await self.embed(question)
+        # Vetted FAQ answers first, then the semantic answer cache
+        cached = await self.lookup_answer(q_emb)
+        if cached:
+            return cached["answer"], cached.get("retrieved", [])
+        with metrics.stage("search"):
+            retrieved = await self.search(q_emb, top_k=bot.candidate_count(top_k), query_text=question)
+        retrieved = await self.rerank(question, retrieved, top_k)
+        if not retrieved:
+            return "I don't have this information in the QuotePlan manual.", retrieved
+        messages = bot._build_rag_messages(question, retrieved)
+        with metrics.stage("llm"):
+            answer_text = await self.complete(messages, "Chat")
+        bot.store_cached_answer(question, q_emb, answer_text, retrieved)
+        return answer_text, retrieved
+
+    async def _shared(self, key, factory):
+        """Await factory() once per key among concurrent callers (single-flight).
+
+        Each caller can still be cancelled (request timeout) on its own; the shared
+        task is cancelled only when its last waiter goes away.
+        """
+        entry = self._inflight.get(key)
+        if entry is None:
+            entry = self._inflight[key] = {"task": asyncio.ensure_future(factory()), "waiters": 0}
+            entry["task"].add_done_callback(
+                lambda _task, e=entry: self._inflight.pop(key, None) if self._inflight.get(key) is e else None)
+        else:
+            self.coalesced += 1
+        entry["waiters"] += 1
+        try:
+            return await asyncio.shield(entry["task"])
+        finally:
+            entry["waiters"] -= 1
+            if entry["waiters"] == 0 and not entry["task"].done():
+                entry["task"].cancel()
+
+    async def answer_structured(self, question, top_k=5, session_id=None):
+        """Async counterpart of query_bot_lite.answer_structured.
+
+        The caller starts the trace (metrics.start_trace) so timings and usage land in its request.
+        """
+        started = time.perf_counter()
+        async with self._semaphore:
+            try:
+                intent = bot.classify_intent(question)
+                if intent == GREETING:
+                    answer_text = bot._greeting_reply()
+                    await asyncio.to_thread(bot._remember, session_id, question, answer_text)
+                    return {"success": True, "question": question, "answer": answer_text, "retrieved": [],
+                            "timings": bot._finish_trace(started), "usage": metrics.end_usage()}
+
+                prev = await asyncio.to_thread(bot._previous_answer, session_id)  # SQLite / Redis
+                if intent == FOLLOW_UP and prev:
+                    messages = bot._build_followup_messages(prev, question)
+                    with metrics.stage("followup"):
+                        answer_text = await self.complete(messages, "Follow-up")
+                    retrieved = []
+                elif bot.COALESCE_ENABLED:
+                    answer_text, retrieved = await self._shared(
+                        bot._coalesce_key(question, top_k), lambda: self._rag_answer(question, top_k))
+                else:
+                    answer_text, retrieved = await self._rag_answer(question, top_k)
+
+                await asyncio.to_thread(bot._remember, session_id, question, answer_text)
+                bot.memory_governor.check()
+                return {"success": True, "question": question, "answer": answer_text, "retrieved": retrieved,
+                        "timings": bot._finish_trace(started), "usage": metrics.end_usage()}
+
+            except Exception as e:
+                metrics.inc("quoteplan_pipeline_errors_total")
+                return {"success": False, "question": question, "answer": f"Error: {e}", "retrieved": [],
+                        "timings": bot._finish_trace(started), "usage": metrics.end_usage()}
+
+    async def answer_stream(self, question, top_k=5, session_id=None):
+        """Async counterpart of query_bot_lite.answer_stream (same event dicts).
+
+        The caller starts the trace before iterating: steps driven through wait_for() each
+        run in a copy of the caller's context, so a trace started in here would be lost.
+        """
+        started = time.perf_counter()
+        async with self._semaphore:
+            try:
+                intent = bot.classify_intent(question)
+                if intent == GREETING:
+                    answer_text = bot._greeting_reply()
+                    await asyncio.to_thread(bot._remember, session_id, question, answer_text)
+                    yield {"type": "token", "text": answer_text}
+                    yield {"type": "done", "success": True, "question": question, "answer": answer_text, "retrieved": [],
+                           "timings": bot._finish_trace(started), "usage": metrics.end_usage()}
+                    return
+
+                prev = await asyncio.to_thread(bot._previous_answer, session_id)  # SQLite / Redis
+                q_emb = None
+                cached = None
+                retrieved = []
+                llm_stage = None
+                if intent == FOLLOW_UP and prev:
+                    tokens = self.stream(bot._build_followup_messages(prev, question), "Follow-up")
+                    llm_stage = "followup"
+                else:
+                    with metrics.stage("embed"):
+                        q_emb = await self.embed(question)
+                    cached = await self.lookup_answer(q_emb)
+                    if cached:
+                        retrieved = cached.get("retrieved", [])
+                        tokens = _aiter([cached["answer"]])
+                    else:
+                        with metrics.stage("search"):
+                            retrieved = await self.search(q_emb, top_k=bot.candidate_count(top_k),
+                                                          query_text=question)
+                        retrieved = await self.rerank(question, retrieved, top_k)
+                        if not retrieved:
+                            tokens = _aiter(["I don't have this information in the QuotePlan manual."])
+                        else:
+                            tokens = self.stream(bot._build_rag_messages(question, retrieved), "Stream")
+                            llm_stage = "llm"
+
+                parts = []
+                async for token in _timed_tokens(tokens, llm_stage):
+                    parts.append(token)
+                    yield {"type": "token", "text": token}
+                answer_text = "".join(parts).strip()
+
+                if q_emb is not None and not cached and retrieved:
+                    bot.store_cached_answer(question, q_emb, answer_text, retrieved)
+                await asyncio.to_thread(bot._remember, session_id, question, answer_text)
+                bot.memory_governor.check()
+
+                yield {"type": "done", "success": True, "question": question, "answer": answer_text,
+                       "retrieved": retrieved, "timings": bot._finish_trace(started), "usage": metrics.end_usage()}
+
+            except Exception as e:
+                metrics.inc("quoteplan_pipeline_errors_total")
+                yield {"type": "error", "success": False, "question": question, "answer": f"Error: {e}",
+                       "retrieved": [], "timings": bot._finish_trace(started), "usage": metrics.end_usage()}
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+async def _timed_tokens(tokens, llm_stage):
+    """Async counterpart of query_bot_lite._timed_tokens."""
+    started = time.perf_counter()
+    first = True
+    async for token in tokens:
+        if first and llm_stage:
+            metrics.observe("quoteplan_stage_seconds", time.perf_counter() - started,
+                            stage=f"{llm_stage}_first_token")
+        first = False
+        yield token
+    if llm_stage:
+        metrics.observe("quoteplan_stage_seconds", time.perf_counter() - started, stage=llm_stage)
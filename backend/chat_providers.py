@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Shared chat provider client layer (OpenAI / OpenRouter)
+
+Each provider keeps one pooled requests.Session, so repeated questions reuse
+the same keep-alive TCP/TLS connection instead of paying a fresh handshake.
+Transient 429/5xx responses are retried with exponential backoff, and a small
+circuit breaker skips a provider that keeps failing instead of burning its
+timeout on every request.
+
+Token usage reported by the provider (including prompt tokens served from its
+prompt cache) is counted in quoteplan_llm_tokens_total and, when the caller
+passes a usage dict, summed into it for per-request accounting.
+"""
+
+import json
+import queue
+import socket
+import threading
+import time
+
+import metrics
+from metrics import LatencyHistogram
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider is skipped because its circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe after a cooldown.
+
+    Once the cooldown has passed, exactly one caller gets through as the probe;
+    everyone else keeps failing fast until it records a success or a failure
+    (or gives the probe up, or it is older than reset_seconds and presumed lost).
+    """
+
+    def __init__(self, failure_threshold=3, reset_seconds=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def _probing(self, now):
+        return self._probe_started is not None and now - self._probe_started < self.reset_seconds
+
+    @property
+    def state(self):
+        """closed, open, or half-open (cooled down and no probe in flight yet)."""
+        with self._lock:
+            now = time.monotonic()
+            if self._opened_at is None:
+                return "closed"
+            if now - self._opened_at >= self.reset_seconds and not self._probing(now):
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Return True if a call may go through: closed, or this caller is the half-open probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_seconds or self._probing(now):
+                return False
+            self._probe_started = now
+            return True
+
+    def release_probe(self):
+        """The probe ended without a verdict (cancelled): let the next caller probe instead."""
+        with self._lock:
+            self._probe_started = None
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self._failures >= self.failure_threshold:
+                # (Re)open: a failed half-open probe restarts the cooldown
+                self._opened_at = time.monotonic()
+
+
+class ProviderClient:
+    """OpenAI-compatible chat completions client with a pooled keep-alive session."""
+
+    def __init__(self, name, url, api_key, model, pool_size=4, max_retries=2,
+                 backoff_factor=0.5, connect_timeout=5.0, read_timeout=60.0,
+                 failure_threshold=3, reset_seconds=30.0, extra_payload=None):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.extra_payload = dict(extra_payload or {})  # e.g. OpenAI prompt_cache_key
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self.latency = LatencyHistogram()       # full completion time (successful calls)
+        self.first_token = LatencyHistogram()   # streaming time to first token
+
+        self._pool_size = pool_size
+        self._max_retries = max_retries
+        self._backoff_factor = backoff_factor
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled requests.Session, created on first use (keeps `requests` out of startup)."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._make_session()
+        return self._session
+
+    def _make_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self._max_retries,
+            connect=self._max_retries,
+            read=0,  # never replay a request the provider may have started answering
+            status=self._max_retries,
+            backoff_factor=self._backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        })
+        return session
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    def warm(self):
+        """Open a pooled keep-alive connection (DNS + TCP + TLS) without a billed request."""
+        if not self.available:
+            return None
+        r = self.session.head(self.url, timeout=self.timeout[0])
+        return r.status_code
+
+    def reset_connections(self):
+        """Drop pooled sockets (e.g. ones inherited across fork); new ones open on demand."""
+        if self._session is not None:
+            self._session.close()
+
+    def _payload(self, messages, stream, max_tokens, temperature):
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+        payload.update(self.extra_payload)
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}  # usage arrives in the final chunk
+        return payload
+
+    def _check_circuit(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit open, skipping")
+
+    def complete(self, messages, max_tokens=800, temperature=0.0, usage=None):
+        """Return the full completion text."""
+        self._check_circuit()
+        start = time.perf_counter()
+        try:
+            r = self.session.post(
+                self.url,
+                json=self._payload(messages, False, max_tokens, temperature),
+                timeout=self.timeout,
+            )
+            r.raise_for_status()
+            body = r.json()
+            content = body["choices"][0]["message"]["content"]
+        except Exception:
+            self.breaker.record_failure()
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="error")
+            raise
+        self.breaker.record_success()
+        self.latency.observe(time.perf_counter() - start)
+        metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="ok")
+        record_usage(self.name, body.get("usage"), usage)
+
+        if isinstance(content, dict):
+            return json.dumps(content, ensure_ascii=False)
+        return content.strip()
+
+    def stream(self, messages, max_tokens=800, temperature=0.0, usage=None, handle=None):
+        """Yield completion tokens as they arrive.
+
+        handle (a StreamHandle) lets another thread abort the stream: cancel() closes the
+        HTTP response, so a read blocked on a stalled provider returns at once.
+        """
+        self._check_circuit()
+        start = time.perf_counter()
+        first = True
+        reported = {}
+        try:
+            with self.session.post(
+                self.url,
+                json=self._payload(messages, True, max_tokens, temperature),
+                timeout=self.timeout,
+                stream=True,
+            ) as r:
+                if handle is not None:
+                    handle.attach(r)
+                r.raise_for_status()
+                for delta in iter_sse_deltas(r, reported):
+                    if first:
+                        self.first_token.observe(time.perf_counter() - start)
+                        first = False
+                    yield delta
+        except GeneratorExit:
+            self.breaker.release_probe()  # consumer stopped reading: no verdict on the provider
+            raise
+        except Exception:
+            if handle is not None and handle.cancelled:
+                # We hung up on purpose (lost a hedge race): not a provider failure
+                self.breaker.release_probe()
+                metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="cancelled")
+                return
+            self.breaker.record_failure()
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="error")
+            raise
+        if handle is not None and handle.cancelled:
+            # Closing the response can also end the read cleanly; the answer is truncated either way
+            self.breaker.release_probe()
+            metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="cancelled")
+            return
+        self.breaker.record_success()
+        self.latency.observe(time.perf_counter() - start)
+        metrics.inc("quoteplan_provider_calls_total", provider=self.name, outcome="ok")
+        record_usage(self.name, reported, usage)
+
+
+def record_usage(provider_name, reported, sink=None):
+    """Count a response's usage block; also add it to sink (a per-request dict) if given."""
+    if not reported:
+        return
+    counts = {
+        "prompt_tokens": int(reported.get("prompt_tokens") or 0),
+        "cached_tokens": int((reported.get("prompt_tokens_details") or {}).get("cached_tokens") or 0),
+        "completion_tokens": int(reported.get("completion_tokens") or 0),
+    }
+    for kind, value in counts.items():
+        metrics.inc("quoteplan_llm_tokens_total", value, provider=provider_name, kind=kind.split("_")[0])
+    metrics.inc("quoteplan_llm_calls_with_usage_total", provider=provider_name)
+    if sink is not None:
+        for kind, value in counts.items():
+            sink[kind] = sink.get(kind, 0) + value
+        sink["calls"] = sink.get("calls", 0) + 1
+
+
+def iter_sse_deltas(response, usage=None):
+    """Yield content deltas from an OpenAI-compatible SSE chat completion stream.
+
+    The usage block (sent in the last chunk when stream_options.include_usage
+    is set) is copied into the usage dict if one is given.
+    """
+    for raw in response.iter_lines():
+        if not raw:
+            continue
+        line = raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw
+        # OpenRouter sends ": OPENROUTER PROCESSING" keep-alive comments
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        if usage is not None and chunk.get("usage"):
+            usage.update(chunk["usage"])
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        delta = (choices[0].get("delta") or {}).get("content")
+        if delta:
+            yield delta
+
+
+def complete_with_fallback(providers, messages, label, usage=None):
+    """Try each available provider in order and return the first completion."""
+    errors = []
+    for provider in providers:
+        if not provider.available:
+            continue
+        try:
+            print(f"[{label}] Attempting {provider.name} {provider.model}...")
+            response = provider.complete(messages, usage=usage)
+            print(f"[{label}] {provider.name} success!")
+            return response
+        except Exception as e:
+            print(f"[{label}] {provider.name} failed: {e}")
+            errors.append(f"{provider.name}: {e}")
+
+    raise Exception(f"All chat API options exhausted ({'; '.join(errors) or 'no provider configured'})")
+
+
+def stream_with_fallback(providers, messages, label, usage=None):
+    """Stream from the first provider that produces a token; fail over only before the first token."""
+    errors = []
+    for provider in providers:
+        if not provider.available:
+            continue
+        started = False
+        try:
+            print(f"[{label}] Streaming from {provider.name} {provider.model}...")
+            for token in provider.stream(messages, usage=usage):
+                started = True
+                yield token
+            return
+        except Exception as e:
+            # Once tokens reached the client we cannot switch providers mid-answer
+            if started:
+                raise
+            print(f"[{label}] {provider.name} stream failed: {e}")
+            errors.append(f"{provider.name}: {e}")
+
+    raise Exception(f"All chat API options exhausted ({'; '.join(errors) or 'no provider configured'})")
+
+
+def hedge_delay(provider, percentile=0.9, default=2.0, min_delay=0.25, max_delay=10.0, min_samples=20):
+    """Seconds to wait for the primary's first token before firing the backup request."""
+    if provider.first_token.count < min_samples:
+        return default
+    observed = provider.first_token.percentile(percentile)
+    return min(max(observed, min_delay), max_delay)
+
+
+class StreamHandle:
+    """Cancellation handle for one provider stream running on another thread."""
+
+    def __init__(self):
+        self.cancelled = False
+        self._response = None
+        self._lock = threading.Lock()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            cancelled = self.cancelled
+        if cancelled:
+            response.close()  # cancelled while the request was still being sent
+
+    def cancel(self):
+        """Stop the stream now: closing the response unblocks a pending read and frees the connection."""
+        with self._lock:
+            self.cancelled = True
+            response = self._response
+        if response is None:
+            return
+        sock = _response_socket(response)
+        try:
+            if sock is not None:
+                # close() alone does not wake a thread blocked in recv(); shutdown() does
+                sock.shutdown(socket.SHUT_RDWR)
+            response.close()
+        except Exception:
+            pass
+
+
+def _response_socket(response):
+    """The socket under a streaming requests response (urllib3 -> http.client), or None."""
+    fp = getattr(getattr(response, "raw", None), "_fp", None)
+    buffered = getattr(fp, "fp", None)
+    return getattr(getattr(buffered, "raw", None), "_sock", None)
+
+
+def _race_worker(provider, messages, events, handle, usage=None):
+    """Pump one provider's stream into the shared queue until done or cancelled."""
+    stream = provider.stream(messages, usage=usage, handle=handle)
+    try:
+        for token in stream:
+            if handle.cancelled:
+                break
+            events.put((provider, "token", token))
+        else:
+            if not handle.cancelled:
+                events.put((provider, "done", None))
+    except Exception as e:
+        events.put((provider, "error", e))
+    finally:
+        stream.close()
+
+
+def stream_hedged(providers, messages, label, delay=None, usage=None, **delay_options):
+    """Stream from the primary; if no first token arrives within the hedge delay, also
+    start the backup and keep whichever produces a token first (the other is cancelled)."""
+    # state, not allow(): the half-open probe is claimed by the call itself
+    candidates = [p for p in providers if p.available and p.breaker.state != "open"]
+    if len(candidates) < 2:
+        yield from stream_with_fallback(providers, messages, label, usage)
+        return
+
+    primary, backup = candidates[0], candidates[1]
+    if delay is None:
+        delay = hedge_delay(primary, **delay_options)
+
+    events = queue.Queue()
+    handles = {primary.name: StreamHandle(), backup.name: StreamHandle()}
+    started, running = set(), set()
+
+    def start(provider):
+        started.add(provider.name)
+        running.add(provider.name)
+        threading.Thread(target=_race_worker, args=(provider, messages, events, handles[provider.name], usage),
+                         daemon=True).start()
+
+    print(f"[{label}] Streaming from {primary.name} (hedge after {delay:.2f}s)...")
+    start(primary)
+
+    winner = None
+    errors = []
+    deadline = time.monotonic() + delay
+    try:
+        while winner is None:
+            timeout = None if backup.name in started else max(0.0, deadline - time.monotonic())
+            try:
+                provider, kind, value = events.get(timeout=timeout)
+            except queue.Empty:
+                print(f"[{label}] Hedging: no first token from {primary.name}, starting {backup.name}")
+                start(backup)
+                continue
+
+            if kind == "token":
+                winner = provider
+                for name, handle in handles.items():
+                    if name != provider.name:
+                        handle.cancel()  # closes the loser's response right away
+                print(f"[{label}] {provider.name} answered first")
+                yield value
+            elif kind == "done":
+                winner = provider  # empty completion
+            else:
+                print(f"[{label}] {provider.name} stream failed: {value}")
+                errors.append(f"{provider.name}: {value}")
+                running.discard(provider.name)
+                if backup.name not in started:
+                    start(backup)  # primary failed fast: no point waiting for the hedge delay
+                elif not running:
+                    raise Exception(f"All chat API options exhausted ({'; '.join(errors)})")
+
+        while True:
+            provider, kind, value = events.get()
+            if provider is not winner:
+                continue  # late events from the cancelled loser
+            if kind == "token":
+                yield value
+            elif kind == "done":
+                return
+            else:
+                raise value
+    finally:
+        # Consumer finished or went away: stop every worker still streaming
+        for handle in handles.values():
+            handle.cancel()
+
+
+def complete_hedged(providers, messages, label, delay=None, usage=None, **delay_options):
+    """Hedged counterpart of complete_with_fallback (races on first token, returns full text)."""
+    return "".join(stream_hedged(providers, messages, label, delay, usage, **delay_options)).strip()
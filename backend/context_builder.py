@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted context assembly for the chat prompt
+
+Retrieved chunks are filtered by score, near-duplicates (overlapping chunks
+from the same manual section) are dropped, and the best remaining chunks are
+packed into a fixed token budget, so prompt size no longer grows linearly
+with top_k.
+"""
+
+import re
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # optional dependency
+    _ENCODING = None
+
+
+def count_tokens(text):
+    """Token count with tiktoken when installed, else a ~4 chars/token estimate."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, (len(text) + 3) // 4)
+
+
+def _truncate_to_tokens(text, max_tokens):
+    if _ENCODING is not None:
+        tokens = _ENCODING.encode(text, disallowed_special=())
+        return _ENCODING.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def _shingles(text, size=3):
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _overlap(a, b):
+    """Containment-style similarity: share of the smaller shingle set found in the other."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def format_context(chunks):
+    return "\n\n---\n\n".join([f"[{i+1}] {c['text']}" for i, c in enumerate(chunks)])
+
+
+def _rank_key(chunk):
+    for key in ("rerank_score", "rrf_score"):
+        if key in chunk:
+            return chunk[key]
+    return chunk.get("score") or 0.0
+
+
+def build_context(chunks, token_budget=1200, min_score=None, dedup_threshold=0.8):
+    """Select chunks for the prompt.
+
+    Returns (selected_chunks, stats). Chunks are considered best first: by
+    cross-encoder "rerank_score", else fused "rrf_score", else vector score.
+    The top chunk is always kept (truncated if it alone exceeds the budget).
+    min_score only applies to the vector score, so lexical-only hits and
+    reranked chunks are not dropped by it.
+    """
+    candidates = [c for c in chunks if c.get("text")]
+    candidates.sort(key=_rank_key, reverse=True)
+    stats = {
+        "candidates": len(candidates),
+        "dropped_score": 0,
+        "dropped_duplicate": 0,
+        "dropped_budget": 0,
+        "input_tokens": sum(count_tokens(c["text"]) for c in candidates),
+    }
+
+    selected, selected_shingles, used = [], [], 0
+    for rank, chunk in enumerate(candidates):
+        score = None if "rerank_score" in chunk else chunk.get("score")
+        if rank > 0 and min_score is not None and score is not None and score < min_score:
+            stats["dropped_score"] += 1
+            continue
+
+        shingles = _shingles(chunk["text"])
+        if any(_overlap(shingles, other) >= dedup_threshold for other in selected_shingles):
+            stats["dropped_duplicate"] += 1
+            continue
+
+        tokens = count_tokens(chunk["text"])
+        if used + tokens > token_budget:
+            if selected:
+                stats["dropped_budget"] += 1
+                continue
+            chunk = dict(chunk, text=_truncate_to_tokens(chunk["text"], token_budget))
+            tokens = count_tokens(chunk["text"])
+
+        selected.append(chunk)
+        selected_shingles.append(shingles)
+        used += tokens
+
+    stats["selected"] = len(selected)
+    stats["context_tokens"] = used
+    return selected, stats
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Pluggable embedding backends for all-MiniLM-L6-v2
+
+- "torch": sentence-transformers + PyTorch (original behaviour, ~250 MB RSS)
+- "onnx":  ONNX Runtime + tokenizers, optionally the int8-quantized export;
+           no torch import, much lower RSS and faster cold start
+
+Selected with EMBED_BACKEND=torch|onnx. Both return L2-normalized float32
+vectors of the same dimension, so Qdrant retrieval is unchanged.
+
+Parity check (cosine similarity of ONNX vs torch vectors):
+    python embedding_backends.py --parity
+(also run by tests/test_embedding_parity.py when the models are cached locally)
+"""
+
+import os
+
+import numpy as np
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_SEQ_LENGTH = 256  # same truncation as the sentence-transformers config
+
+# Pre-exported files in the model's Hugging Face repo
+ONNX_FP32_FILE = "onnx/model.onnx"
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+class TorchBackend:
+    """sentence-transformers backend (imports torch)."""
+
+    name = "torch"
+
+    def __init__(self, model_name=MODEL_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts):
+        return self.model.encode(
+            list(texts),
+            batch_size=max(1, len(texts)),
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        ).astype(np.float32, copy=False)
+
+
+class OnnxBackend:
+    """ONNX Runtime backend: tokenizer + transformer + mean pooling + L2 norm."""
+
+    name = "onnx"
+
+    def __init__(self, model_name=MODEL_NAME, quantized=True, model_path=None, tokenizer_path=None,
+                 num_threads=1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if model_path is None or tokenizer_path is None:
+            from huggingface_hub import hf_hub_download
+            model_path = model_path or hf_hub_download(model_name, ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+            tokenizer_path = tokenizer_path or hf_hub_download(model_name, "tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.quantized = quantized
+
+    def encode(self, texts):
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalize (matches the ST pipeline)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+def load_backend(name=None):
+    """Construct the embedding backend selected by name or EMBED_BACKEND."""
+    name = (name or os.getenv("EMBED_BACKEND", "torch")).lower()
+    if name == "onnx":
+        return OnnxBackend(
+            quantized=os.getenv("EMBED_ONNX_QUANTIZED", "1") == "1",
+            model_path=os.getenv("EMBED_ONNX_MODEL_PATH") or None,
+            tokenizer_path=os.getenv("EMBED_ONNX_TOKENIZER_PATH") or None,
+            num_threads=int(os.getenv("OMP_NUM_THREADS", "1")),
+        )
+    if name == "torch":
+        return TorchBackend()
+    raise ValueError(f"Unknown EMBED_BACKEND: {name!r} (expected 'torch' or 'onnx')")
+
+
+PARITY_SENTENCES = [
+    "How to create a BOM?",
+    "create PO",
+    "How do I generate an offer letter for a new employee?",
+    "Where can I change the project status in QuotePlan?",
+    "hi",
+    "Steps to add a vendor and assign it to a purchase order",
+]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parity", action="store_true", help="Compare ONNX vectors against torch vectors")
+    parser.add_argument("--threshold", type=float, default=0.99, help="Minimum cosine similarity per sentence")
+    parser.add_argument("--fp32", action="store_true", help="Use the non-quantized ONNX export")
+    args = parser.parse_args()
+
+    if args.parity:
+        torch_vecs = TorchBackend().encode(PARITY_SENTENCES)
+        onnx_vecs = OnnxBackend(quantized=not args.fp32).encode(PARITY_SENTENCES)
+        sims = (torch_vecs * onnx_vecs).sum(axis=1)
+        for sentence, sim in zip(PARITY_SENTENCES, sims):
+            print(f"{sim:.4f}  {sentence}")
+        print(f"min cosine similarity: {sims.min():.4f} (threshold {args.threshold})")
+        sys.exit(0 if sims.min() >= args.threshold else 1)
+    parser.print_help()
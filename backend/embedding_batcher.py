@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Micro-batching embedding queue
+
+Questions arriving within a few milliseconds of each other are encoded in a
+single forward pass instead of one pass per request; each caller waits on its
+own Future. On one CPU core a batch of N short questions costs far less than
+N separate encode calls.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class EmbeddingBatcher:
+    """Collects texts from concurrent callers and encodes them as one batch."""
+
+    def __init__(self, encode_batch, max_batch=32, max_wait_ms=5.0):
+        # encode_batch(list[str]) -> sequence of vectors, one per text
+        self.encode_batch = encode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        # Threads do not survive gunicorn's fork after --preload: restart per process
+        pid = os.getpid()
+        if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != pid or not self._worker.is_alive():
+                self._queue = queue.Queue()
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker_pid = pid
+                self._worker.start()
+
+    def submit(self, text):
+        """Queue one text and return a Future resolving to its vector."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text, timeout=None):
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        # Wait briefly for more callers, but never past max_batch
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.append(self._queue.get(timeout=remaining))
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            batch = [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                vectors = self.encode_batch([t for t, _ in batch])
+            except Exception as e:
+                for _, f in batch:
+                    f.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, f), vec in zip(batch, vectors):
+                f.set_result(vec)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
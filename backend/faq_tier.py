@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Precomputed FAQ answers served without retrieval or LLM calls
+
+High-frequency questions (create a project, BOM, PO, offer letter, ...) get a
+vetted answer ahead of time. At request time the question embedding is
+compared against every FAQ question (and its paraphrases) with one dot
+product; a close enough match is answered in milliseconds.
+
+Offline build (two steps so answers can be reviewed before they ship):
+    python backend/faq_tier.py generate --questions backend/faq/questions.txt --drafts backend/faq/faq.json
+        one question per line, paraphrases separated by " | "; answers are
+        drafted with the normal RAG pipeline and stored with "approved": false
+    (review / edit backend/faq/faq.json, set "approved": true)
+    python backend/faq_tier.py compile --drafts backend/faq/faq.json --out backend/faq/faq_index
+        embeds approved questions + paraphrases into the compact index
+
+On-disk index (FAQ_INDEX_PATH):
+    <path>.npy   - (rows, dim) float16 normalized question vectors, memory-mapped
+    <path>.json  - {"answers": [...], "questions": [...], "row_answer": [...], "embed_backend": ..., "dim": ...}
+"""
+
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class FaqIndex:
+    """Vetted answers looked up by cosine similarity of the question embedding."""
+
+    def __init__(self, threshold=0.9):
+        self.threshold = threshold
+        self.answers = []
+        self.questions = []
+        self.row_answer = None
+        self.matrix = None
+        self.meta = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.answers)
+
+    @property
+    def ready(self):
+        return self.matrix is not None and len(self.answers) > 0
+
+    def load(self, path):
+        """Load a compiled index; the vector matrix is memory-mapped."""
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+        matrix = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        self.answers = meta.pop("answers")
+        self.questions = meta.pop("questions")
+        self.row_answer = np.asarray(meta.pop("row_answer"), dtype=np.int32)
+        self.matrix = matrix
+        self.meta = meta
+        return len(self.answers)
+
+    def lookup(self, query_vector):
+        """Return {"question", "answer", "similarity"} for the closest FAQ entry above threshold, or None."""
+        if not self.ready:
+            return None
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(q))
+        if norm == 0.0:
+            return None  # zero-vector fallback from embed_text
+        sims = np.asarray(self.matrix @ (q / norm).astype(self.matrix.dtype), dtype=np.float32)
+        row = int(np.argmax(sims))
+        score = float(sims[row])
+        with self._lock:
+            if score < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+        entry = int(self.row_answer[row])
+        return {"question": self.questions[entry], "answer": self.answers[entry], "similarity": score}
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "entries": len(self.answers),
+            "vectors": 0 if self.matrix is None else int(self.matrix.shape[0]),
+            "threshold": self.threshold,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+def write_index(path, entries, vectors, row_answer, embed_backend):
+    """Save normalized float16 vectors + answers in the on-disk format read by FaqIndex.load."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    matrix = np.asarray(vectors, dtype=np.float32)
+    matrix = matrix / np.clip(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12, None)
+    np.save(path.with_suffix(".npy"), matrix.astype(np.float16))
+    meta = {
+        "answers": [e["answer"] for e in entries],
+        "questions": [e["question"] for e in entries],
+        "row_answer": list(row_answer),
+        "embed_backend": embed_backend,
+        "dim": int(matrix.shape[1]),
+    }
+    path.with_suffix(".json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+
+def _read_questions(path):
+    """One FAQ per line; paraphrases of the same question separated by ' | '."""
+    faqs = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        parts = [p.strip() for p in line.split("|") if p.strip()]
+        if parts and not parts[0].startswith("#"):
+            faqs.append({"question": parts[0], "variants": parts[1:]})
+    return faqs
+
+
+def generate(questions_path, drafts_path, top_k=5):
+    """Draft an answer for each FAQ with the RAG pipeline; keeps already approved answers."""
+    import query_bot_lite as bot
+
+    drafts_path = Path(drafts_path)
+    existing = {}
+    if drafts_path.exists():
+        existing = {e["question"]: e for e in json.loads(drafts_path.read_text(encoding="utf-8"))}
+
+    drafts = []
+    for faq in _read_questions(questions_path):
+        old = existing.get(faq["question"])
+        if old and old.get("approved"):
+            drafts.append(dict(old, variants=sorted(set(old.get("variants", [])) | set(faq["variants"]))))
+            continue
+        retrieved = bot.search_qdrant(bot.embed_text(faq["question"]), top_k=top_k, query_text=faq["question"])
+        answer = bot.call_chat_api(faq["question"], retrieved) if retrieved else ""
+        drafts.append(dict(faq, answer=answer, sources=[r["id"] for r in retrieved], approved=False))
+        print(f"[faq] drafted: {faq['question']}")
+
+    drafts_path.parent.mkdir(parents=True, exist_ok=True)
+    drafts_path.write_text(json.dumps(drafts, indent=2, ensure_ascii=False), encoding="utf-8")
+    pending = sum(1 for d in drafts if not d.get("approved"))
+    print(f"[faq] {len(drafts)} entries written to {drafts_path} ({pending} awaiting review)")
+
+
+def compile_index(drafts_path, out_path):
+    """Embed approved questions and paraphrases (one batch) and write the compact index."""
+    import query_bot_lite as bot
+
+    entries = [e for e in json.loads(Path(drafts_path).read_text(encoding="utf-8"))
+               if e.get("approved") and e.get("answer")]
+    if not entries:
+        raise SystemExit("[faq] no approved entries to compile")
+    texts, row_answer = [], []
+    for i, entry in enumerate(entries):
+        for text in [entry["question"]] + list(entry.get("variants", [])):
+            texts.append(text)
+            row_answer.append(i)
+    vectors = bot.embed_texts(texts)
+    write_index(out_path, entries, vectors, row_answer, bot.EMBED_BACKEND)
+    print(f"[faq] compiled {len(entries)} answers / {len(texts)} questions into {out_path}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the FAQ answer tier")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="Draft answers for review")
+    gen.add_argument("--questions", default=str(Path(__file__).parent / "faq" / "questions.txt"))
+    gen.add_argument("--drafts", default=str(Path(__file__).parent / "faq" / "faq.json"))
+    gen.add_argument("--top-k", type=int, default=5)
+    comp = sub.add_parser("compile", help="Embed approved answers into the index")
+    comp.add_argument("--drafts", default=str(Path(__file__).parent / "faq" / "faq.json"))
+    comp.add_argument("--out", default=str(Path(__file__).parent / "faq" / "faq_index"))
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.questions, args.drafts, top_k=args.top_k)
+    else:
+        compile_index(args.drafts, args.out)
@@ -0,0 +1,21 @@
+"""
+gunicorn settings for app_lite (gunicorn -c backend/gunicorn.conf.py ...)
+
+With WARMUP=preload the warm-up (model load, dummy encode, connections) runs
+in when_ready: after gunicorn has bound the port but before it forks the
+workers, so the platform sees the port open at once, workers still share the
+model pages copy-on-write, and no worker serves traffic (/ready included)
+until it is warm. Without this file, preload runs while app_lite is imported,
+before the port is bound.
+"""
+
+import os
+
+# Read by app_lite at import: leave WARMUP=preload to when_ready() below
+os.environ["WARMUP_AFTER_BIND"] = "1"
+
+
+def when_ready(server):
+    import app_lite  # already loaded with --preload; otherwise imported here, before the fork
+
+    app_lite.warm_up_after_bind()
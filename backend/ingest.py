@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Streaming ingestion of the QuotePlan manual into the Qdrant collection
+
+Documents (.txt, .md, .docx) are read paragraph by paragraph, packed into
+token-bounded chunks and pushed through batched embedding (the runtime
+embed model) and batched upserts, so memory stays bounded by one batch plus
+the chunk ids of the document being processed.
+
+Incremental by construction:
+- point ids are derived from (source, chunk content, occurrence), so an
+  unchanged chunk keeps its id wherever it moves in the document; a batch
+  is first looked up with retrieve() and only new chunks are embedded
+- chunks of an edited document that no longer exist are deleted, as are the
+  chunks of documents removed from the manual (unless --keep-missing)
+- a checkpoint (INGEST_STATE_PATH) records each fully ingested document's
+  file hash; unchanged files are skipped without being read again, and a run
+  that fails part-way resumes where it stopped
+
+After any change the collection metadata gets a new "ingest_revision", which
+is part of query_bot_lite's collection fingerprint: the answer cache is
+cleared and the local / lexical indexes refresh on their next check. The
+checkpoint is flagged "dirty" before the first write, so a run that dies
+before bumping the revision has it bumped by the next run.
+
+Usage:
+    python backend/ingest.py path/to/manual [--full] [--keep-missing] [--batch-size 64]
+
+Points written (payload): {"text", "source", "section", "chunk", "content_hash"}; points
+without a "source" (loaded by earlier tooling) are left alone.
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+
+from qdrant_client import models
+
+from context_builder import count_tokens
+
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "250"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+SUPPORTED_SUFFIXES = (".txt", ".md", ".docx")
+
+# Namespace for content-derived point ids (any fixed UUID works; it must never change)
+_ID_NAMESPACE = uuid.UUID("6f1c2b1e-4d0a-5b8e-9a43-3c7d8e2f1a60")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source, digest, occurrence=0):
+    """Stable point id: same document + same chunk text (+ n-th repeat) -> same id."""
+    return str(uuid.uuid5(_ID_NAMESPACE, f"{source}\x00{digest}\x00{occurrence}"))
+
+
+# ===== READING =====
+
+def _read_text(path):
+    """Yield (section, paragraph) from a .txt / .md file; '#' lines start a new section."""
+    section, lines = None, []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip()
+            heading = line.startswith("#")
+            if (not line or heading) and lines:
+                yield section, " ".join(lines)
+                lines = []
+            if heading:
+                section = line.lstrip("#").strip() or section
+            elif line:
+                lines.append(line.strip())
+    if lines:
+        yield section, " ".join(lines)
+
+
+def _read_docx(path):
+    """Yield (section, paragraph) from a .docx file; Heading styles start a new section."""
+    try:
+        import docx  # python-docx, ingestion only
+    except ImportError as e:
+        raise RuntimeError("reading .docx needs python-docx (pip install python-docx)") from e
+    section = None
+    for paragraph in docx.Document(str(path)).paragraphs:
+        text = paragraph.text.strip()
+        if not text:
+            continue
+        if (paragraph.style.name or "").lower().startswith("heading"):
+            section = text
+        else:
+            yield section, text
+
+
+def read_document(path):
+    path = Path(path)
+    if path.suffix.lower() == ".docx":
+        return _read_docx(path)
+    return _read_text(path)
+
+
+# ===== CHUNKING =====
+
+def _split_long(text, max_tokens):
+    """Split a paragraph that alone exceeds max_tokens at sentence (then word) boundaries."""
+    parts, current = [], ""
+    pieces = _SENTENCE_END.split(text)
+    if len(pieces) == 1:
+        pieces = text.split(" ")
+    for piece in pieces:
+        candidate = f"{current} {piece}".strip()
+        if current and count_tokens(candidate) > max_tokens:
+            parts.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_paragraphs(paragraphs, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """Pack (section, paragraph) pairs into chunks of at most ~max_tokens.
+
+    Chunks never span sections; the section title is the chunk's first line
+    and the last paragraph(s) up to overlap_tokens are repeated at the start
+    of the next chunk of the same section. Yields {"section", "text"}.
+    """
+    section, current, size = None, [], 0
+
+    def emit():
+        body = "\n".join(current)
+        return {"section": section, "text": f"{section}\n{body}" if section else body}
+
+    for para_section, paragraph in paragraphs:
+        if para_section != section:
+            if current:
+                yield emit()
+            section, current, size = para_section, [], 0
+        for piece in _split_long(paragraph, max_tokens):
+            tokens = count_tokens(piece)
+            if current and size + tokens > max_tokens:
+                yield emit()
+                tail, tail_size = [], 0
+                for previous in reversed(current):
+                    t = count_tokens(previous)
+                    if tail_size + t > overlap_tokens:
+                        break
+                    tail.insert(0, previous)
+                    tail_size += t
+                current, size = tail, tail_size
+            current.append(piece)
+            size += tokens
+    if current:
+        yield emit()
+
+
+# ===== CHECKPOINT =====
+
+class IngestState:
+    """Which documents are fully ingested (by file hash); saved atomically after each one.
+
+    dirty is set (and saved) before the collection is first written to and
+    cleared once the ingest revision has been bumped.
+    """
+
+    def __init__(self, path, collection):
+        self.path = Path(path)
+        self.collection = collection
+        self.sources = {}
+        self.dirty = False
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return self
+        if data.get("collection") == self.collection:
+            self.sources = data.get("sources", {})
+            self.dirty = bool(data.get("dirty"))
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"collection": self.collection, "dirty": self.dirty, "sources": self.sources},
+                                  indent=1),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def is_current(self, source, sha1):
+        return self.sources.get(source, {}).get("sha1") == sha1
+
+    def mark(self, source, sha1, chunks):
+        self.sources[source] = {"sha1": sha1, "chunks": chunks, "ingested_at": round(time.time())}
+        self.save()
+
+    def forget(self, source):
+        if self.sources.pop(source, None) is not None:
+            self.save()
+
+    def mark_dirty(self):
+        if not self.dirty:
+            self.dirty = True
+            self.save()
+
+    def clear_dirty(self):
+        if self.dirty:
+            self.dirty = False
+            self.save()
+
+
+# ===== QDRANT WRITER =====
+
+def _source_filter(source):
+    return models.Filter(must=[models.FieldCondition(key="source", match=models.MatchValue(value=source))])
+
+
+class Ingestor:
+    """Batched retrieve -> embed (new chunks only) -> upsert into one collection."""
+
+    def __init__(self, client, collection, embed, dim, batch_size=INGEST_BATCH_SIZE, before_write=None):
+        self.client = client
+        self.collection = collection
+        self.embed = embed  # list[str] -> list[vector]
+        self.dim = dim
+        self.batch_size = batch_size
+        self.before_write = before_write  # called before every upsert / delete (e.g. IngestState.mark_dirty)
+        self.counts = {"chunks": 0, "embedded": 0, "unchanged": 0, "deleted": 0}
+
+    def ensure_collection(self):
+        if self.client.collection_exists(self.collection):
+            return False
+        self.client.create_collection(
+            collection_name=self.collection,
+            vectors_config=models.VectorParams(size=self.dim, distance=models.Distance.COSINE),
+        )
+        try:
+            self.client.create_payload_index(self.collection, "source", models.PayloadSchemaType.KEYWORD)
+        except Exception as e:
+            print(f"[ingest] could not index payload field 'source': {e}")
+        print(f"[ingest] created collection {self.collection} (dim {self.dim})")
+        return True
+
+    def _flush(self, batch):
+        """Upsert the chunks of one batch whose id (i.e. content) is not stored yet."""
+        existing = {
+            point.id for point in self.client.retrieve(collection_name=self.collection,
+                                                       ids=[c["id"] for c in batch], with_payload=False)
+        }
+        fresh = [c for c in batch if c["id"] not in existing]
+        self.counts["unchanged"] += len(batch) - len(fresh)
+        if not fresh:
+            return
+        vectors = self.embed([c["payload"]["text"] for c in fresh])
+        if self.before_write:
+            self.before_write()
+        self.client.upsert(
+            collection_name=self.collection,
+            points=[models.PointStruct(id=c["id"], vector=list(v), payload=c["payload"])
+                    for c, v in zip(fresh, vectors)],
+            wait=True,
+        )
+        self.counts["embedded"] += len(fresh)
+
+    def ingest_source(self, source, chunks):
+        """Write one document's chunks, then delete its chunks that no longer exist; returns #chunks."""
+        ids, occurrences, batch = set(), {}, []
+        for n, chunk in enumerate(chunks):
+            digest = content_hash(chunk["text"])
+            occurrence = occurrences.get(digest, 0)
+            occurrences[digest] = occurrence + 1
+            point_id = chunk_id(source, digest, occurrence)
+            ids.add(point_id)
+            batch.append({"id": point_id, "payload": {
+                "text": chunk["text"], "source": source, "section": chunk["section"],
+                "chunk": n, "content_hash": digest,
+            }})
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+        self.counts["chunks"] += len(ids)
+        self._delete_stale(source, ids)
+        return len(ids)
+
+    def _delete_stale(self, source, keep_ids):
+        stale, offset = [], None
+        while True:
+            points, offset = self.client.scroll(collection_name=self.collection, scroll_filter=_source_filter(source),
+                                                limit=256, offset=offset, with_payload=False, with_vectors=False)
+            stale.extend(str(p.id) for p in points if str(p.id) not in keep_ids)
+            if offset is None:
+                break
+        if stale and self.before_write:
+            self.before_write()
+        for start in range(0, len(stale), 256):
+            self.client.delete(collection_name=self.collection,
+                               points_selector=models.PointIdsList(points=stale[start:start + 256]), wait=True)
+        self.counts["deleted"] += len(stale)
+
+    def remove_source(self, source):
+        self._delete_stale(source, set())
+
+    def bump_revision(self):
+        """Record a new ingest revision in the collection metadata (read by the runtime fingerprint)."""
+        revision = f"{time.time():.0f}-{uuid.uuid4().hex[:8]}"
+        try:
+            self.client.update_collection(collection_name=self.collection, metadata={"ingest_revision": revision})
+        except Exception as e:
+            # Older Qdrant servers have no collection metadata; point counts still change on most edits
+            print(f"[ingest] could not record ingest revision: {e}")
+            return None
+        return revision
+
+
+def iter_documents(root):
+    """Yield (source, path) for supported files under root (or root itself), in a stable order."""
+    root = Path(root)
+    if root.is_file():
+        yield root.name, root
+        return
+    for path in sorted(root.rglob("*")):
+        if path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES and not path.name.startswith("~$"):
+            yield path.relative_to(root).as_posix(), path
+
+
+def ingest(root, ingestor, state, full=False, keep_missing=False):
+    """Bring the collection in line with the documents under root; returns a summary dict."""
+    started = time.perf_counter()
+    if ingestor.ensure_collection():
+        state.sources = {}  # new (or re-created) collection: the checkpoint no longer applies
+    ingestor.before_write = state.mark_dirty
+    if state.dirty:
+        print("[ingest] previous run changed the collection without bumping its revision")
+    summary = {"documents": 0, "skipped": 0, "failed": [], "removed": 0}
+    present = set()
+    for source, path in iter_documents(root):
+        present.add(source)
+        sha1 = file_hash(path)
+        if not full and state.is_current(source, sha1):
+            summary["skipped"] += 1
+            continue
+        try:
+            n = ingestor.ingest_source(source, chunk_paragraphs(read_document(path)))
+        except Exception as e:
+            # Chunks already upserted stay; the next run re-reads this document and skips them
+            print(f"[ingest] {source} failed: {e}")
+            summary["failed"].append(source)
+            continue
+        state.mark(source, sha1, n)
+        summary["documents"] += 1
+        print(f"[ingest] {source}: {n} chunks")
+
+    if not keep_missing:
+        for source in sorted(set(state.sources) - present):
+            ingestor.remove_source(source)
+            state.forget(source)
+            summary["removed"] += 1
+            print(f"[ingest] {source}: removed")
+
+    summary.update(ingestor.counts)
+    if state.dirty:
+        summary["revision"] = ingestor.bump_revision()
+        if summary["revision"] is not None:
+            state.clear_dirty()  # on failure the flag stays and the next run retries the bump
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest manual documents into the Qdrant collection")
+    parser.add_argument("path", help="Directory (or single file) of .txt / .md / .docx documents")
+    parser.add_argument("--collection", default=None, help="Default: COLLECTION_NAME")
+    parser.add_argument("--state", default=None, help="Checkpoint file (default: INGEST_STATE_PATH)")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--full", action="store_true", help="Ignore the checkpoint and re-check every document")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="Keep chunks of documents that are no longer under path")
+    args = parser.parse_args()
+
+    import query_bot_lite as bot
+
+    collection = args.collection or bot.COLLECTION_NAME
+    state_path = args.state or os.getenv(
+        "INGEST_STATE_PATH", str(bot.BACKEND_DIR / "index" / f"{collection}_ingest.json"))
+    if not bot.get_embedding_model():
+        raise SystemExit("[ingest] embedding model could not be loaded; refusing to index zero vectors")
+    writer = Ingestor(bot.get_qdrant(), collection, bot.embed_texts, bot.EMBEDDING_DIM, batch_size=args.batch_size)
+    result = ingest(args.path, writer, IngestState(state_path, collection).load(),
+                    full=args.full, keep_missing=args.keep_missing)
+    print(json.dumps(result, indent=2))
+    if result["failed"]:
+        raise SystemExit(1)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Intent routing for incoming questions: greeting / follow-up / RAG
+
+The message is tokenized once with a precompiled regex and its word n-grams
+are looked up in phrase sets, so matching respects word boundaries ("ye" no
+longer matches "yes", "aur" no longer matches "aurora") and costs one pass
+over the words instead of one substring scan per keyword.
+
+Follow-up phrases come in two strengths:
+- strong: only make sense about the previous answer ("iska matlab",
+  "phir se", "aage batao") -> follow-up whenever they appear
+- weak: style words and verbs that also occur in real questions ("steps",
+  "explain", "repeat", "simplify") -> follow-up only if the message has no
+  other content words, so "What are the steps to create a PO?" and "How do I
+  repeat a purchase order?" still go through retrieval
+"""
+
+import re
+
+GREETING = "greeting"
+FOLLOW_UP = "follow_up"
+RAG = "rag"
+
+GREETING_PHRASES = {
+    "hi", "hello", "hey", "hii", "hiya", "namaste", "how are you", "good morning",
+    "good afternoon", "good evening",
+}
+
+# Phrases that only refer back to the previous answer
+STRONG_FOLLOW_UP_PHRASES = {
+    # reference to previous answer
+    "wahi", "yehi", "iska", "uska", "iska matlab", "uska matlab",
+    # continuation / more info
+    "aur batao", "aur samjhao", "aur detail", "continue karo", "aage batao",
+    # clarification / rephrase
+    "dubara", "phir se", "easy language", "simple language",
+    # language / tone changes
+    "hinglish", "english me", "hindi me", "simple words",
+}
+
+# Style words that are a follow-up only when nothing else is asked
+WEAK_FOLLOW_UP_PHRASES = {
+    # short / summary
+    "short", "brief", "summarize", "summary", "short me", "short mein",
+    # detail / explanation
+    "detail", "details", "explain", "explanation", "detail me", "detail mein",
+    # reference / continuation
+    "same", "ye", "aur", "more", "continue",
+    # clarification / rephrase (also manual verbs: "repeat a purchase order", "simplify the BOM")
+    "repeat", "rephrase", "simplify",
+    # formatting / change style
+    "steps", "step", "step by step", "points", "bullet", "bullets", "list me", "points me",
+}
+
+# Words that carry no topic of their own ("explain it in detail please")
+FILLER_WORDS = {
+    "a", "an", "the", "it", "this", "that", "that's", "me", "mein", "my", "in", "into", "of", "to",
+    "for", "with", "and", "or", "please", "pls", "plz", "can", "could", "you", "u", "give", "make",
+    "do", "again", "more", "bit", "little", "some", "now", "just", "form", "format", "way", "version",
+    "batao", "bataye", "samjhao", "karo", "kar", "na", "thoda", "aur", "zara", "se", "ko",
+    "mujhe", "hai", "ka", "ki", "ke", "isko", "usko", "answer", "above", "previous", "last", "one",
+    "language", "words", "terms", "ok", "okay", "so", "then", "also", "is", "are", "what", "about",
+}
+
+GREETING_FILLER_WORDS = {"there", "all", "team", "everyone", "bot", "assistant", "quoteplan", "ji", "sir", "maam"}
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+class IntentRouter:
+    """Classify a question as GREETING, FOLLOW_UP or RAG in one pass."""
+
+    def __init__(self, greetings=GREETING_PHRASES, strong=STRONG_FOLLOW_UP_PHRASES,
+                 weak=WEAK_FOLLOW_UP_PHRASES, filler=FILLER_WORDS, greeting_filler=GREETING_FILLER_WORDS):
+        # phrase (words joined by one space) -> intent strength
+        self._phrases = {}
+        for phrase in weak:
+            self._phrases[" ".join(phrase.lower().split())] = "weak"
+        for phrase in strong:
+            self._phrases[" ".join(phrase.lower().split())] = "strong"
+        self._greetings = {" ".join(p.lower().split()) for p in greetings}
+        self._greeting_filler = set(greeting_filler)
+        self._ignored_words = {w for p in self._phrases for w in p.split()} | set(filler)
+        # first word -> longest phrase length starting with it (skips n-gram joins for other words)
+        self._starts = {}
+        for phrase in list(self._phrases) + list(self._greetings):
+            first, n = phrase.split()[0], len(phrase.split())
+            self._starts[first] = max(self._starts.get(first, 0), n)
+
+    def _phrase_at(self, words, i, vocabulary):
+        """Longest phrase from vocabulary starting at words[i] -> (phrase, length) or (None, 1)."""
+        longest = self._starts.get(words[i], 0)
+        for n in range(min(longest, len(words) - i), 0, -1):
+            phrase = words[i] if n == 1 else " ".join(words[i:i + n])
+            if phrase in vocabulary:
+                return phrase, n
+        return None, 1
+
+    def _is_greeting(self, words):
+        # The whole message must be greetings + filler; "hi, how do I create a BOM?" is a question
+        i = 0
+        while i < len(words):
+            phrase, n = self._phrase_at(words, i, self._greetings)
+            if phrase is None:
+                if i == 0 or words[i] not in self._greeting_filler:
+                    return False
+            i += n
+        return True
+
+    def classify(self, question):
+        words = _WORD_RE.findall((question or "").lower())
+        if not words:
+            return RAG
+        if words[0] in self._starts and self._is_greeting(words):
+            return GREETING
+
+        matched = False
+        i = 0
+        while i < len(words):
+            phrase, n = self._phrase_at(words, i, self._phrases)
+            if phrase is not None:
+                if self._phrases[phrase] == "strong":
+                    return FOLLOW_UP
+                matched = True
+            i += n
+        if not matched:
+            return RAG
+        # Only weak style words: follow-up unless the message names something new to look up
+        return RAG if any(w not in self._ignored_words for w in words) else FOLLOW_UP
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Local BM25 index over the collection's chunk payloads, fused with dense search
+
+all-MiniLM-L6-v2 embeddings blur exact UI labels and menu names ("Save &
+Approve", "BOM Master"), which users type verbatim. A small inverted index
+over the same chunks catches those; reciprocal-rank fusion (RRF) merges the
+two ranked lists without having to calibrate BM25 scores against cosines.
+
+On-disk format (LEXICAL_INDEX_PATH, e.g. backend/index/quoteplan_chunks_bm25.json):
+    {"ids": [...], "texts": [...], "hashes": [...], "fingerprint": [...]}
+Texts are re-tokenized on load (a few ms for the manual); postings are not stored.
+"""
+
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "is", "are", "be", "by",
+    "it", "this", "that", "as", "at", "from", "how", "do", "i", "can", "what", "you", "your", "me",
+}
+
+
+def tokenize(text):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def _text_hash(text):
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring; documents can be added/removed in place."""
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = None
+        self._docs = {}       # id -> {"text", "hash", "len"}
+        self._postings = {}   # term -> {id: term frequency}
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    @property
+    def ready(self):
+        return bool(self._docs)
+
+    def _add(self, doc_id, text):
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        self._docs[doc_id] = {"text": text, "hash": _text_hash(text), "len": length}
+        self._total_len += length
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_len -= doc["len"]
+        for term in set(tokenize(doc["text"])):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def upsert(self, doc_id, text):
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, text)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    @staticmethod
+    def _scroll(client, collection, batch_size=256):
+        offset = None
+        while True:
+            points, offset = client.scroll(collection_name=collection, limit=batch_size, offset=offset,
+                                           with_payload=True, with_vectors=False)
+            yield from points
+            if offset is None:
+                break
+
+    def refresh(self, client, collection, fingerprint=None):
+        """Sync with the collection payloads: index new/edited chunks, drop deleted ones."""
+        remote = {}
+        for point in self._scroll(client, collection):
+            payload = point.payload if isinstance(point.payload, dict) else {}
+            remote[point.id] = payload.get("text") or ""
+        changes = {"added": 0, "updated": 0, "removed": 0}
+        with self._lock:
+            for doc_id in set(self._docs) - set(remote):
+                self._remove(doc_id)
+                changes["removed"] += 1
+            for doc_id, text in remote.items():
+                doc = self._docs.get(doc_id)
+                if doc is not None and doc["hash"] == _text_hash(text):
+                    continue
+                changes["updated" if doc is not None else "added"] += 1
+                self._remove(doc_id)
+                self._add(doc_id, text)
+            self.fingerprint = fingerprint
+        return changes
+
+    def search(self, query, top_k=5):
+        """Return [{id, text, score}] ranked by BM25, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._docs)
+            if not n or not terms:
+                return []
+            avg_len = self._total_len / n
+            scores = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._docs[doc_id]["len"] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:top_k]
+            return [{"id": doc_id, "text": self._docs[doc_id]["text"], "score": score} for doc_id, score in best]
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            ids = list(self._docs)
+            data = {
+                "ids": ids,
+                "texts": [self._docs[i]["text"] for i in ids],
+                "hashes": [self._docs[i]["hash"] for i in ids],
+                "fingerprint": self.fingerprint,
+            }
+        path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+
+    def load(self, path):
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        with self._lock:
+            self._docs, self._postings, self._total_len = {}, {}, 0
+            for doc_id, text in zip(data["ids"], data["texts"]):
+                self._add(doc_id, text)
+            fingerprint = data.get("fingerprint")
+            self.fingerprint = tuple(fingerprint) if fingerprint is not None else None
+        return len(self._docs)
+
+
+def reciprocal_rank_fusion(result_lists, top_k=5, k=60):
+    """Merge ranked [{id, text, score}] lists by sum of 1 / (k + rank).
+
+    Each fused result keeps the first list's "score" (dense cosine) when the
+    chunk came from it, and carries its fused score as "rrf_score".
+    """
+    fused = {}
+    for list_index, results in enumerate(result_lists):
+        for rank, item in enumerate(results):
+            entry = fused.get(item["id"])
+            if entry is None:
+                entry = fused[item["id"]] = {"id": item["id"], "text": item.get("text"),
+                                             "score": item.get("score") if list_index == 0 else None,
+                                             "rrf_score": 0.0}
+            entry["rrf_score"] += 1.0 / (k + rank + 1)
+    ranked = sorted(fused.values(), key=lambda e: e["rrf_score"], reverse=True)
+    return ranked[:top_k]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+In-process vector index for the (small, rarely changing) QuotePlan manual
+
+Snapshots the collection's vectors and payload texts into one normalized
+float32/float16 matrix and answers top-k with a single NumPy dot product,
+so retrieval stays sub-millisecond and keeps working through brief Qdrant
+outages.
+
+On-disk format (LOCAL_INDEX_PATH, e.g. backend/index/quoteplan_chunks):
+    <path>.npy   - (n, dim) matrix, opened memory-mapped
+    <path>.json  - {"ids": [...], "texts": [...], "fingerprint": [...]}
+"""
+
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+def _text_of(payload):
+    if isinstance(payload, dict):
+        return payload.get("text")
+    return None
+
+
+def _vector_of(point, vector_name=None):
+    vector = getattr(point, "vector", None)
+    if isinstance(vector, dict):
+        vector = vector.get(vector_name) if vector_name else next(iter(vector.values()), None)
+    return vector
+
+
+def _payload_hash(text):
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+class LocalVectorIndex:
+    """Normalized embedding matrix + payload texts with vectorized cosine top-k."""
+
+    def __init__(self, dtype="float32", vector_name=None):
+        self.dtype = np.dtype(dtype)
+        self.vector_name = vector_name
+        self.ids = []
+        self.texts = []
+        self.matrix = None
+        self.fingerprint = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def ready(self):
+        return self.matrix is not None and len(self.ids) > 0
+
+    def _set(self, ids, texts, vectors, fingerprint):
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = (matrix / np.clip(norms, 1e-12, None)).astype(self.dtype)
+        with self._lock:
+            self.ids, self.texts, self.matrix = list(ids), list(texts), matrix
+            self.fingerprint = fingerprint
+
+    @staticmethod
+    def _scroll(client, collection, with_vectors, batch_size=256):
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors,
+            )
+            yield from points
+            if offset is None:
+                break
+
+    def snapshot(self, client, collection, fingerprint=None):
+        """Load every point's vector and text from Qdrant."""
+        ids, texts, vectors = [], [], []
+        for point in self._scroll(client, collection, with_vectors=True):
+            ids.append(point.id)
+            texts.append(_text_of(point.payload))
+            vectors.append(_vector_of(point, self.vector_name))
+        self._set(ids, texts, vectors, fingerprint)
+        return len(ids)
+
+    def refresh(self, client, collection, fingerprint=None):
+        """Incremental update: fetch vectors only for new or edited points, drop deleted ones."""
+        if not self.ready:
+            return {"added": self.snapshot(client, collection, fingerprint), "updated": 0, "removed": 0}
+
+        with self._lock:
+            current = {pid: (i, _payload_hash(t)) for i, (pid, t) in enumerate(zip(self.ids, self.texts))}
+            matrix = self.matrix
+
+        remote_ids, remote_texts, stale = [], {}, []
+        for point in self._scroll(client, collection, with_vectors=False):
+            text = _text_of(point.payload)
+            remote_ids.append(point.id)
+            remote_texts[point.id] = text
+            local = current.get(point.id)
+            if local is None or local[1] != _payload_hash(text):
+                stale.append(point.id)
+
+        fetched = {}
+        for start in range(0, len(stale), 256):
+            for point in client.retrieve(collection_name=collection, ids=stale[start:start + 256],
+                                         with_payload=False, with_vectors=True):
+                fetched[point.id] = _vector_of(point, self.vector_name)
+
+        vectors = []
+        for pid in remote_ids:
+            if pid in fetched:
+                vectors.append(np.asarray(fetched[pid], dtype=np.float32))
+            else:
+                vectors.append(np.asarray(matrix[current[pid][0]], dtype=np.float32))
+        removed = len(set(current) - set(remote_ids))
+        updated = sum(1 for pid in stale if pid in current)
+        self._set(remote_ids, [remote_texts[pid] for pid in remote_ids], vectors, fingerprint)
+        return {"added": len(stale) - updated, "updated": updated, "removed": removed}
+
+    def search(self, query_vector, top_k=5):
+        """Return [{id, text, score}] by cosine similarity, best first."""
+        with self._lock:
+            matrix, ids, texts = self.matrix, self.ids, self.texts
+        q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        scores = np.asarray(matrix @ q.astype(matrix.dtype), dtype=np.float32)
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"id": ids[i], "text": texts[i], "score": float(scores[i])} for i in top]
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            np.save(path.with_suffix(".npy"), np.ascontiguousarray(self.matrix))
+            meta = {"ids": self.ids, "texts": self.texts, "fingerprint": self.fingerprint,
+                    "dtype": self.dtype.name}
+        path.with_suffix(".json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    def load(self, path):
+        """Load a saved index; the matrix is memory-mapped rather than read into RAM."""
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+        matrix = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        fingerprint = meta.get("fingerprint")
+        with self._lock:
+            self.ids, self.texts, self.matrix = meta["ids"], meta["texts"], matrix
+            self.fingerprint = tuple(fingerprint) if fingerprint is not None else None
+            self.dtype = matrix.dtype
+        return len(self.ids)
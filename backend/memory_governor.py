@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Memory-budget-driven garbage collection
+
+Replaces the forced gc.collect() after every request. A full collection
+walks every tracked object, and once the embedding model is loaded that is
+hundreds of thousands of objects per response. Instead:
+
+- freeze(): after the model (and other long-lived state) is loaded, move
+  everything into the permanent generation so collections skip it (and
+  forked workers don't dirty those pages)
+- thresholds: fewer generation-0 collections for the short-lived
+  per-request objects, which reference counting frees anyway
+- check(): called after each request, reads RSS at most every
+  check_interval seconds; above soft_ratio * budget it runs a full
+  collection (at most every collect_interval seconds), above
+  hard_ratio * budget it also asks registered caches to shrink (at most
+  every shrink_interval seconds), so RSS held up by the resident model
+  does not turn into a GC pause and an emptied cache on every request
+"""
+
+import gc
+import threading
+import time
+
+
+class MemoryGovernor:
+    """Collects garbage and shrinks caches only when RSS approaches the budget."""
+
+    def __init__(self, budget_bytes, rss, soft_ratio=0.8, hard_ratio=0.9, check_interval=1.0,
+                 collect_interval=30.0, shrink_interval=300.0):
+        self.budget_bytes = budget_bytes
+        self.soft_bytes = int(budget_bytes * soft_ratio)
+        self.hard_bytes = int(budget_bytes * hard_ratio)
+        self.check_interval = check_interval
+        self.collect_interval = collect_interval
+        self.shrink_interval = shrink_interval
+        self.actions = {"collect": 0, "shrink": 0}
+        self.last_rss = 0
+        self._rss = rss
+        self._shrinkers = []
+        self._checked_at = 0.0
+        self._collected_at = float("-inf")
+        self._shrunk_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def add_shrinker(self, name, fn):
+        """fn() releases memory (e.g. halves a cache); called above the hard limit."""
+        self._shrinkers.append((name, fn))
+
+    @staticmethod
+    def set_thresholds(spec):
+        """Apply "gen0,gen1,gen2" collection thresholds; empty keeps the interpreter defaults."""
+        if spec:
+            gc.set_threshold(*(int(x) for x in spec.split(",")))
+
+    @staticmethod
+    def freeze():
+        """Collect once, then exclude all surviving objects from future collections."""
+        gc.collect()
+        if hasattr(gc, "freeze"):
+            gc.freeze()
+
+    def check(self):
+        """Cheap post-request hook; returns the action taken ("collect", "shrink") or None."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return None
+            self._checked_at = now
+            rss = self.last_rss = self._rss()
+            if rss < self.soft_bytes or now - self._collected_at < self.collect_interval:
+                return None
+            self._collected_at = now
+            may_shrink = now - self._shrunk_at >= self.shrink_interval
+
+        gc.collect()
+        rss = self.last_rss = self._rss()
+        if rss < self.hard_bytes or not may_shrink:
+            self.actions["collect"] += 1
+            return "collect"
+        with self._lock:
+            self._shrunk_at = now
+
+        for name, fn in self._shrinkers:
+            try:
+                fn()
+            except Exception as e:
+                print(f"[memory] could not shrink {name}: {e}")
+        gc.collect()
+        self.last_rss = self._rss()
+        self.actions["shrink"] += 1
+        print(f"[memory] RSS {rss / 1048576:.0f} MB over {self.hard_bytes / 1048576:.0f} MB, "
+              f"shrank caches -> {self.last_rss / 1048576:.0f} MB")
+        return "shrink"
+
+    def stats(self):
+        return {
+            "budget_bytes": self.budget_bytes,
+            "soft_bytes": self.soft_bytes,
+            "hard_bytes": self.hard_bytes,
+            "rss_bytes": self.last_rss,
+            "actions": dict(self.actions),
+            "gc_thresholds": gc.get_threshold(),
+            "frozen_objects": gc.get_freeze_count() if hasattr(gc, "get_freeze_count") else 0,
+        }
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Lightweight latency / resource instrumentation (no prometheus_client needed)
+
+- stage("embed") timers feed per-stage latency histograms and, when a trace
+  is active in the current context (thread, or asyncio task), a per-request
+  timings dict (debug mode)
+- inc() counters for requests, timeouts, fallbacks, ...
+- register_collector() lets modules export their own gauges (cache, sessions,
+  providers) at scrape time
+- render() produces the Prometheus text exposition format for /metrics
+"""
+
+import contextvars
+import gc
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    """Cumulative latency histogram (seconds) with percentile estimates from bucket bounds."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0,
+               13.0, 20.0, 30.0, 60.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+            else:
+                self.counts[-1] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th quantile (0..1); None without samples."""
+        with self._lock:
+            if not self.count:
+                return None
+            target = p * self.count
+            cumulative = 0
+            for i, c in enumerate(self.counts):
+                cumulative += c
+                if cumulative >= target:
+                    return self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            return {"buckets": list(self.buckets), "counts": list(self.counts),
+                    "count": self.count, "sum": self.sum}
+
+
+_lock = threading.Lock()
+_counters = {}    # (name, labels) -> value
+_histograms = {}  # (name, labels) -> LatencyHistogram
+_help = {}
+_collectors = []
+# Per-request state: one value per thread under Flask, per task on the asyncio loop
+_trace = contextvars.ContextVar("quoteplan_trace", default=None)
+_usage = contextvars.ContextVar("quoteplan_usage", default=None)
+
+# Time spent inside the garbage collector, measured with gc.callbacks
+_gc_state = {"start": None, "pause_seconds": 0.0, "collections": 0}
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name, help_text):
+    _help[name] = help_text
+
+
+def inc(name, amount=1, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    key = (name, _labels_key(labels))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = LatencyHistogram()
+    hist.observe(seconds)
+
+
+def start_trace():
+    """Begin collecting stage timings (and LLM token usage) for the current request.
+
+    Tasks and to_thread() calls started afterwards copy the context, so they add to the same dicts.
+    """
+    _trace.set({})
+    _usage.set({})
+
+
+def end_trace():
+    """Return {stage: milliseconds} collected since start_trace() and stop tracing."""
+    trace = _trace.get()
+    _trace.set(None)
+    return {k: round(v * 1000, 2) for k, v in (trace or {}).items()}
+
+
+def current_usage():
+    """This request's token usage dict (filled by chat_providers), or None outside a trace."""
+    return _usage.get()
+
+
+def end_usage():
+    """Return {prompt_tokens, cached_tokens, completion_tokens, calls} for this request and stop collecting."""
+    usage = _usage.get()
+    _usage.set(None)
+    return usage or {}
+
+
+@contextmanager
+def stage(name):
+    """Time a pipeline stage into quoteplan_stage_seconds{stage=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("quoteplan_stage_seconds", elapsed, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace[name] = trace.get(name, 0.0) + elapsed
+
+
+def register_collector(fn):
+    """fn() -> iterable of (name, type, help, [(labels_dict, value), ...])."""
+    _collectors.append(fn)
+
+
+def rss_bytes():
+    """Current resident set size (Linux /proc), else peak RSS from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak * 1024 if os.uname().sysname != "Darwin" else peak
+
+
+def _gc_callback(phase, info):
+    if phase == "start":
+        _gc_state["start"] = time.perf_counter()
+    elif _gc_state["start"] is not None:
+        _gc_state["pause_seconds"] += time.perf_counter() - _gc_state["start"]
+        _gc_state["collections"] += 1
+        _gc_state["start"] = None
+
+
+gc.callbacks.append(_gc_callback)
+
+
+def _process_metrics():
+    yield ("process_resident_memory_bytes", "gauge", "Resident set size", [({}, rss_bytes())])
+    yield ("python_gc_objects_tracked", "gauge", "Objects in each GC generation",
+           [({"generation": str(i)}, c) for i, c in enumerate(gc.get_count())])
+    yield ("python_gc_collections_total", "counter", "Collections per generation",
+           [({"generation": str(i)}, s["collections"]) for i, s in enumerate(gc.get_stats())])
+    yield ("python_gc_pause_seconds_total", "counter", "Time spent in garbage collection",
+           [({}, _gc_state["pause_seconds"])])
+    if hasattr(gc, "get_freeze_count"):
+        yield ("python_gc_frozen_objects", "gauge", "Objects moved to the permanent generation",
+               [({}, gc.get_freeze_count())])
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render():
+    """Prometheus text exposition of all counters, histograms and collectors."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items(), key=lambda kv: kv[0])
+
+    seen = set()
+    for (name, labels), value in counters:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {_help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_fmt_labels(labels)} {value}")
+
+    for (name, labels), hist in histograms:
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# HELP {name} {_help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        lines.extend(_histogram_lines(name, labels, hist))
+
+    for collector in [_process_metrics] + _collectors:
+        try:
+            families = list(collector())
+        except Exception as e:
+            lines.append(f"# collector error: {e}")
+            continue
+        for name, mtype, help_text, samples in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {mtype}")
+            for labels, value in samples:
+                if mtype == "histogram":
+                    lines.extend(_histogram_lines(name, _labels_key(labels), value))
+                else:
+                    lines.append(f"{name}{_fmt_labels(_labels_key(labels))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, labels, hist):
+    snap = hist.snapshot()
+    out, cumulative = [], 0
+    for bound, count in zip(snap["buckets"] + ["+Inf"], snap["counts"]):
+        cumulative += count
+        out.append(f"{name}_bucket{_fmt_labels(labels + (('le', str(bound)),))} {cumulative}")
+    out.append(f"{name}_sum{_fmt_labels(labels)} {snap['sum']}")
+    out.append(f"{name}_count{_fmt_labels(labels)} {snap['count']}")
+    return out
+
+
+describe("quoteplan_stage_seconds", "Latency of answer pipeline stages")
+describe("quoteplan_requests_total", "API requests by route and outcome")
+describe("quoteplan_timeouts_total", "Requests that hit the model timeout")
+describe("quoteplan_fallbacks_total", "Generic fallback answers served")
+describe("quoteplan_provider_calls_total", "Chat provider calls by outcome")
+describe("quoteplan_intents_total", "Questions routed per intent (greeting, follow_up, rag)")
+describe("quoteplan_pipeline_errors_total", "Questions that failed inside the answer pipeline")
+describe("quoteplan_llm_tokens_total", "Provider-reported tokens by kind (prompt includes cached)")
+describe("quoteplan_llm_calls_with_usage_total", "LLM calls that reported token usage")
+describe("quoteplan_rerank_total", "Rerank attempts by outcome (reranked, timeout, busy, error, skipped)")
+describe("quoteplan_batch_questions_total", "Batch questions answered by source (llm, cache, faq, greeting, no_context, error)")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Qdrant search capability detection
+
+qdrant-client renamed its search API across versions (search / search_points
+-> query_points, search_batch -> query_batch_points). Instead of trying each
+name on every query and swallowing errors, the client is inspected once and
+the best available call is bound. Real errors (network, missing collection)
+propagate instead of being masked by the next candidate.
+"""
+
+import threading
+import time
+
+import metrics
+
+# Preferred first: query_* is the current API, search* is deprecated/removed in newer clients
+SINGLE_METHODS = ("query_points", "search", "search_points")
+BATCH_METHODS = ("query_batch_points", "search_batch")
+
+metrics.describe("quoteplan_qdrant_seconds", "Qdrant search call latency, by client method")
+
+
+class QdrantSearcher:
+    """Binds the fastest supported single and batch search call of a qdrant-client once."""
+
+    def __init__(self, get_client, collection_name):
+        # get_client() returns the QdrantClient (kept as a callable so the client can be swapped)
+        self.get_client = get_client
+        self.collection_name = collection_name
+        self.single_method = None
+        self.batch_method = None
+        self._resolved_for = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """Inspect the client once and pick the methods to use."""
+        client = self.get_client()
+        if self._resolved_for is client:
+            return
+        with self._lock:
+            if self._resolved_for is client:
+                return
+            self.single_method = next((m for m in SINGLE_METHODS if callable(getattr(client, m, None))), None)
+            self.batch_method = next((m for m in BATCH_METHODS if callable(getattr(client, m, None))), None)
+            if self.single_method is None:
+                raise RuntimeError("Unable to call Qdrant search API — check qdrant-client version.")
+            print(f"[qdrant] using {self.single_method} (batch: {self.batch_method or 'sequential'})")
+            self._resolved_for = client
+
+    def _timed(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            metrics.observe("quoteplan_qdrant_seconds", time.perf_counter() - start, method=name)
+
+    def search(self, query_vector, top_k=5):
+        """Return the raw hits (ScoredPoint list) for one query vector."""
+        self.resolve()
+        client = self.get_client()
+        method = self.single_method
+        if method == "query_points":
+            res = self._timed(method, client.query_points, collection_name=self.collection_name,
+                              query=query_vector, limit=top_k, with_payload=True)
+            return getattr(res, "points", res)
+        if method == "search":
+            return self._timed(method, client.search, collection_name=self.collection_name,
+                               query_vector=query_vector, limit=top_k, with_payload=True)
+        return self._timed(method, client.search_points, collection_name=self.collection_name,
+                           vector=query_vector, limit=top_k, with_payload=True)
+
+    def search_batch(self, query_vectors, top_k=5):
+        """Return one hit list per query vector, in a single round-trip when the client supports it."""
+        query_vectors = list(query_vectors)
+        if not query_vectors:
+            return []
+        self.resolve()
+        client = self.get_client()
+        method = self.batch_method
+        if method == "query_batch_points":
+            from qdrant_client import models
+            requests = [models.QueryRequest(query=v, limit=top_k, with_payload=True) for v in query_vectors]
+            responses = self._timed(method, client.query_batch_points,
+                                    collection_name=self.collection_name, requests=requests)
+            return [getattr(r, "points", r) for r in responses]
+        if method == "search_batch":
+            from qdrant_client import models
+            requests = [models.SearchRequest(vector=v, limit=top_k, with_payload=True) for v in query_vectors]
+            return self._timed(method, client.search_batch,
+                               collection_name=self.collection_name, requests=requests)
+        return [self.search(v, top_k=top_k) for v in query_vectors]
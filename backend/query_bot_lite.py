@@ -11,12 +11,28 @@ Key Optimizations:
 
 import os
 import json
-import requests
 import random
-import gc
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
+
+import chat_providers
+from answer_cache import SemanticAnswerCache
+from embedding_batcher import EmbeddingBatcher
+import session_memory
+import embedding_backends
+from local_index import LocalVectorIndex
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from reranker import Reranker
+from qdrant_search import QdrantSearcher
+from context_builder import build_context, count_tokens, format_context
+from intent_router import FOLLOW_UP, GREETING, IntentRouter
+from faq_tier import FaqIndex
+from single_flight import SingleFlight, normalize_question
+from memory_governor import MemoryGovernor
+import metrics
 
 # Get project root (parent of backend directory)
 BACKEND_DIR = Path(__file__).parent
@@ -25,47 +41,53 @@ PROJECT_ROOT = BACKEND_DIR.parent
 # Load .env from project root
 load_dotenv(PROJECT_ROOT / ".env")
 
-# Simple in‑memory chat memory for a single user (last question & answer)
-CHAT_MEMORY = {}
-
-# Keywords that indicate a follow‑up request. All checks are case‑insensitive.
-FOLLOW_UP_KEYWORDS = {
-    # short / summary
-    "short", "brief", "summarize", "summary", "short me", "short mein",
-    # detail / explanation
-    "detail", "details", "explain", "explanation", "aur detail", "detail me", "detail mein",
-    # reference to previous answer
-    "same", "wahi", "yehi", "ye", "iska", "uska", "iska matlab", "uska matlab",
-    # continuation / more info
-    "aur", "aur batao", "aur samjhao", "continue", "continue karo", "aage batao",
-    # formatting / change style
-    "steps", "step", "step by step", "points", "bullet", "list me", "points me",
-    # clarification / rephrase
-    "dubara", "phir se", "repeat", "rephrase", "simplify", "easy language", "simple language",
-    # language / tone changes
-    "hinglish", "english me", "hindi me", "simple words"
-}
+# Per-session chat memory (last question & answer), keyed by the frontend's session id.
+# SESSION_STORE: "memory" (in-process LRU), "sqlite:///path.db" or "redis://..." to share across workers
+SESSION_STORE = session_memory.create_store(
+    os.getenv("SESSION_STORE", "memory"),
+    max_sessions=int(os.getenv("SESSION_MAX", "1000")),
+    ttl_seconds=float(os.getenv("SESSION_TTL", "1800")),
+    max_chars=int(os.getenv("SESSION_MAX_CHARS", "4000")),
+)
 
 
-def _is_follow_up(question: str) -> bool:
-    """Return True if the question looks like a follow‑up."""
-    ql = question.lower()
-    return any(kw in ql for kw in FOLLOW_UP_KEYWORDS)
+def _previous_answer(session_id):
+    session_id = session_memory.normalize_session_id(session_id)
+    if session_id is None:
+        return None  # no (valid) session id: stateless, never a shared default session
+    memory = SESSION_STORE.get(session_id)
+    return memory["last_answer"] if memory else None
 
 
-GREETING_KEYWORDS = {
-    "hi", "hello", "hey", "how are you", "good morning", "good afternoon", "good evening",
-}
+def _remember(session_id, question, answer_text):
+    session_id = session_memory.normalize_session_id(session_id)
+    if session_id is not None:
+        SESSION_STORE.set(session_id, question, answer_text)
+
+
+def session_memory_stats():
+    """Number of sessions held and characters stored (memory is capped per session)."""
+    return SESSION_STORE.stats()
+
+# Greeting / follow-up / RAG routing: one word-boundary pass over the message
+intent_router = IntentRouter()
+
+
+def classify_intent(question: str) -> str:
+    """Return intent_router.GREETING, FOLLOW_UP or RAG for a question."""
+    intent = intent_router.classify(question)
+    metrics.inc("quoteplan_intents_total", intent=intent)
+    return intent
+
+
+def _is_follow_up(question: str) -> bool:
+    """Return True if the question looks like a follow‑up."""
+    return intent_router.classify(question) == FOLLOW_UP
 
 
 def _is_greeting(question: str) -> bool:
-    ql = question.lower().strip()
-    if not ql:
-        return False
-    for kw in GREETING_KEYWORDS:
-        if ql == kw or ql.startswith(kw + " ") or ql.startswith(kw + "!") or ql.startswith(kw + ","):
-            return True
-    return False
+    return intent_router.classify(question) == GREETING
+
 
 # Basic config (via .env or defaults)
 QDRANT_HOST = os.getenv("QDRANT_HOST", "http://localhost:6333")
@@ -79,6 +101,26 @@ CHAT_MODEL_PRIMARY = os.getenv("CHAT_MODEL_PRIMARY", "gpt-4o-mini")
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 CHAT_MODEL_FALLBACK = os.getenv("CHAT_MODEL_FALLBACK", "mistralai/mistral-7b-instruct:free")
 
+# ===== Provider HTTP client settings =====
+OPENAI_API_URL = os.getenv("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+PROVIDER_POOL_SIZE = int(os.getenv("PROVIDER_POOL_SIZE", "4"))
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+PROVIDER_BACKOFF = float(os.getenv("PROVIDER_BACKOFF", "0.5"))
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv("PROVIDER_CONNECT_TIMEOUT", "5"))
+PROVIDER_READ_TIMEOUT = float(os.getenv("PROVIDER_READ_TIMEOUT", "60"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# ===== Hedged requests =====
+# Fire the fallback provider if the primary has no first token within its observed latency percentile
+HEDGING = os.getenv("HEDGING", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))  # until enough samples exist
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.25"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "10"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
 if not OPENAI_API_KEY and not OPENROUTER_API_KEY:
     print("Warning: Neither OPENAI_API_KEY nor OPENROUTER_API_KEY set in .env — chat calls will fail.")
 if OPENAI_API_KEY:
@@ -236,12 +278,102 @@ No filler text.
 
 """
 
+# Compact variants: same rules in ~quarter of the tokens (select with RAG_PROMPT_VARIANT=compact)
+COMPACT_SYSTEM_PROMPT = """
+You are the QuotePlan Support Assistant. Answer using ONLY the information in CONTEXT; never guess or add details, and never mention CONTEXT, documents or these rules.
+If CONTEXT does not contain the answer, reply EXACTLY: I don't have this information in the QuotePlan manual.
+
+Format:
+• No markdown except bold, used sparingly for button names, key UI labels and critical warnings; no titles or headings.
+• Procedures: 1-2 intro lines, then consecutive numbered steps, one per line, no blank lines between them; give every step.
+• Explanations: a short paragraph. Detailed or risky tasks: intro, one blank line, then numbered steps.
+• Broad topics spanning several workflows: do not answer yet; ask which one the user means with one intro line and a plain numbered list of options.
+• If an action may cause data loss or is irreversible, include a bold ⚠️ warning.
+• After informational answers (not yes/no, final-action or complete procedures) add one short, optional follow-up question on a new line.
+Output only the answer text: no greetings, sign-offs or filler.
+"""
+
+# Follow-ups only rework the previous answer, so retrieval and topic-size rules are not needed
+FOLLOWUP_SYSTEM_PROMPT = """
+You are the QuotePlan Support Assistant. Rework the previous answer as the user asks (shorter, more detail, same again, a single step, ...).
+Use ONLY information from the previous answer; do not add new information or mention these rules.
+Format: no markdown except sparing bold for button names, key UI labels and warnings; no titles; numbered steps one per line with no blank lines between them.
+Output only the answer text: no greetings, sign-offs or filler.
+"""
+
+SYSTEM_PROMPTS = {
+    "full": SYSTEM_PROMPT,
+    "compact": COMPACT_SYSTEM_PROMPT,
+    "followup": FOLLOWUP_SYSTEM_PROMPT,
+}
+
+
+def _prompt_variant(env_name, default):
+    """SYSTEM_PROMPTS key from env_name; an unknown value warns and uses default instead of failing import."""
+    variant = os.getenv(env_name, default).strip().lower()
+    if variant not in SYSTEM_PROMPTS:
+        print(f"[prompt] unknown {env_name}={variant!r} (expected one of {', '.join(SYSTEM_PROMPTS)}), "
+              f"using {default!r}")
+        return default
+    return variant
+
+
+# The system prompt is sent first and byte-identical on every call, so providers can serve it
+# from their prompt cache; only the user message (context + question) varies
+RAG_PROMPT_VARIANT = _prompt_variant("RAG_PROMPT_VARIANT", "full")
+FOLLOWUP_PROMPT_VARIANT = _prompt_variant("FOLLOWUP_PROMPT_VARIANT", "followup")
+RAG_SYSTEM_PROMPT = SYSTEM_PROMPTS[RAG_PROMPT_VARIANT]
+FOLLOWUP_PROMPT = SYSTEM_PROMPTS[FOLLOWUP_PROMPT_VARIANT]
+# OpenAI routes requests with the same prompt_cache_key to the same cache; empty disables
+PROMPT_CACHE_KEY = os.getenv("PROMPT_CACHE_KEY", "quoteplan-support")
+
+
+def _make_provider(name, url, api_key, model, extra_payload=None):
+    return chat_providers.ProviderClient(
+        name, url, api_key, model,
+        extra_payload=extra_payload,
+        pool_size=PROVIDER_POOL_SIZE,
+        max_retries=PROVIDER_MAX_RETRIES,
+        backoff_factor=PROVIDER_BACKOFF,
+        connect_timeout=PROVIDER_CONNECT_TIMEOUT,
+        read_timeout=PROVIDER_READ_TIMEOUT,
+        failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds=CIRCUIT_RESET_SECONDS,
+    )
+
+
+# Pooled keep-alive clients, in fallback order (primary first)
+openai_provider = _make_provider("OpenAI", OPENAI_API_URL, OPENAI_API_KEY, CHAT_MODEL_PRIMARY,
+                                 extra_payload={"prompt_cache_key": PROMPT_CACHE_KEY} if PROMPT_CACHE_KEY else None)
+openrouter_provider = _make_provider("OpenRouter", OPENROUTER_API_URL, OPENROUTER_API_KEY, CHAT_MODEL_FALLBACK)
+CHAT_PROVIDERS = [openai_provider, openrouter_provider]
+
 # Initialize Qdrant client
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
-qdrant = QdrantClient(
-    url=QDRANT_HOST,
-    api_key=QDRANT_API_KEY,
-)
+
+
+def _connect_qdrant():
+    from qdrant_client import QdrantClient  # ~0.7 s of imports: paid on first use, not at startup
+
+    return QdrantClient(
+        url=QDRANT_HOST,
+        api_key=QDRANT_API_KEY,
+    )
+
+
+# Created on first use by get_qdrant() (tests and benchmarks may assign a client directly)
+qdrant = None
+_qdrant_lock = threading.Lock()
+
+
+def get_qdrant():
+    """Return the shared QdrantClient, constructing it on first use."""
+    global qdrant
+    if qdrant is None:
+        with _qdrant_lock:
+            if qdrant is None:
+                qdrant = _connect_qdrant()
+    return qdrant
 
 # ===== LAZY MODEL LOADING (Memory Optimization) =====
 # Don't load model at startup - load only when needed
@@ -249,84 +381,382 @@ _embedding_model = None
 EMBEDDING_DIM = 384
 
 
+_embedding_model_lock = threading.Lock()
+
+# Embedding backend: "torch" (sentence-transformers) or "onnx" (ONNX Runtime, lower RSS)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch").lower()
+
+# Micro-batching: concurrent questions share one encode() forward pass
+EMBED_BATCHING = os.getenv("EMBED_BATCHING", "1") == "1"
+EMBED_BATCH_MAX = int(os.getenv("EMBED_BATCH_MAX", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+
+
 def get_embedding_model():
     """Lazy load embedding model only when needed (saves ~250 MB at startup)"""
     global _embedding_model
     if _embedding_model is None:
-        try:
-            print("[LITE] Loading embedding model (lazy load)...")
-            from sentence_transformers import SentenceTransformer
-            # Use device='cpu' and optimize for memory
-            _embedding_model = SentenceTransformer("all-MiniLM-L6-v2", device='cpu')
-            # Clear cache to free memory
-            gc.collect()
-            print("[LITE] Embedding model loaded successfully")
-        except Exception as e:
-            print(f"[LITE] Could not load embedding model: {e}")
-            _embedding_model = False  # Mark as failed
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                try:
+                    print(f"[LITE] Loading embedding model (lazy load, backend={EMBED_BACKEND})...")
+                    # torch (sentence-transformers) or onnx (ONNX Runtime, optionally int8)
+                    _embedding_model = embedding_backends.load_backend(EMBED_BACKEND)
+                    # Model objects live for the whole process: keep them out of future collections
+                    if GC_FREEZE:
+                        memory_governor.freeze()
+                    print("[LITE] Embedding model loaded successfully")
+                except Exception as e:
+                    print(f"[LITE] Could not load embedding model: {e}")
+                    _embedding_model = False  # Mark as failed
     return _embedding_model if _embedding_model is not False else None
 
 
+def _encode_batch(texts):
+    """Encode a list of texts in one forward pass; zero vectors if the model is unavailable."""
+    model = get_embedding_model()
+    if not model:
+        # fallback: zero vectors (not ideal, but prevents crashes)
+        return [[0.0] * EMBEDDING_DIM for _ in texts]
+    return model.encode(list(texts)).tolist()
+
+
+_embedding_batcher = EmbeddingBatcher(
+    _encode_batch, max_batch=EMBED_BATCH_MAX, max_wait_ms=EMBED_BATCH_WAIT_MS
+) if EMBED_BATCHING else None
+
+
+def embed_texts(texts):
+    """Return one embedding vector per text, encoded as a single batch."""
+    texts = list(texts)
+    if not texts:
+        return []
+    return _encode_batch(texts)
+
+
 def embed_text(text):
     """Return embedding vector (list of floats). Uses lazy-loaded local model."""
-    model = get_embedding_model()
-    if model:
-        # Memory-efficient encoding
-        emb = model.encode(text, show_progress_bar=False, convert_to_numpy=True)
+    if _embedding_batcher is not None:
+        return _embedding_batcher.embed(text)
+    return _encode_batch([text])[0]
+
+
+def embedding_batcher_stats():
+    if _embedding_batcher is None:
+        return {"enabled": False}
+    return dict(_embedding_batcher.stats(), enabled=True)
+
+
+# ===== SEMANTIC ANSWER CACHE =====
+# Reuse answers for near-duplicate questions (cosine similarity on embed_text vectors)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_MAX_MB = float(os.getenv("ANSWER_CACHE_MAX_MB", "4"))
+# How often to compare the collection fingerprint (invalidates on re-index)
+ANSWER_CACHE_CHECK_SECONDS = float(os.getenv("ANSWER_CACHE_CHECK_SECONDS", "60"))
+
+answer_cache = SemanticAnswerCache(
+    EMBEDDING_DIM,
+    threshold=ANSWER_CACHE_THRESHOLD,
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    max_bytes=int(ANSWER_CACHE_MAX_MB * 1024 * 1024),
+) if ANSWER_CACHE_ENABLED else None
+_cache_checked_at = 0.0
+
+
+def _collection_fingerprint():
+    """Cheap summary of the collection that changes when its content is re-indexed."""
+    info = get_qdrant().get_collection(COLLECTION_NAME)
+    # ingest.py sets a new revision on every change, including in-place chunk edits
+    metadata = getattr(getattr(info, "config", None), "metadata", None) or {}
+    return (
+        getattr(info, "points_count", None),
+        getattr(info, "indexed_vectors_count", None),
+        getattr(info, "segments_count", None),
+        metadata.get("ingest_revision"),
+    )
+
+
+def lookup_cached_answer(query_embedding):
+    """Return a cached entry for a near-duplicate question, or None."""
+    global _cache_checked_at
+    if answer_cache is None:
+        return None
+    now = time.monotonic()
+    if now - _cache_checked_at >= ANSWER_CACHE_CHECK_SECONDS:
+        _cache_checked_at = now
         try:
-            return emb.tolist()
-        except Exception:
-            return list(map(float, emb))
-    # fallback: zero vector (not ideal, but prevents crashes)
-    return [0.0] * EMBEDDING_DIM
+            if answer_cache.check_fingerprint(_collection_fingerprint()):
+                print("[cache] collection changed, answer cache cleared")
+        except Exception as e:
+            print(f"[cache] could not read collection info: {e}")
+    return answer_cache.get(query_embedding)
+
+
+def store_cached_answer(question, query_embedding, answer_text, retrieved):
+    if answer_cache is not None:
+        answer_cache.put(question, query_embedding, answer_text, retrieved)
+
+
+def answer_cache_stats():
+    """Hit/miss counters and memory usage of the semantic answer cache."""
+    if answer_cache is None:
+        return {"enabled": False}
+    return dict(answer_cache.stats(), enabled=True)
+
+
+# ===== MEMORY GOVERNOR =====
+# Collect garbage / shrink caches only near the memory budget instead of after every request
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", "512"))  # Render free tier limit
+MEMORY_SOFT_RATIO = float(os.getenv("MEMORY_SOFT_RATIO", "0.8"))
+MEMORY_HARD_RATIO = float(os.getenv("MEMORY_HARD_RATIO", "0.9"))
+MEMORY_COLLECT_INTERVAL = float(os.getenv("MEMORY_COLLECT_INTERVAL", "30"))  # min seconds between collections
+MEMORY_SHRINK_INTERVAL = float(os.getenv("MEMORY_SHRINK_INTERVAL", "300"))  # min seconds between cache shrinks
+GC_THRESHOLDS = os.getenv("GC_THRESHOLDS", "10000,20,20")  # empty: interpreter defaults (700,10,10)
+GC_FREEZE = os.getenv("GC_FREEZE", "1") == "1"
+
+memory_governor = MemoryGovernor(
+    budget_bytes=int(MEMORY_BUDGET_MB * 1024 * 1024),
+    rss=metrics.rss_bytes,
+    soft_ratio=MEMORY_SOFT_RATIO,
+    hard_ratio=MEMORY_HARD_RATIO,
+    collect_interval=MEMORY_COLLECT_INTERVAL,
+    shrink_interval=MEMORY_SHRINK_INTERVAL,
+)
+memory_governor.set_thresholds(GC_THRESHOLDS)
+if answer_cache is not None:
+    memory_governor.add_shrinker("answer_cache", answer_cache.shrink)
+if hasattr(SESSION_STORE, "shrink"):
+    memory_governor.add_shrinker("sessions", SESSION_STORE.shrink)
 
 
-def _qdrant_search_flexible(query_vector, top_k=5):
-    """Use available qdrant-client method to search."""
-    # Try qdrant.search (common)
+# ===== FAQ TIER =====
+# Vetted answers for high-frequency questions, built offline with faq_tier.py; served without search/LLM
+FAQ_ENABLED = os.getenv("FAQ_TIER", "1") == "1"
+FAQ_INDEX_PATH = os.getenv("FAQ_INDEX_PATH", str(BACKEND_DIR / "faq" / "faq_index"))
+FAQ_THRESHOLD = float(os.getenv("FAQ_THRESHOLD", "0.9"))
+
+
+def _load_faq_index():
+    if not FAQ_ENABLED or not Path(FAQ_INDEX_PATH).with_suffix(".json").exists():
+        return None
+    index = FaqIndex(threshold=FAQ_THRESHOLD)
     try:
-        hits = qdrant.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=query_vector,
-            limit=top_k,
-            with_payload=True,
-        )
-        return hits
-    except Exception:
-        pass
-
-    # Try qdrant.search_points
+        n = index.load(FAQ_INDEX_PATH)
+    except Exception as e:
+        print(f"[faq] could not load {FAQ_INDEX_PATH}: {e}")
+        return None
+    if index.meta.get("embed_backend") not in (None, EMBED_BACKEND):
+        print(f"[faq] index built with {index.meta['embed_backend']} embeddings, serving {EMBED_BACKEND}")
+    if index.meta.get("dim") not in (None, EMBEDDING_DIM):
+        print(f"[faq] index dimension {index.meta['dim']} != {EMBEDDING_DIM}, FAQ tier disabled")
+        return None
+    print(f"[faq] loaded {n} answers from {FAQ_INDEX_PATH}")
+    return index
+
+
+faq_index = _load_faq_index()
+
+
+def lookup_faq(query_embedding):
+    """Return {"question", "answer", "similarity"} for a matching FAQ, or None."""
+    if faq_index is None:
+        return None
+    return faq_index.lookup(query_embedding)
+
+
+def faq_stats():
+    if faq_index is None:
+        return {"enabled": False}
+    return dict(faq_index.stats(), enabled=True)
+
+
+# Resolve the qdrant-client search API once (no per-query try/except probing)
+qdrant_searcher = QdrantSearcher(get_qdrant, COLLECTION_NAME)
+
+
+def _qdrant_search_flexible(query_vector, top_k=5):
+    """Use the qdrant-client search method resolved at first use."""
+    return qdrant_searcher.search(query_vector, top_k=top_k)
+
+
+# ===== LOCAL VECTOR INDEX (optional) =====
+# Snapshot the collection into an in-process matrix: sub-millisecond top-k, survives Qdrant outages
+LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX", "0") == "1"
+LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", str(BACKEND_DIR / "index" / COLLECTION_NAME))
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # float16 halves the matrix size
+LOCAL_INDEX_CHECK_SECONDS = float(os.getenv("LOCAL_INDEX_CHECK_SECONDS", "300"))
+
+local_index = LocalVectorIndex(dtype=LOCAL_INDEX_DTYPE) if LOCAL_INDEX_ENABLED else None
+_local_index_lock = threading.Lock()
+_local_index_checked_at = 0.0
+_local_index_refreshing = False
+
+
+def load_local_index():
+    """Load the local index from LOCAL_INDEX_PATH, or snapshot it from Qdrant and save it there."""
+    if local_index is None:
+        return False
+    with _local_index_lock:
+        if local_index.ready:
+            return True
+        try:
+            n = local_index.load(LOCAL_INDEX_PATH)
+            print(f"[index] loaded {n} chunks from {LOCAL_INDEX_PATH}")
+            return True
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[index] could not load {LOCAL_INDEX_PATH}: {e}")
+        try:
+            n = local_index.snapshot(get_qdrant(), COLLECTION_NAME, _collection_fingerprint())
+            print(f"[index] snapshotted {n} chunks from Qdrant")
+            local_index.save(LOCAL_INDEX_PATH)
+        except Exception as e:
+            print(f"[index] snapshot failed, using remote search: {e}")
+        return local_index.ready
+
+
+def _refresh_local_index():
+    global _local_index_refreshing
     try:
-        hits = qdrant.search_points(
-            collection_name=COLLECTION_NAME,
-            vector=query_vector,
-            limit=top_k,
-            with_payload=True,
-        )
-        return hits
-    except Exception:
-        pass
-
-    # Try qdrant.query_points (older/newer variants)
+        fingerprint = _collection_fingerprint()
+        if fingerprint != local_index.fingerprint:
+            changes = local_index.refresh(get_qdrant(), COLLECTION_NAME, fingerprint)
+            print(f"[index] refreshed from Qdrant: {changes}")
+            local_index.save(LOCAL_INDEX_PATH)
+    except Exception as e:
+        # Keep serving the existing snapshot while Qdrant is unreachable
+        print(f"[index] refresh skipped: {e}")
+    finally:
+        _local_index_refreshing = False
+
+
+def _maybe_refresh_local_index():
+    """Check the collection fingerprint in the background at most every LOCAL_INDEX_CHECK_SECONDS."""
+    global _local_index_checked_at, _local_index_refreshing
+    now = time.monotonic()
+    if _local_index_refreshing or now - _local_index_checked_at < LOCAL_INDEX_CHECK_SECONDS:
+        return
+    _local_index_checked_at = now
+    _local_index_refreshing = True
+    threading.Thread(target=_refresh_local_index, name="local-index-refresh", daemon=True).start()
+
+
+# ===== HYBRID LEXICAL SEARCH (optional) =====
+# BM25 over the same chunk payloads, fused with dense results by reciprocal rank
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0") == "1"
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", str(BACKEND_DIR / "index" / f"{COLLECTION_NAME}_bm25.json"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "10"))  # per retriever, before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+lexical_index = BM25Index() if HYBRID_SEARCH else None
+_lexical_index_lock = threading.Lock()
+_lexical_index_checked_at = 0.0
+_lexical_index_refreshing = False
+
+
+def load_lexical_index():
+    """Load the BM25 index from LEXICAL_INDEX_PATH, or build it from the collection payloads."""
+    if lexical_index is None:
+        return False
+    with _lexical_index_lock:
+        if lexical_index.ready:
+            return True
+        try:
+            n = lexical_index.load(LEXICAL_INDEX_PATH)
+            print(f"[lexical] loaded {n} chunks from {LEXICAL_INDEX_PATH}")
+            return True
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[lexical] could not load {LEXICAL_INDEX_PATH}: {e}")
+        try:
+            changes = lexical_index.refresh(get_qdrant(), COLLECTION_NAME, _collection_fingerprint())
+            print(f"[lexical] indexed {changes['added']} chunks from Qdrant")
+            lexical_index.save(LEXICAL_INDEX_PATH)
+        except Exception as e:
+            print(f"[lexical] build failed, using dense search only: {e}")
+        return lexical_index.ready
+
+
+def _refresh_lexical_index():
+    global _lexical_index_refreshing
     try:
-        res = qdrant.query_points(
-            collection_name=COLLECTION_NAME,
-            query=query_vector,
-            limit=top_k,
-            with_payload=True,
-        )
-        if hasattr(res, "points"):
-            return res.points
-        return res
-    except Exception:
-        pass
-
-    raise RuntimeError("Unable to call Qdrant search API — check qdrant-client version.")
-
-
-def search_qdrant(query_embedding, top_k=5):
-    """Search Qdrant and return list of dicts: { id, text, score }."""
+        fingerprint = _collection_fingerprint()
+        if fingerprint != lexical_index.fingerprint:
+            changes = lexical_index.refresh(get_qdrant(), COLLECTION_NAME, fingerprint)
+            print(f"[lexical] refreshed from Qdrant: {changes}")
+            lexical_index.save(LEXICAL_INDEX_PATH)
+    except Exception as e:
+        print(f"[lexical] refresh skipped: {e}")
+    finally:
+        _lexical_index_refreshing = False
+
+
+def _maybe_refresh_lexical_index():
+    """Same schedule as the local vector index (LOCAL_INDEX_CHECK_SECONDS)."""
+    global _lexical_index_checked_at, _lexical_index_refreshing
+    now = time.monotonic()
+    if _lexical_index_refreshing or now - _lexical_index_checked_at < LOCAL_INDEX_CHECK_SECONDS:
+        return
+    _lexical_index_checked_at = now
+    _lexical_index_refreshing = True
+    threading.Thread(target=_refresh_lexical_index, name="lexical-index-refresh", daemon=True).start()
+
+
+def _hybrid_ready():
+    return lexical_index is not None and (lexical_index.ready or load_lexical_index())
+
+
+def fuse_with_lexical(dense_results, query_text, top_k=5):
+    """RRF-merge dense results with BM25 results for query_text; returns top_k { id, text, score, rrf_score }."""
+    _maybe_refresh_lexical_index()
+    with metrics.stage("lexical_search"):
+        lexical = lexical_index.search(query_text, top_k=max(top_k, HYBRID_CANDIDATES))
+    return reciprocal_rank_fusion([dense_results, lexical], top_k=top_k, k=RRF_K)
+
+
+def _search_dense(query_embedding, top_k):
+    if local_index is not None and (local_index.ready or load_local_index()):
+        _maybe_refresh_local_index()
+        return local_index.search(query_embedding, top_k=top_k)
     hits = _qdrant_search_flexible(query_embedding, top_k=top_k)
+    return _hits_to_results(hits)
+
+
+def search_qdrant(query_embedding, top_k=5, query_text=None):
+    """Search Qdrant and return list of dicts: { id, text, score }.
+
+    With HYBRID_SEARCH=1 and query_text given, dense and BM25 candidates are
+    fused (results then also carry "rrf_score" and are ordered by it).
+    """
+    if query_text and _hybrid_ready():
+        dense = _search_dense(query_embedding, max(top_k, HYBRID_CANDIDATES))
+        return fuse_with_lexical(dense, query_text, top_k=top_k)
+    return _search_dense(query_embedding, top_k)
+
+
+def search_qdrant_batch(query_embeddings, top_k=5, query_texts=None):
+    """Search several questions at once; returns one { id, text, score } list per embedding."""
+    hybrid = query_texts is not None and _hybrid_ready()
+    limit = max(top_k, HYBRID_CANDIDATES) if hybrid else top_k
+    if local_index is not None and (local_index.ready or load_local_index()):
+        _maybe_refresh_local_index()
+        results = [local_index.search(e, top_k=limit) for e in query_embeddings]
+    else:
+        results = [_hits_to_results(hits) for hits in qdrant_searcher.search_batch(query_embeddings, top_k=limit)]
+    if hybrid:
+        results = [fuse_with_lexical(dense, text, top_k=top_k) if text else dense[:top_k]
+                   for dense, text in zip(results, query_texts)]
+    return results
+
+
+def _hits_to_results(hits):
+    """Normalize Qdrant hits (ScoredPoint objects or dicts) to { id, text, score } dicts."""
     results = []
     for hit in hits:
         try:
@@ -349,203 +779,679 @@ def search_qdrant(query_embedding, top_k=5):
     return results
 
 
-def call_chat_api(question, context_chunks):
-    """Call chat API with primary model (OpenAI GPT-4o-mini) and fallback to OpenRouter."""
-    context_text = "\n\n---\n\n".join([f"[{i+1}] {c['text']}" for i, c in enumerate(context_chunks)])
+# ===== RERANKING (optional) =====
+# Cross-encoder pass over the search candidates; only the best RERANK_KEEP reach the prompt
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "10"))
+RERANK_KEEP = int(os.getenv("RERANK_KEEP", "3"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_MIN_SCORE = float(os.getenv("RERANK_MIN_SCORE")) if os.getenv("RERANK_MIN_SCORE") else None
+# One worker per question processed at once, so concurrent requests don't skip reranking
+RERANK_WORKERS = int(os.getenv("RERANK_WORKERS", os.getenv("ADMISSION_MAX_CONCURRENT", "2")))
 
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
-        {"role": "user", "content": f"CONTEXT:\n{context_text}\n\nQuestion: {question}"}
-    ]
+reranker = Reranker(budget_ms=RERANK_BUDGET_MS, keep=RERANK_KEEP, min_score=RERANK_MIN_SCORE,
+                    workers=RERANK_WORKERS) if RERANK else None
+if reranker is not None:
+    for _outcome in ("reranked", "timeout", "busy", "error", "skipped"):
+        metrics.inc("quoteplan_rerank_total", 0, outcome=_outcome)  # export skip counts from 0, not first skip
 
-    # Try OpenAI first if API key is available
-    if OPENAI_API_KEY:
-        try:
-            print(f"[Primary] Attempting OpenAI GPT-4o-mini...")
-            response = call_openai(messages)
-            print(f"[Primary] OpenAI success!")
-            return response
-        except Exception as e:
-            print(f"[Primary] OpenAI failed: {e}. Attempting fallback...")
 
-    # Fall back to OpenRouter if available
-    if OPENROUTER_API_KEY:
-        try:
-            print(f"[Fallback] Attempting OpenRouter {CHAT_MODEL_FALLBACK}...")
-            response = call_openrouter(messages, CHAT_MODEL_FALLBACK)
-            print(f"[Fallback] OpenRouter success!")
-            return response
-        except Exception as e:
-            print(f"[Fallback] OpenRouter failed: {e}")
+def candidate_count(top_k):
+    """How many chunks to retrieve for a question that will use top_k of them."""
+    return max(top_k, RERANK_CANDIDATES) if reranker is not None else top_k
 
-    raise Exception("All chat API options exhausted (OpenAI and OpenRouter both failed or unavailable)")
 
-
-def call_openai(messages):
-    """Call OpenAI API for chat completions."""
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": "gpt-4o-mini",
-        "messages": messages,
-        "max_tokens": 800,
-        "temperature": 0.0
-    }
-
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    content = r.json()["choices"][0]["message"]["content"]
-    
-    if isinstance(content, dict):
-        return json.dumps(content, ensure_ascii=False)
-    return content.strip()
+def rerank_results(question, retrieved, top_k=5):
+    """Cross-encoder order when it fits the latency budget, otherwise the first top_k in vector order."""
+    if reranker is None:
+        return retrieved
+    with metrics.stage("rerank"):
+        results, outcome = reranker.rerank(question, retrieved, top_k=top_k)
+    metrics.inc("quoteplan_rerank_total", outcome=outcome)
+    return results
 
 
-def call_openrouter(messages, model):
-    """Call OpenRouter API for chat completions with specified model."""
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
+# ===== CONTEXT ASSEMBLY =====
+# Pack the best, de-duplicated chunks into a fixed token budget instead of all top_k verbatim
+CONTEXT_BUDGETING = os.getenv("CONTEXT_BUDGETING", "1") == "1"
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.2"))
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+
+def select_context(context_chunks):
+    """Return (chunks for the prompt, selection stats)."""
+    if not CONTEXT_BUDGETING:
+        chunks = [c for c in context_chunks if c.get("text")]
+        return chunks, {"selected": len(chunks), "context_tokens": sum(count_tokens(c["text"]) for c in chunks)}
+    return build_context(
+        context_chunks,
+        token_budget=CONTEXT_TOKEN_BUDGET,
+        min_score=CONTEXT_MIN_SCORE,
+        dedup_threshold=CONTEXT_DEDUP_THRESHOLD,
+    )
 
-    payload = {
-        "model": model,
-        "messages": messages,
-        "max_tokens": 800,
-        "temperature": 0.0
-    }
 
-    r = requests.post(url, headers=headers, json=payload, timeout=60)
-    r.raise_for_status()
-    content = r.json()["choices"][0]["message"]["content"]
-    
-    if isinstance(content, dict):
-        return json.dumps(content, ensure_ascii=False)
-    return content.strip()
+def _build_rag_messages(question, context_chunks):
+    with metrics.stage("context_build"):
+        selected, _ = select_context(context_chunks)
+    context_text = format_context(selected)
+    return [
+        {"role": "system", "content": RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": f"CONTEXT:\n{context_text}\n\nQuestion: {question}"}
+    ]
 
 
-def _call_chat_api_followup(prev_answer: str, question: str):
-    """Call chat API for follow-up using only the previous answer."""
+def _build_followup_messages(prev_answer, question):
     user_content = (
         "Based only on the previous answer below, respond to the user request.\n\n"
         f"Previous answer:\n{prev_answer}\n\nQuestion: {question}"
     )
-    messages = [
-        {"role": "system", "content": SYSTEM_PROMPT},
+    return [
+        {"role": "system", "content": FOLLOWUP_PROMPT},
         {"role": "user", "content": user_content}
     ]
 
-    # Try OpenAI first if API key is available
-    if OPENAI_API_KEY:
-        try:
-            print(f"[Follow-up] Attempting OpenAI...")
-            return call_openai(messages)
-        except Exception as e:
-            print(f"[Follow-up] OpenAI failed: {e}. Attempting fallback...")
 
-    # Fall back to OpenRouter if available
-    if OPENROUTER_API_KEY:
-        try:
-            print(f"[Follow-up] Attempting OpenRouter {CHAT_MODEL_FALLBACK}...")
-            return call_openrouter(messages, CHAT_MODEL_FALLBACK)
-        except Exception as e:
-            print(f"[Follow-up] OpenRouter failed: {e}")
+def _hedge_options():
+    return {
+        "percentile": HEDGE_PERCENTILE,
+        "default": HEDGE_DEFAULT_DELAY,
+        "min_delay": HEDGE_MIN_DELAY,
+        "max_delay": HEDGE_MAX_DELAY,
+        "min_samples": HEDGE_MIN_SAMPLES,
+    }
 
-    raise Exception("All chat API options exhausted for follow-up")
 
+def _complete(messages, label):
+    """Primary -> fallback chain, or a hedged race between them when HEDGING=1."""
+    usage = metrics.current_usage()  # this request's token accounting
+    if HEDGING:
+        return chat_providers.complete_hedged(CHAT_PROVIDERS, messages, label, usage=usage, **_hedge_options())
+    return chat_providers.complete_with_fallback(CHAT_PROVIDERS, messages, label, usage)
 
-def answer_structured(question, top_k=5, verbose=True):
-    """Main entry for your server with simple in‑memory chat memory."""
+
+def _stream(messages, label):
+    usage = metrics.current_usage()
+    if HEDGING:
+        return chat_providers.stream_hedged(CHAT_PROVIDERS, messages, label, usage=usage, **_hedge_options())
+    return chat_providers.stream_with_fallback(CHAT_PROVIDERS, messages, label, usage)
+
+
+def call_chat_api(question, context_chunks):
+    """Call chat API with primary model (OpenAI GPT-4o-mini) and fallback to OpenRouter."""
+    messages = _build_rag_messages(question, context_chunks)
+    return _complete(messages, "Chat")
+
+
+def call_openai(messages):
+    """Call OpenAI API for chat completions."""
+    return openai_provider.complete(messages)
+
+
+def call_openrouter(messages, model):
+    """Call OpenRouter API for chat completions with specified model."""
+    if model == openrouter_provider.model:
+        return openrouter_provider.complete(messages)
+    client = _make_provider("OpenRouter", OPENROUTER_API_URL, OPENROUTER_API_KEY, model)
+    return client.complete(messages)
+
+
+def stream_chat_api(question, context_chunks):
+    """Streaming variant of call_chat_api: yields answer tokens as they arrive."""
+    messages = _build_rag_messages(question, context_chunks)
+    yield from _stream(messages, "Stream")
+
+
+def _stream_chat_api_followup(prev_answer: str, question: str):
+    """Streaming variant of _call_chat_api_followup."""
+    messages = _build_followup_messages(prev_answer, question)
+    yield from _stream(messages, "Follow-up")
+
+
+def _call_chat_api_followup(prev_answer: str, question: str):
+    """Call chat API for follow-up using only the previous answer."""
+    messages = _build_followup_messages(prev_answer, question)
+    return _complete(messages, "Follow-up")
+
+
+GREETING_REPLIES = [
+    "Hi — I'm the QuotePlan Assistant. How can I help you today?",
+    "Hello — I can help with QuotePlan documentation. What would you like to know?",
+    "Hi there! Ask me about creating projects, BOMs, POs, or offer letters."
+]
+
+
+def _greeting_reply():
+    return random.choice(GREETING_REPLIES)
+
+
+NO_INFO_ANSWER = "I don't have this information in the QuotePlan manual."
+
+
+# ===== REQUEST COALESCING =====
+# Concurrent identical questions (same normalized text and top_k) share one embed/search/LLM run.
+# Only the session-independent RAG path is coalesced; follow-ups depend on each session's memory.
+COALESCE_ENABLED = os.getenv("COALESCE", "1") == "1"
+request_flight = SingleFlight()
+
+
+def _coalesce_key(question, top_k):
+    return (normalize_question(question), top_k)
+
+
+def _rag_answer(question, top_k, verbose):
+    """Embed -> FAQ -> answer cache -> search -> LLM; returns (answer_text, retrieved)."""
+    if verbose:
+        print("\n[embed] embedding question...")
+    with metrics.stage("embed"):
+        q_emb = embed_text(question)
+
+    with metrics.stage("faq_lookup"):
+        faq = lookup_faq(q_emb)
+    if faq:
+        if verbose:
+            print(f"[faq] hit (similarity {faq['similarity']:.3f}) for: {faq['question']}")
+        return faq["answer"], []
+
+    with metrics.stage("cache_lookup"):
+        cached = lookup_cached_answer(q_emb)
+    if cached:
+        if verbose:
+            print(f"[cache] hit (similarity {cached['similarity']:.3f}) for: {cached['question']}")
+        return cached["answer"], cached["retrieved"]
+
+    if verbose:
+        print("[search] searching Qdrant...")
+    with metrics.stage("search"):
+        retrieved = search_qdrant(q_emb, top_k=candidate_count(top_k), query_text=question)
+    retrieved = rerank_results(question, retrieved, top_k=top_k)
+
+    if not retrieved:
+        return NO_INFO_ANSWER, retrieved
+    if verbose:
+        print(f"[chat] calling chat api with {len(retrieved)} retrieved chunks...")
+    with metrics.stage("llm"):
+        answer_text = call_chat_api(question, retrieved)
+    store_cached_answer(question, q_emb, answer_text, retrieved)
+    return answer_text, retrieved
+
+
+def _rag_stream(question, top_k, verbose):
+    """Streaming _rag_answer: yields token events, then {"type": "result", "answer", "retrieved"}."""
+    if verbose:
+        print("\n[embed] embedding question...")
+    with metrics.stage("embed"):
+        q_emb = embed_text(question)
+
+    with metrics.stage("faq_lookup"):
+        faq = lookup_faq(q_emb)
+    cached = None
+    if not faq:
+        with metrics.stage("cache_lookup"):
+            cached = lookup_cached_answer(q_emb)
+    llm_stage = None
+    if faq:
+        if verbose:
+            print(f"[faq] hit (similarity {faq['similarity']:.3f}) for: {faq['question']}")
+        retrieved = []
+        tokens = iter([faq["answer"]])
+    elif cached:
+        if verbose:
+            print(f"[cache] hit (similarity {cached['similarity']:.3f}) for: {cached['question']}")
+        retrieved = cached["retrieved"]
+        tokens = iter([cached["answer"]])
+    else:
+        if verbose:
+            print("[search] searching Qdrant...")
+        with metrics.stage("search"):
+            retrieved = search_qdrant(q_emb, top_k=candidate_count(top_k), query_text=question)
+        retrieved = rerank_results(question, retrieved, top_k=top_k)
+
+        if not retrieved:
+            tokens = iter([NO_INFO_ANSWER])
+        else:
+            if verbose:
+                print(f"[chat] streaming chat api with {len(retrieved)} retrieved chunks...")
+            tokens = stream_chat_api(question, retrieved)
+            llm_stage = "llm"
+
+    parts = []
+    for token in _timed_tokens(tokens, llm_stage):
+        parts.append(token)
+        yield {"type": "token", "text": token}
+    answer_text = "".join(parts).strip()
+
+    if not cached and retrieved:
+        store_cached_answer(question, q_emb, answer_text, retrieved)
+    yield {"type": "result", "answer": answer_text, "retrieved": retrieved}
+
+
+def _timed_tokens(tokens, llm_stage):
+    """Pass tokens through, recording first-token and total time of an LLM stage."""
+    started = time.perf_counter()
+    first = True
+    for token in tokens:
+        if first and llm_stage:
+            metrics.observe("quoteplan_stage_seconds", time.perf_counter() - started,
+                            stage=f"{llm_stage}_first_token")
+        first = False
+        yield token
+    if llm_stage:
+        metrics.observe("quoteplan_stage_seconds", time.perf_counter() - started, stage=llm_stage)
+
+
+def answer_structured(question, top_k=5, verbose=True, session_id=None):
+    """Main entry for your server with per-session chat memory."""
+    metrics.start_trace()
+    started = time.perf_counter()
     try:
-        # Detect follow‑up request
-        is_follow = _is_follow_up(question)
+        # Route greeting / follow‑up / RAG in one pass
+        intent = classify_intent(question)
+        is_follow = intent == FOLLOW_UP
         # Retrieve previous memory if any
-        prev = CHAT_MEMORY.get("last_answer")
+        prev = _previous_answer(session_id)
 
         # Greeting handling: respond locally to simple greetings without using the LLM
-        if _is_greeting(question):
-            replies = [
-                "Hi — I'm the QuotePlan Assistant. How can I help you today?",
-                "Hello — I can help with QuotePlan documentation. What would you like to know?",
-                "Hi there! Ask me about creating projects, BOMs, POs, or offer letters."
-            ]
-            answer_text = random.choice(replies)
-            CHAT_MEMORY["last_question"] = question
-            CHAT_MEMORY["last_answer"] = answer_text
+        if intent == GREETING:
+            with metrics.stage("greeting"):
+                answer_text = _greeting_reply()
+                _remember(session_id, question, answer_text)
             retrieved = []
             return {
                 "success": True,
                 "question": question,
                 "answer": answer_text,
                 "retrieved": retrieved,
+                "timings": _finish_trace(started),
+                "usage": metrics.end_usage(),
             }
 
         if is_follow and prev:
             # Follow‑up: use only previous answer
             if verbose:
                 print("[follow‑up] using previous answer for context")
-            answer_text = _call_chat_api_followup(prev, question)
+            with metrics.stage("followup"):
+                answer_text = _call_chat_api_followup(prev, question)
             retrieved = []
+        elif COALESCE_ENABLED:
+            # Normal RAG flow, shared with concurrent identical questions
+            (answer_text, retrieved), shared = request_flight.do(
+                _coalesce_key(question, top_k), lambda: _rag_answer(question, top_k, verbose))
+            if shared and verbose:
+                print("[coalesce] answered by an identical in-flight request")
         else:
-            # Normal RAG flow
-            if verbose:
-                print("\n[embed] embedding question...")
-            q_emb = embed_text(question)
-
-            if verbose:
-                print("[search] searching Qdrant...")
-            retrieved = search_qdrant(q_emb, top_k=top_k)
-
-            if not retrieved:
-                answer_text = "I don't have this information in the QuotePlan manual."
-            else:
-                if verbose:
-                    print(f"[chat] calling chat api with {len(retrieved)} retrieved chunks...")
-                answer_text = call_chat_api(question, retrieved)
+            answer_text, retrieved = _rag_answer(question, top_k, verbose)
 
         # Store memory for next turn
-        CHAT_MEMORY["last_question"] = question
-        CHAT_MEMORY["last_answer"] = answer_text
+        _remember(session_id, question, answer_text)
 
-        # Memory cleanup after processing
-        gc.collect()
+        # Collects only when RSS nears MEMORY_BUDGET_MB
+        memory_governor.check()
 
         return {
             "success": True,
             "question": question,
             "answer": answer_text,
             "retrieved": retrieved,
+            "timings": _finish_trace(started),
+            "usage": metrics.end_usage(),
         }
 
     except Exception as e:
+        metrics.inc("quoteplan_pipeline_errors_total")
         return {
             "success": False,
             "question": question,
             "answer": f"Error: {e}",
             "retrieved": [],
+            "timings": _finish_trace(started),
+            "usage": metrics.end_usage(),
         }
 
 
+def _finish_trace(started):
+    """Record total pipeline time and return this request's {stage: ms} timings."""
+    total = time.perf_counter() - started
+    metrics.observe("quoteplan_stage_seconds", total, stage="total")
+    timings = metrics.end_trace()
+    timings["total"] = round(total * 1000, 2)
+    return timings
+
+
+def answer_stream(question, top_k=5, verbose=True, session_id=None):
+    """Streaming counterpart of answer_structured.
+
+    Yields event dicts: {"type": "token", "text": ...} for each piece of the
+    answer, then a single {"type": "done", ...} carrying the same fields as
+    answer_structured, or {"type": "error", ...} if anything failed.
+    """
+    metrics.start_trace()
+    started = time.perf_counter()
+    try:
+        intent = classify_intent(question)
+        is_follow = intent == FOLLOW_UP
+        prev = _previous_answer(session_id)
+
+        if intent == GREETING:
+            with metrics.stage("greeting"):
+                answer_text = _greeting_reply()
+                _remember(session_id, question, answer_text)
+            yield {"type": "token", "text": answer_text}
+            yield {"type": "done", "success": True, "question": question, "answer": answer_text, "retrieved": [],
+                   "timings": _finish_trace(started), "usage": metrics.end_usage()}
+            return
+
+        if is_follow and prev:
+            if verbose:
+                print("[follow‑up] streaming from previous answer")
+            parts = []
+            for token in _timed_tokens(_stream_chat_api_followup(prev, question), "followup"):
+                parts.append(token)
+                yield {"type": "token", "text": token}
+            answer_text, retrieved = "".join(parts).strip(), []
+        else:
+            if COALESCE_ENABLED:
+                # Identical in-flight streams share one LLM stream; late joiners replay the tokens so far
+                events = request_flight.stream(_coalesce_key(question, top_k),
+                                               lambda: _rag_stream(question, top_k, verbose))
+            else:
+                events = _rag_stream(question, top_k, verbose)
+            answer_text, retrieved = "", []
+            for event in events:
+                if event["type"] == "result":
+                    answer_text, retrieved = event["answer"], event["retrieved"]
+                else:
+                    yield event
+
+        _remember(session_id, question, answer_text)
+
+        memory_governor.check()
+
+        yield {"type": "done", "success": True, "question": question, "answer": answer_text, "retrieved": retrieved,
+               "timings": _finish_trace(started), "usage": metrics.end_usage()}
+
+    except Exception as e:
+        metrics.inc("quoteplan_pipeline_errors_total")
+        yield {"type": "error", "success": False, "question": question, "answer": f"Error: {e}", "retrieved": [],
+               "timings": _finish_trace(started), "usage": metrics.end_usage()}
+
+
 def answer(question, top_k=5):
     """Backward-compatible helper returning the answer string only."""
     out = answer_structured(question, top_k=top_k, verbose=False)
     return out.get("answer", "")
 
 
+# ===== BATCH ANSWERING =====
+# Bulk runs (/api/batch, --file): questions are embedded and searched BATCH_EMBED_SIZE at a
+# time, LLM calls run BATCH_CONCURRENCY at a time and results are yielded as they complete
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_EMBED_SIZE = int(os.getenv("BATCH_EMBED_SIZE", "64"))
+
+
+def _batch_items(items):
+    """Normalize questions given as strings or {"id", "question"} dicts."""
+    out = []
+    for i, item in enumerate(items):
+        if isinstance(item, dict):
+            question, item_id = item.get("question"), item.get("id", i)
+        else:
+            question, item_id = item, i
+        out.append({"index": i, "id": item_id, "question": str(question or "").strip()})
+    return out
+
+
+def _batch_result(item, answer_text, retrieved, source, started, success=True, usage=None):
+    metrics.inc("quoteplan_batch_questions_total", source=source)
+    return {
+        "index": item["index"],
+        "id": item["id"],
+        "success": success,
+        "question": item["question"],
+        "answer": answer_text,
+        "source": source,
+        "retrieved": [r.get("id") for r in retrieved],
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+        "usage": usage or {},
+    }
+
+
+def _batch_llm(item, q_emb, retrieved, top_k):
+    """Rerank + LLM call for one batch question; runs on the batch executor."""
+    metrics.start_trace()
+    started = time.perf_counter()
+    question = item["question"]
+    try:
+        retrieved = rerank_results(question, retrieved, top_k=top_k)
+        if not retrieved:
+            return _batch_result(item, NO_INFO_ANSWER, [], "no_context", started, usage=metrics.end_usage())
+        with metrics.stage("llm"):
+            answer_text = call_chat_api(question, retrieved)
+        store_cached_answer(question, q_emb, answer_text, retrieved)
+        return _batch_result(item, answer_text, retrieved, "llm", started, usage=metrics.end_usage())
+    except Exception as e:
+        metrics.inc("quoteplan_pipeline_errors_total")
+        return _batch_result(item, f"Error: {e}", [], "error", started, success=False, usage=metrics.end_usage())
+    finally:
+        metrics.end_trace()
+
+
+def answer_batch(items, top_k=5, concurrency=None):
+    """Answer many questions; yields one result dict per question in completion order.
+
+    Greetings, FAQ and answer cache hits are yielded as soon as their chunk is embedded;
+    the rest are searched with one batched query per chunk and sent to the LLM on a pool
+    of `concurrency` threads. Each result carries the input "index" and "id". Batch
+    questions have no session, so follow-ups are answered as ordinary RAG questions.
+    """
+    items = _batch_items(items)
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency or BATCH_CONCURRENCY),
+                                  thread_name_prefix="batch")
+    pending = set()
+    try:
+        for offset in range(0, len(items), BATCH_EMBED_SIZE):
+            chunk_started = time.perf_counter()
+            to_embed = []
+            for item in items[offset:offset + BATCH_EMBED_SIZE]:
+                if not item["question"]:
+                    yield _batch_result(item, "Error: empty question", [], "error", chunk_started, success=False)
+                elif classify_intent(item["question"]) == GREETING:
+                    yield _batch_result(item, _greeting_reply(), [], "greeting", chunk_started)
+                else:
+                    to_embed.append(item)
+            if not to_embed:
+                continue
+
+            with metrics.stage("embed"):
+                embeddings = embed_texts([item["question"] for item in to_embed])
+            to_search = []
+            for item, q_emb in zip(to_embed, embeddings):
+                faq = lookup_faq(q_emb)
+                cached = None if faq else lookup_cached_answer(q_emb)
+                if faq:
+                    yield _batch_result(item, faq["answer"], [], "faq", chunk_started)
+                elif cached:
+                    yield _batch_result(item, cached["answer"], cached["retrieved"], "cache", chunk_started)
+                else:
+                    to_search.append((item, q_emb))
+            if to_search:
+                with metrics.stage("search"):
+                    results = search_qdrant_batch([q_emb for _, q_emb in to_search], top_k=candidate_count(top_k),
+                                                  query_texts=[item["question"] for item, _ in to_search])
+                for (item, q_emb), retrieved in zip(to_search, results):
+                    pending.add(executor.submit(_batch_llm, item, q_emb, retrieved, top_k))
+
+            done = {f for f in pending if f.done()}
+            pending -= done
+            for future in done:
+                yield future.result()
+            memory_governor.check()
+
+        for future in as_completed(pending):
+            pending.discard(future)
+            yield future.result()
+    finally:
+        # Caller stopped early (client disconnected): drop queued LLM calls
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ===== WARM-UP / READINESS =====
+# The app runs warm_up() at startup (pre-fork under gunicorn --preload) so the first
+# question does not pay for model loading; /ready reports ready only once it succeeded
+WARMUP_STATE = {"ready": False, "started": None, "finished": None, "steps": {}}
+_warmup_lock = threading.Lock()
+
+
+def _warm_step(name, fn):
+    start = time.perf_counter()
+    try:
+        fn()
+        WARMUP_STATE["steps"][name] = {"ok": True, "ms": round((time.perf_counter() - start) * 1000, 1)}
+        return True
+    except Exception as e:
+        WARMUP_STATE["steps"][name] = {"ok": False, "error": str(e)}
+        print(f"[warmup] {name} failed: {e}")
+        return False
+
+
+def _warm_model():
+    if get_embedding_model() is None:
+        raise RuntimeError("embedding model could not be loaded")
+
+
+def _warm_providers():
+    for provider in CHAT_PROVIDERS:
+        provider.warm()
+
+
+def warm_up_connections(reset=False):
+    """Resolve the Qdrant search API and open Qdrant / provider connections.
+
+    reset=True drops connections inherited from a parent process first (call it after fork).
+    """
+    global qdrant
+    if reset:
+        for provider in CHAT_PROVIDERS:
+            provider.reset_connections()
+        with _qdrant_lock:
+            qdrant = _connect_qdrant()
+    _warm_step("qdrant", lambda: (qdrant_searcher.resolve(), _collection_fingerprint()))
+    if local_index is not None:
+        _warm_step("local_index", load_local_index)
+    if lexical_index is not None:
+        _warm_step("lexical_index", load_lexical_index)
+    _warm_step("providers", _warm_providers)
+
+
+def warm_up():
+    """Load the embedding model, run a dummy encode and open connections; sets WARMUP_STATE."""
+    with _warmup_lock:
+        WARMUP_STATE["started"] = time.time()
+        model_ok = _warm_step("embedding_model", _warm_model)
+        # First forward pass allocates buffers / initializes kernels
+        encode_ok = model_ok and _warm_step("embedding_encode", lambda: embed_texts(["warm up"]))
+        if reranker is not None:
+            _warm_step("reranker", reranker.warm)  # not required for readiness: rerank falls back
+        warm_up_connections()
+        if GC_FREEZE:
+            memory_governor.freeze()  # model, indexes and connections are now long-lived
+        WARMUP_STATE["finished"] = time.time()
+        WARMUP_STATE["ready"] = bool(model_ok and encode_ok)
+        total = WARMUP_STATE["finished"] - WARMUP_STATE["started"]
+        print(f"[warmup] {'ready' if WARMUP_STATE['ready'] else 'NOT ready'} after {total:.1f}s")
+    return readiness()
+
+
+def mark_ready():
+    """Skip warm-up (lazy loading): report ready immediately."""
+    WARMUP_STATE["ready"] = True
+
+
+def readiness():
+    return {
+        "ready": WARMUP_STATE["ready"],
+        "steps": {k: dict(v) for k, v in WARMUP_STATE["steps"].items()},
+        "warmup_seconds": round(WARMUP_STATE["finished"] - WARMUP_STATE["started"], 3)
+        if WARMUP_STATE["finished"] else None,
+    }
+
+
+def _metrics_collector():
+    """Export cache, FAQ, lexical index, session, provider and retrieval stats at /metrics scrape time."""
+    cache = answer_cache_stats()
+    if cache.get("enabled"):
+        yield ("quoteplan_answer_cache_lookups_total", "counter", "Semantic answer cache lookups",
+               [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])])
+        yield ("quoteplan_answer_cache_entries", "gauge", "Cached answers", [({}, cache["entries"])])
+        yield ("quoteplan_answer_cache_bytes", "gauge", "Answer cache memory", [({}, cache["bytes"])])
+    faq = faq_stats()
+    if faq.get("enabled"):
+        yield ("quoteplan_faq_lookups_total", "counter", "FAQ tier lookups",
+               [({"result": "hit"}, faq["hits"]), ({"result": "miss"}, faq["misses"])])
+        yield ("quoteplan_faq_entries", "gauge", "Vetted FAQ answers loaded", [({}, faq["entries"])])
+    if lexical_index is not None:
+        yield ("quoteplan_lexical_index_chunks", "gauge", "Chunks in the BM25 index", [({}, len(lexical_index))])
+    sessions = session_memory_stats()
+    if "sessions" in sessions:
+        yield ("quoteplan_sessions", "gauge", "Chat sessions held in memory", [({}, sessions["sessions"])])
+    yield ("quoteplan_provider_latency_seconds", "histogram", "Successful chat completion latency",
+           [({"provider": p.name}, p.latency) for p in CHAT_PROVIDERS])
+    yield ("quoteplan_provider_first_token_seconds", "histogram", "Streaming time to first token",
+           [({"provider": p.name}, p.first_token) for p in CHAT_PROVIDERS])
+    yield ("quoteplan_provider_circuit_open", "gauge", "1 if the provider's circuit breaker is open",
+           [({"provider": p.name}, int(p.breaker.state == "open")) for p in CHAT_PROVIDERS])
+    if HEDGING and len(CHAT_PROVIDERS) > 1:
+        yield ("quoteplan_provider_hedge_delay_seconds", "gauge", "Wait before the backup provider is raced",
+               [({"provider": CHAT_PROVIDERS[0].name},
+                 chat_providers.hedge_delay(CHAT_PROVIDERS[0], **_hedge_options()))])
+    flight = request_flight.stats()
+    yield ("quoteplan_coalesced_requests_total", "counter", "Questions answered by an identical in-flight request",
+           [({}, flight["coalesced"])])
+    memory = memory_governor.stats()
+    yield ("quoteplan_memory_budget_bytes", "gauge", "Configured memory budget (MEMORY_BUDGET_MB)",
+           [({}, memory["budget_bytes"])])
+    yield ("quoteplan_memory_actions_total", "counter", "Budget-driven collections and cache shrinks",
+           [({"action": k}, v) for k, v in memory["actions"].items()])
+    batcher = embedding_batcher_stats()
+    if batcher.get("enabled"):
+        yield ("quoteplan_embed_batches_total", "counter", "Embedding forward passes", [({}, batcher["batches"])])
+        yield ("quoteplan_embed_items_total", "counter", "Texts embedded via the batcher", [({}, batcher["items"])])
+
+
+metrics.register_collector(_metrics_collector)
+
+
 # CLI
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument("--q", required=True, help="User question in quotes")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--q", help="User question in quotes")
+    source.add_argument("--file", help="JSONL of {\"id\", \"question\"} (or one question per line); "
+                                       "prints one JSON result per line as answers complete")
     parser.add_argument("--json", action="store_true", help="Output JSON instead of plain text")
+    parser.add_argument("--stream", action="store_true", help="Print tokens as they arrive")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Parallel LLM calls for --file")
     args = parser.parse_args()
 
-    if args.json:
+    if args.file:
+        items = []
+        for line in Path(args.file).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if line:
+                items.append(json.loads(line) if line.startswith("{") else line)
+        for result in answer_batch(items, concurrency=args.concurrency):
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+    elif args.stream:
+        print(f"\nQuestion: {args.q}\n")
+        for event in answer_stream(args.q, verbose=False):
+            if event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "error":
+                print(event["answer"], end="")
+        print("\n")
+    elif args.json:
         res = answer_structured(args.q, verbose=True)
         print(json.dumps(res, ensure_ascii=False, indent=2))
     else:
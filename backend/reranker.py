@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Cross-encoder reranking of retrieved chunks under a latency budget
+
+A cross-encoder (ms-marco-MiniLM-L-6-v2, ~22M params) reads question and
+chunk together, so it ranks "how do I approve a BOM" above chunks that only
+share vocabulary with it. All candidates are scored in one batched forward
+pass; only the best few go into the prompt.
+
+- "torch": sentence-transformers CrossEncoder
+- "onnx":  ONNX Runtime + tokenizers (the model repo ships onnx/ exports)
+
+The forward pass runs on a small pool of worker threads, one per question
+the server processes at once. A request waits for a free worker and for its
+scores within one latency budget; if that runs out (workers still busy with
+earlier overruns, or a slow pass), or the model is not loaded yet, the
+caller keeps the vector order.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+ONNX_FP32_FILE = "onnx/model.onnx"
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+class TorchCrossEncoder:
+    """sentence-transformers CrossEncoder (imports torch)."""
+
+    name = "torch"
+
+    def __init__(self, model_name=RERANK_MODEL_NAME, max_length=256):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+
+    def score(self, query, texts):
+        pairs = [(query, t) for t in texts]
+        return np.asarray(self.model.predict(pairs, batch_size=max(1, len(pairs)), show_progress_bar=False),
+                          dtype=np.float32).reshape(-1)
+
+
+class OnnxCrossEncoder:
+    """ONNX Runtime cross-encoder: one logit per (query, text) pair."""
+
+    name = "onnx"
+
+    def __init__(self, model_name=RERANK_MODEL_NAME, quantized=True, model_path=None, tokenizer_path=None,
+                 max_length=256, num_threads=1):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        if model_path is None or tokenizer_path is None:
+            from huggingface_hub import hf_hub_download
+            model_path = model_path or hf_hub_download(model_name, ONNX_INT8_FILE if quantized else ONNX_FP32_FILE)
+            tokenizer_path = tokenizer_path or hf_hub_download(model_name, "tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def score(self, query, texts):
+        encodings = self.tokenizer.encode_batch([(query, t) for t in texts])
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = self.session.run(None, feeds)[0]
+        return np.asarray(logits, dtype=np.float32)[:, 0]
+
+
+def load_cross_encoder(name=None):
+    """Build the cross-encoder selected by RERANK_BACKEND (torch|onnx, defaults to EMBED_BACKEND)."""
+    name = (name or os.getenv("RERANK_BACKEND") or os.getenv("EMBED_BACKEND", "torch")).lower()
+    model_name = os.getenv("RERANK_MODEL", RERANK_MODEL_NAME)
+    max_length = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+    if name == "onnx":
+        return OnnxCrossEncoder(
+            model_name,
+            quantized=os.getenv("RERANK_ONNX_QUANTIZED", "1") == "1",
+            model_path=os.getenv("RERANK_ONNX_MODEL_PATH") or None,
+            tokenizer_path=os.getenv("RERANK_ONNX_TOKENIZER_PATH") or None,
+            max_length=max_length,
+            num_threads=int(os.getenv("OMP_NUM_THREADS", "1")),
+        )
+    if name == "torch":
+        return TorchCrossEncoder(model_name, max_length=max_length)
+    raise ValueError(f"Unknown RERANK_BACKEND: {name!r} (expected 'torch' or 'onnx')")
+
+
+class Reranker:
+    """Reorders chunks by cross-encoder score, or leaves them alone when over budget."""
+
+    def __init__(self, loader=load_cross_encoder, budget_ms=150.0, keep=3, min_score=None, workers=1):
+        self.loader = loader
+        self.budget_s = budget_ms / 1000.0
+        self.keep = keep
+        self.min_score = min_score
+        self.model = None
+        self.counts = {"reranked": 0, "timeout": 0, "busy": 0, "error": 0}
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="rerank")
+        self._free = threading.BoundedSemaphore(self.workers)  # idle workers (held until a pass finishes)
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def warm(self):
+        """Load the model and run one tiny batch so the first request is within budget."""
+        self._score("warm up", ["warm up"])
+
+    def _score(self, query, texts):
+        if self.model is None:
+            with self._load_lock:
+                if self.model is None:
+                    self.model = self.loader()
+        return self.model.score(query, texts)
+
+    def rerank(self, query, chunks, top_k=None):
+        """Return (chunks, outcome): the best `keep` chunks by cross-encoder score with
+        "rerank_score" set, or the first top_k chunks in vector order on timeout/error."""
+        fallback = list(chunks[:top_k]) if top_k else list(chunks)
+        candidates = [c for c in chunks if c.get("text")]
+        if len(candidates) < 2:
+            return fallback, "skipped"
+
+        # The first call also loads the model: don't hold that request up either
+        budget = self.budget_s if self.model is not None else 0.0
+        deadline = time.perf_counter() + budget
+        if not self._free.acquire(timeout=budget):
+            with self._lock:
+                self.counts["busy"] += 1
+            return fallback, "busy"  # every worker still owns an earlier (overrun) pass
+        try:
+            future = self._executor.submit(self._score, query, [c["text"] for c in candidates])
+        except Exception:
+            self._free.release()
+            raise
+        future.add_done_callback(lambda _: self._free.release())
+        try:
+            scores = future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FutureTimeout:
+            with self._lock:
+                self.counts["timeout"] += 1
+            return fallback, "timeout"
+        except Exception as e:
+            print(f"[rerank] failed, keeping vector order: {e}")
+            with self._lock:
+                self.counts["error"] += 1
+            return fallback, "error"
+
+        order = np.argsort(-scores)
+        reranked = []
+        for rank, i in enumerate(order):
+            if rank >= self.keep:
+                break
+            score = float(scores[i])
+            if rank > 0 and self.min_score is not None and score < self.min_score:
+                break
+            reranked.append(dict(candidates[i], rerank_score=score))
+        with self._lock:
+            self.counts["reranked"] += 1
+        return reranked, "reranked"
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, loaded=self.model is not None, budget_ms=self.budget_s * 1000, keep=self.keep,
+                        workers=self.workers)
+
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Per-session conversation memory (last question & answer per chat session)
+
+Backends, selected with SESSION_STORE:
+- "memory" (default): bounded in-process LRU with TTL eviction
+- "sqlite:///path/to/sessions.db": shared by all gunicorn workers on one box
+- "redis://host:port/db": shared across boxes (needs the optional redis package)
+
+Each session holds at most SESSION_MAX_CHARS characters of answer text, so
+memory use is capped at roughly max_sessions * max_chars.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def _clip(text, max_chars):
+    text = text or ""
+    return text if len(text) <= max_chars else text[:max_chars]
+
+
+class InProcessSessionStore:
+    """Bounded LRU of session_id -> {last_question, last_answer} with TTL eviction."""
+
+    kind = "memory"
+
+    def __init__(self, max_sessions=1000, ttl_seconds=1800.0, max_chars=4000):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_chars = max_chars
+        self._sessions = OrderedDict()  # session_id -> (updated, question, answer)
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _drop(self, session_id):
+        _, question, answer = self._sessions.pop(session_id)
+        self._chars -= len(question) + len(answer)
+        self.evictions += 1
+
+    def get(self, session_id):
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            updated, question, answer = item
+            if time.time() - updated > self.ttl_seconds:
+                self._drop(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+            return {"last_question": question, "last_answer": answer}
+
+    def set(self, session_id, question, answer):
+        question = _clip(question, self.max_chars)
+        answer = _clip(answer, self.max_chars)
+        with self._lock:
+            if session_id in self._sessions:
+                _, old_q, old_a = self._sessions.pop(session_id)
+                self._chars -= len(old_q) + len(old_a)
+            self._sessions[session_id] = (time.time(), question, answer)
+            self._chars += len(question) + len(answer)
+            while len(self._sessions) > self.max_sessions:
+                self._drop(next(iter(self._sessions)))
+
+    def shrink(self, fraction=0.5):
+        """Drop the least recently used share of sessions (memory pressure)."""
+        with self._lock:
+            for session_id in list(self._sessions)[:int(len(self._sessions) * fraction)]:
+                self._drop(session_id)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.kind,
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "chars": self._chars,
+                "max_chars_per_session": self.max_chars,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteSessionStore:
+    """Session memory in a local SQLite file so several workers share it."""
+
+    kind = "sqlite"
+
+    def __init__(self, path, max_sessions=1000, ttl_seconds=1800.0, max_chars=4000):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_chars = max_chars
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY, question TEXT, answer TEXT, updated REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated)")
+
+    def _conn(self):
+        # One connection per thread (and per forked worker, keyed by pid)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, session_id):
+        row = self._conn().execute(
+            "SELECT question, answer FROM sessions WHERE id = ? AND updated >= ?",
+            (session_id, time.time() - self.ttl_seconds),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"last_question": row[0], "last_answer": row[1]}
+
+    def set(self, session_id, question, answer):
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT INTO sessions (id, question, answer, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET question = excluded.question, "
+            "answer = excluded.answer, updated = excluded.updated",
+            (session_id, _clip(question, self.max_chars), _clip(answer, self.max_chars), now),
+        )
+        # Expire old sessions and keep only the most recent max_sessions
+        conn.execute(
+            "DELETE FROM sessions WHERE updated < ? OR id IN ("
+            " SELECT id FROM sessions ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (now - self.ttl_seconds, self.max_sessions),
+        )
+
+    def stats(self):
+        count, chars = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(question) + LENGTH(answer)), 0) FROM sessions"
+        ).fetchone()
+        return {
+            "backend": self.kind,
+            "sessions": count,
+            "max_sessions": self.max_sessions,
+            "chars": chars,
+            "max_chars_per_session": self.max_chars,
+        }
+
+
+class RedisSessionStore:
+    """Session memory in Redis; TTL is handled by key expiry."""
+
+    kind = "redis"
+
+    def __init__(self, url, ttl_seconds=1800.0, max_chars=4000, prefix="quoteplan:session:"):
+        import redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_chars = max_chars
+        self.prefix = prefix
+
+    def get(self, session_id):
+        data = self.client.hgetall(self.prefix + session_id)
+        if not data:
+            return None
+        return {"last_question": data.get("q", ""), "last_answer": data.get("a", "")}
+
+    def set(self, session_id, question, answer):
+        key = self.prefix + session_id
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={"q": _clip(question, self.max_chars), "a": _clip(answer, self.max_chars)})
+        pipe.expire(key, int(self.ttl_seconds))
+        pipe.execute()
+
+    def stats(self):
+        return {"backend": self.kind, "max_chars_per_session": self.max_chars}
+
+
+def create_store(spec, max_sessions=1000, ttl_seconds=1800.0, max_chars=4000):
+    """Build a session store from a SESSION_STORE spec string."""
+    spec = (spec or "memory").strip()
+    if spec.startswith("sqlite:///"):
+        return SQLiteSessionStore(spec[len("sqlite:///"):], max_sessions, ttl_seconds, max_chars)
+    if spec.startswith(("redis://", "rediss://")):
+        return RedisSessionStore(spec, ttl_seconds, max_chars)
+    if spec == "memory":
+        return InProcessSessionStore(max_sessions, ttl_seconds, max_chars)
+    raise ValueError(f"Unknown SESSION_STORE: {spec!r}")
+
+
+def normalize_session_id(value):
+    """Accept a short opaque id from the client; anything else -> None (no memory at all).
+
+    Anonymous callers must not share a session, or one user's follow-up would
+    be answered from another user's previous answer.
+    """
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if not value or len(value) > 64 or not all(c.isalnum() or c in "-_" for c in value):
+        return None
+    return value
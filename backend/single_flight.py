@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing of identical in-flight questions
+
+When many users ask the same question at once (a shared link), only the
+first request embeds, searches and calls the LLM; concurrent duplicates
+wait for that computation and receive the same result.
+
+- do(key, fn): blocking calls; followers wait for the leader's return value
+  (or exception)
+- stream(key, make_source): streamed events are buffered per key, every
+  subscriber replays the buffer from the start and then follows it live.
+  Whichever subscriber is free pulls the next event from the source, so a
+  disconnecting leader does not stall the others; the source is closed once
+  nobody is listening.
+
+Keys are only shared while a computation is in flight; later requests start
+a new one (and usually hit the answer cache instead).
+"""
+
+import re
+import threading
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_question(question):
+    """Case, whitespace and punctuation-insensitive form used as the coalescing key."""
+    return " ".join(_WORD_RE.findall((question or "").lower()))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class _Stream:
+    def __init__(self, make_source):
+        self.make_source = make_source
+        self.source = None
+        self.events = []
+        self.finished = False
+        self.error = None
+        self.driving = False
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Deduplicates concurrent work by key."""
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """Run fn() once per key among concurrent callers; returns (result, shared)."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.followers += 1
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def stream(self, key, make_source):
+        """Yield the events of make_source() (an iterator), shared by concurrent callers with the same key."""
+        with self._lock:
+            flight = self._streams.get(key)
+            if flight is not None:
+                with flight.cond:
+                    if flight.finished:
+                        flight = None  # abandoned a moment ago: start over
+                    else:
+                        flight.subscribers += 1
+                        self.coalesced += 1
+            if flight is None:
+                flight = self._streams[key] = _Stream(make_source)
+                flight.subscribers = 1
+                self.leaders += 1
+
+        index = 0
+        try:
+            while True:
+                drive = False
+                with flight.cond:
+                    while index >= len(flight.events) and not flight.finished and flight.driving:
+                        flight.cond.wait()
+                    if index < len(flight.events):
+                        event = flight.events[index]
+                        index += 1
+                    elif flight.finished:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.driving = drive = True
+
+                if drive:
+                    self._pull(key, flight)
+                    continue
+                yield event
+        finally:
+            with flight.cond:
+                flight.subscribers -= 1
+                abandoned = flight.subscribers == 0 and not flight.finished
+                if abandoned:
+                    flight.finished = True
+            if abandoned:
+                self._forget(key, flight)
+                close = getattr(flight.source, "close", None)
+                if close is not None:
+                    close()  # nobody is listening any more: stop the LLM stream
+
+    def _pull(self, key, flight):
+        """Advance the shared source by one event (called by exactly one subscriber at a time)."""
+        finished, error = False, None
+        try:
+            if flight.source is None:
+                flight.source = iter(flight.make_source())
+            event = next(flight.source)
+        except StopIteration:
+            finished = True
+        except Exception as e:
+            finished, error = True, e
+        with flight.cond:
+            if finished:
+                flight.finished = True
+                flight.error = error
+            else:
+                flight.events.append(event)
+            flight.driving = False
+            flight.cond.notify_all()
+        if finished:
+            self._forget(key, flight)
+
+    def _forget(self, key, flight):
+        with self._lock:
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls) + len(self._streams),
+            }
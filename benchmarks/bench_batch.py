@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark: batch answering throughput vs. concurrency
+
+Answers --questions questions (the fixed set, numbered so every one is
+distinct) with query_bot_lite.answer_batch at each --concurrency level, plus
+a sequential answer_structured() loop as the baseline. By default Qdrant,
+embeddings and the chat provider are stubbed (--llm-ms per call) so only the
+pipeline's own scheduling is measured; --live uses the configured services
+(real provider credits).
+
+Reports wall time, questions per second and speedup over the sequential loop.
+With a fixed LLM latency throughput should grow roughly linearly with the
+concurrency limit until the provider (or its rate limit) saturates.
+
+Usage:
+    python benchmarks/bench_batch.py [--questions 500] [--concurrency 1,4,8] [--llm-ms 50] [--live] [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+sys.path.insert(0, str(BENCH_DIR))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--concurrency", default="1,4,8")
+    parser.add_argument("--llm-ms", type=float, default=50.0, help="Stub LLM response time")
+    parser.add_argument("--live", action="store_true", help="Use the configured Qdrant and chat provider")
+    parser.add_argument("--skip-sequential", action="store_true", help="Skip the answer_structured() baseline")
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    os.environ.update({"ANSWER_CACHE": "0", "FAQ_TIER": "0", "WARMUP": "off"})
+    if not args.live:
+        from stubs import StubChatServer
+
+        chat = StubChatServer(first_token_ms=args.llm_ms, token_ms=0, jitter_ms=0).start()
+        os.environ.update({"OPENAI_API_KEY": "stub", "OPENAI_API_URL": chat.url})
+
+    import query_bot_lite as bot
+
+    if not args.live:
+        from stubs import StubEmbedder, StubQdrant
+
+        bot.qdrant = StubQdrant([f"Manual section {i}: " + "text " * 80 for i in range(50)],
+                                latency_ms=5, jitter_ms=0)
+        bot._embedding_model = StubEmbedder(dim=bot.EMBEDDING_DIM)
+
+    base = [q.strip() for q in (BENCH_DIR / "questions.txt").read_text(encoding="utf-8").splitlines() if q.strip()]
+    questions = [{"id": i, "question": f"{base[i % len(base)]} ({i})"} for i in range(args.questions)]
+
+    rows = []
+    sequential_s = None
+    if not args.skip_sequential:
+        start = time.perf_counter()
+        for q in questions:
+            bot.answer_structured(q["question"], verbose=False)
+        sequential_s = time.perf_counter() - start
+        rows.append({"mode": "sequential", "concurrency": 1, "seconds": round(sequential_s, 2),
+                     "qps": round(len(questions) / sequential_s, 2), "failed": None})
+
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        start = time.perf_counter()
+        results = list(bot.answer_batch(questions, concurrency=concurrency))
+        elapsed = time.perf_counter() - start
+        assert len(results) == len(questions), len(results)
+        rows.append({"mode": "batch", "concurrency": concurrency, "seconds": round(elapsed, 2),
+                     "qps": round(len(questions) / elapsed, 2), "failed": sum(not r["success"] for r in results)})
+
+    for row in rows:
+        if sequential_s:
+            row["speedup"] = round(sequential_s / row["seconds"], 2)
+        print(f"{row['mode']:10s} x{row['concurrency']:<3d} {row['seconds']:8.2f} s  {row['qps']:7.2f} q/s"
+              + (f"  speedup {row['speedup']:.2f}" if sequential_s else ""))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"questions": args.questions, "llm_ms": args.llm_ms, "rows": rows},
+                                             indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
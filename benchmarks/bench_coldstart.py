@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start latency with and without the warm-up phase
+
+For each WARMUP mode, starts a fresh server process (app_lite with a stub
+chat server and stub Qdrant) and measures:
+- ready_s:         process start -> GET /ready returns 200
+- first_request_s: latency of the first /api question after that
+- second_request_s: latency of the next question (warm baseline)
+
+With --embed stub (default) model loading is simulated by --model-load-s;
+--embed model loads the real EMBED_BACKEND, which is what users hit after a
+deploy.
+
+Usage:
+    python benchmarks/bench_coldstart.py [--modes off,preload] [--embed stub|model] [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+sys.path.insert(0, str(BENCH_DIR))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(args):
+    """Child process: stub dependencies, import app_lite (runs WARMUP) and serve."""
+    from stubs import StubChatServer, StubEmbedder, StubQdrant
+
+    chat = StubChatServer(first_token_ms=args.llm_first_token_ms, jitter_ms=0).start()
+    os.environ.update({"OPENAI_API_KEY": "stub", "OPENAI_API_URL": chat.url, "ANSWER_CACHE": "0"})
+
+    import embedding_backends
+    import query_bot_lite as bot
+    from werkzeug.serving import make_server
+
+    bot.qdrant = StubQdrant([f"Manual section {i}" for i in range(50)], latency_ms=5)
+    if args.embed == "stub":
+        def load_stub(name):
+            time.sleep(args.model_load_s)  # stands in for importing torch + loading weights
+            return StubEmbedder(dim=bot.EMBEDDING_DIM)
+        embedding_backends.load_backend = load_stub
+
+    import app_lite
+    server = make_server("127.0.0.1", args.port, app_lite.app, threaded=True)
+    server.serve_forever()
+
+
+def measure(mode, args):
+    port = _free_port()
+    cmd = [sys.executable, __file__, "--serve", "--port", str(port), "--embed", args.embed,
+           "--model-load-s", str(args.model_load_s), "--llm-first-token-ms", str(args.llm_first_token_ms)]
+    env = dict(os.environ, WARMUP=mode)
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with {proc.returncode}")
+            if time.perf_counter() - start > args.timeout:
+                raise RuntimeError("server not ready in time")
+            try:
+                if requests.get(base + "/ready", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            time.sleep(0.05)
+        ready_s = time.perf_counter() - start
+
+        latencies = []
+        for question in ("How do I create a BOM?", "How do I create a purchase order?"):
+            t = time.perf_counter()
+            out = requests.post(base + "/api", json={"question": question}, timeout=args.timeout).json()
+            latencies.append(time.perf_counter() - t)
+            if not out.get("success"):
+                print(f"  [{mode}] request failed: {out}")
+        return {"mode": mode, "ready_s": round(ready_s, 3), "first_request_s": round(latencies[0], 3),
+                "second_request_s": round(latencies[1], 3)}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="off,preload", help="Comma-separated WARMUP modes to compare")
+    parser.add_argument("--embed", choices=("stub", "model"), default="stub")
+    parser.add_argument("--model-load-s", type=float, default=4.0, help="Simulated model load time (stub)")
+    parser.add_argument("--llm-first-token-ms", type=float, default=300.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    rows = []
+    for mode in args.modes.split(","):
+        row = measure(mode.strip(), args)
+        rows.append(row)
+        print(f"{row['mode']:10s} ready {row['ready_s']:7.3f}s  first request {row['first_request_s']:7.3f}s  "
+              f"second request {row['second_request_s']:7.3f}s")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"embed": args.embed, "rows": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: prompt tokens and latency with vs. without token-budgeted context
+
+For every question in the fixed set, retrieves top_k chunks once, then
+builds the prompt two ways:
+- before: all retrieved chunks verbatim (CONTEXT_BUDGETING=0 behaviour)
+- after:  query_bot_lite.select_context (score cutoff + dedup + token budget)
+
+Reports prompt tokens per question and, with --llm, end-to-end latency of
+the chat call for both prompts (uses real provider credits).
+
+Usage:
+    python benchmarks/bench_context.py [--top-k 8] [--llm] [--out results.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import chat_providers
+import query_bot_lite as bot
+from context_builder import count_tokens, format_context
+
+
+def _prompt_tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+def _messages(question, chunks):
+    return [
+        {"role": "system", "content": bot.RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": f"CONTEXT:\n{format_context(chunks)}\n\nQuestion: {question}"},
+    ]
+
+
+def _timed_chat(messages):
+    start = time.perf_counter()
+    chat_providers.complete_with_fallback(bot.CHAT_PROVIDERS, messages, "Bench")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.txt"))
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--llm", action="store_true", help="Also time real LLM calls for both prompts")
+    parser.add_argument("--out", help="Write full results as JSON")
+    args = parser.parse_args()
+
+    questions = [q.strip() for q in Path(args.questions).read_text(encoding="utf-8").splitlines() if q.strip()]
+    rows = []
+    for question in questions:
+        start = time.perf_counter()
+        retrieved = bot.search_qdrant(bot.embed_text(question), top_k=args.top_k)
+        retrieval_s = time.perf_counter() - start
+
+        before = _messages(question, [c for c in retrieved if c.get("text")])
+        selected, stats = bot.select_context(retrieved)
+        after = _messages(question, selected)
+
+        row = {
+            "question": question,
+            "retrieved": len(retrieved),
+            "selected": stats["selected"],
+            "tokens_before": _prompt_tokens(before),
+            "tokens_after": _prompt_tokens(after),
+            "retrieval_ms": round(retrieval_s * 1000, 1),
+        }
+        if args.llm:
+            row["latency_before_s"] = round(retrieval_s + _timed_chat(before), 3)
+            row["latency_after_s"] = round(retrieval_s + _timed_chat(after), 3)
+        rows.append(row)
+        print(f"{row['tokens_before']:6d} -> {row['tokens_after']:6d} tokens  "
+              f"({row['retrieved']} -> {row['selected']} chunks)  {question}")
+
+    summary = {
+        "questions": len(rows),
+        "top_k": args.top_k,
+        "token_budget": bot.CONTEXT_TOKEN_BUDGET,
+        "mean_tokens_before": round(statistics.mean(r["tokens_before"] for r in rows), 1),
+        "mean_tokens_after": round(statistics.mean(r["tokens_after"] for r in rows), 1),
+    }
+    if args.llm:
+        summary["mean_latency_before_s"] = round(statistics.mean(r["latency_before_s"] for r in rows), 3)
+        summary["mean_latency_after_s"] = round(statistics.mean(r["latency_after_s"] for r in rows), 3)
+    print(json.dumps(summary, indent=2))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request forced gc.collect() vs. the memory governor
+
+Each policy runs in a fresh process that serves /api through the Flask test
+client with stubbed Qdrant, embeddings and chat provider. A synthetic
+long-lived object graph (--heap-objects) stands in for the loaded embedding
+model, which is what made every forced full collection expensive:
+- old: interpreter GC thresholds, nothing frozen, two gc.collect() calls per
+       request (the former app_lite.api + answer_structured behaviour)
+- new: GC_THRESHOLDS / GC_FREEZE defaults, memory_governor.check() only
+       collects near MEMORY_BUDGET_MB
+
+Reports per-request latency (p50/p95/max), total GC pause time, number of
+collections and RSS after the run.
+
+Usage:
+    python benchmarks/bench_gc.py [--requests 200] [--heap-objects 1000000] [--out results.json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+sys.path.insert(0, str(BENCH_DIR))
+
+
+def _build_heap(n):
+    """Container objects tracked by the GC, shaped loosely like a module/parameter graph."""
+    return [{"name": f"layer{i}", "shape": [i % 384, 384], "children": []} for i in range(n // 3)]
+
+
+def run_policy(args):
+    """Child process: serve questions under one policy and print a JSON summary."""
+    from stubs import StubChatServer, StubEmbedder, StubQdrant
+
+    chat = StubChatServer(first_token_ms=args.llm_ms, token_ms=0, jitter_ms=0).start()
+    os.environ.update({"OPENAI_API_KEY": "stub", "OPENAI_API_URL": chat.url, "ANSWER_CACHE": "0",
+                       "WARMUP": "off", "COALESCE": "0", "RATE_LIMIT_PER_MINUTE": "0"})
+    if args.policy == "old":
+        os.environ.update({"GC_THRESHOLDS": "", "GC_FREEZE": "0"})
+
+    import metrics
+    import query_bot_lite as bot
+    import app_lite
+
+    bot.qdrant = StubQdrant([f"Manual section {i}: " + "text " * 80 for i in range(50)], latency_ms=1, jitter_ms=0)
+    bot._embedding_model = StubEmbedder(dim=bot.EMBEDDING_DIM)
+    model_graph = _build_heap(args.heap_objects)  # noqa: F841 - kept alive like a loaded model
+    if args.policy == "old":
+        bot.memory_governor.check = lambda: (gc.collect(), gc.collect())
+    else:
+        bot.memory_governor.freeze()  # what warm_up() / the lazy model load now do
+
+    client = app_lite.app.test_client()
+    questions = [q.strip() for q in (BENCH_DIR / "questions.txt").read_text(encoding="utf-8").splitlines() if q.strip()]
+    pause_before, collections_before = metrics._gc_state["pause_seconds"], metrics._gc_state["collections"]
+    latencies = []
+    for i in range(args.requests):
+        start = time.perf_counter()
+        resp = client.post("/api", json={"question": f"{questions[i % len(questions)]} ({i})"})
+        latencies.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.status_code
+
+    latencies.sort()
+    print(json.dumps({
+        "policy": args.policy,
+        "requests": args.requests,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+        "gc_pause_ms": round((metrics._gc_state["pause_seconds"] - pause_before) * 1000, 1),
+        "gc_collections": metrics._gc_state["collections"] - collections_before,
+        "rss_mb": round(metrics.rss_bytes() / 1048576, 1),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--heap-objects", type=int, default=1_000_000, help="Long-lived tracked objects")
+    parser.add_argument("--llm-ms", type=float, default=20.0, help="Stub LLM response time")
+    parser.add_argument("--out", help="Write results as JSON")
+    parser.add_argument("--policy", choices=("old", "new"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.policy:
+        run_policy(args)
+        return
+
+    rows = []
+    for policy in ("old", "new"):
+        cmd = [sys.executable, __file__, "--policy", policy, "--requests", str(args.requests),
+               "--heap-objects", str(args.heap_objects), "--llm-ms", str(args.llm_ms)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        row = json.loads(out.strip().splitlines()[-1])
+        rows.append(row)
+        print(f"{policy:4s} p50 {row['p50_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms  max {row['max_ms']:8.2f} ms  "
+              f"gc {row['gc_pause_ms']:8.1f} ms / {row['gc_collections']} collections  rss {row['rss_mb']} MB")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"heap_objects": args.heap_objects, "rows": rows}, indent=2),
+                                  encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
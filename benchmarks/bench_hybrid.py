@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dense-only vs hybrid (BM25 + dense, RRF) retrieval at small top_k
+
+For every question and each k, retrieves with the dense searcher alone and
+with the hybrid fusion, and reports:
+- recall@k:       share of labelled relevant chunk ids retrieved (needs --labels,
+                  a JSON file {"question": ["chunk id", ...]})
+- term coverage:  share of the question's content terms found in the retrieved
+                  text (label-free proxy for exact-term matches)
+- search latency
+
+Needs Qdrant credentials; the BM25 index is built or loaded from
+LEXICAL_INDEX_PATH as in the app.
+
+Usage:
+    python benchmarks/bench_hybrid.py [--k 3,5,8] [--labels labels.json] [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+os.environ["HYBRID_SEARCH"] = "1"
+
+import query_bot_lite as bot
+from lexical_index import tokenize
+
+
+def _coverage(question, results):
+    terms = set(tokenize(question))
+    if not terms:
+        return 1.0
+    found = set()
+    for r in results:
+        found |= terms & set(tokenize(r.get("text")))
+    return len(found) / len(terms)
+
+
+def _recall(relevant, results):
+    if not relevant:
+        return None
+    ids = {str(r["id"]) for r in results}
+    return len(ids & {str(i) for i in relevant}) / len(relevant)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.txt"))
+    parser.add_argument("--k", default="3,5,8", help="Comma-separated top_k values")
+    parser.add_argument("--labels", help="JSON {question: [relevant chunk ids]}")
+    parser.add_argument("--out", help="Write full results as JSON")
+    args = parser.parse_args()
+
+    questions = [q.strip() for q in Path(args.questions).read_text(encoding="utf-8").splitlines() if q.strip()]
+    labels = json.loads(Path(args.labels).read_text(encoding="utf-8")) if args.labels else {}
+    ks = [int(k) for k in args.k.split(",")]
+    if not bot.load_lexical_index():
+        raise SystemExit("[bench] BM25 index unavailable")
+
+    rows = []
+    for question in questions:
+        q_emb = bot.embed_text(question)
+        for k in ks:
+            dense, dense_ms = _timed(lambda: bot.search_qdrant(q_emb, top_k=k))
+            hybrid, hybrid_ms = _timed(lambda: bot.search_qdrant(q_emb, top_k=k, query_text=question))
+            rows.append({
+                "question": question,
+                "k": k,
+                "dense_coverage": round(_coverage(question, dense), 3),
+                "hybrid_coverage": round(_coverage(question, hybrid), 3),
+                "dense_recall": _recall(labels.get(question), dense),
+                "hybrid_recall": _recall(labels.get(question), hybrid),
+                "dense_ms": round(dense_ms, 1),
+                "hybrid_ms": round(hybrid_ms, 1),
+            })
+
+    summary = []
+    for k in ks:
+        at_k = [r for r in rows if r["k"] == k]
+        line = {"k": k}
+        for key in ("dense_coverage", "hybrid_coverage", "dense_recall", "hybrid_recall", "dense_ms", "hybrid_ms"):
+            values = [r[key] for r in at_k if r[key] is not None]
+            line[key] = round(statistics.mean(values), 3) if values else None
+        summary.append(line)
+        print(f"k={k:2d}  coverage {line['dense_coverage']} -> {line['hybrid_coverage']}  "
+              f"recall {line['dense_recall']} -> {line['hybrid_recall']}  "
+              f"search {line['dense_ms']} -> {line['hybrid_ms']} ms")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
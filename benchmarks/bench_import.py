@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark / budget check: import time of the web app
+
+Runs `python -X importtime -c "import app_lite"` (WARMUP=off, so only the
+import itself is measured, not the model warm-up) in --repeats fresh
+processes and reports the median cumulative import time of app_lite and
+query_bot_lite plus the heaviest top-level modules.
+
+Exits non-zero if the median exceeds --budget-ms or if any module in
+--forbid (heavy dependencies that must load on first use, not at startup)
+was imported, so it can run as a CI gate.
+
+Usage:
+    python benchmarks/bench_import.py [--repeats 5] [--budget-ms 500] [--top 10] [--out results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+
+# Loaded lazily by query_bot_lite / chat_providers / embedding_backends
+DEFAULT_FORBID = "qdrant_client,requests,httpx,torch,sentence_transformers,onnxruntime,tokenizers"
+
+
+def importtime(module):
+    """Return {module: (self_us, cumulative_us, depth)} for one fresh `import module`."""
+    env = dict(os.environ, WARMUP="off", PYTHONPATH=str(BACKEND_DIR))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        self_us = int(head.split(":")[1])
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules[name.strip()] = (self_us, int(cumulative_us), depth)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app_lite")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=500.0)
+    parser.add_argument("--forbid", default=DEFAULT_FORBID, help="Comma-separated modules that must not load")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    runs = [importtime(args.module) for _ in range(args.repeats)]
+    total_ms = statistics.median(r[args.module][1] for r in runs) / 1000
+    bot_ms = statistics.median(r.get("query_bot_lite", (0, 0, 0))[1] for r in runs) / 1000
+    top_level = sorted(((name, cum) for name, (_, cum, depth) in runs[-1].items() if depth == 1),
+                       key=lambda item: -item[1])[:args.top]
+    forbidden = sorted(m for m in args.forbid.split(",") if m and any(m in r for r in runs))
+
+    print(f"{args.module}: {total_ms:.1f} ms (query_bot_lite {bot_ms:.1f} ms, median of {args.repeats})")
+    for name, cum in top_level:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+    ok = total_ms <= args.budget_ms and not forbidden
+    print(f"budget {args.budget_ms:.0f} ms: {'OK' if total_ms <= args.budget_ms else 'EXCEEDED'}"
+          + (f"; eagerly imported: {', '.join(forbidden)}" if forbidden else ""))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({
+            "module": args.module, "median_ms": round(total_ms, 1), "query_bot_lite_ms": round(bot_ms, 1),
+            "budget_ms": args.budget_ms, "forbidden_imported": forbidden,
+            "top": [{"module": n, "ms": round(c / 1000, 1)} for n, c in top_level],
+        }, indent=2), encoding="utf-8")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full vs. incremental ingestion of the manual
+
+Generates a synthetic manual (--docs documents of --sections sections each)
+and ingests it with backend/ingest.py into an in-memory Qdrant
+(QdrantClient(":memory:")). Five runs:
+- full:      empty collection, every chunk embedded
+- no-op:     nothing changed, every document skipped by the checkpoint
+- edit:      one paragraph of one document rewritten
+- crash:     collection dropped and rebuilt, embedding fails after 5 batches
+- resume:    the next run skips the documents the checkpoint marked done and
+             does not re-embed chunks the crashed run already upserted
+
+Embeddings are stubbed (--embed-ms per batch) unless --real-model is given,
+which uses the configured embedding backend. Reports seconds and embedded /
+unchanged / deleted chunk counts per run.
+
+Usage:
+    python benchmarks/bench_ingest.py [--docs 40] [--sections 12] [--batch-size 16] [--embed-ms 20] [--real-model] [--out results.json]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from qdrant_client import QdrantClient
+
+import ingest
+
+WORDS = ("purchase order vendor quotation item quantity rate approve save project budget invoice tax "
+         "customer delivery warehouse report export status module field button menu click select").split()
+
+
+def _paragraph(rng, n_words=45):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def write_manual(root, docs, sections, seed=7):
+    rng = random.Random(seed)
+    for d in range(docs):
+        lines = []
+        for s in range(sections):
+            lines.append(f"## Module {d} section {s}")
+            lines.extend(_paragraph(rng) + "\n" for _ in range(4))
+        (root / f"chapter_{d:03d}.md").write_text("\n".join(lines), encoding="utf-8")
+
+
+class FailingEmbed:
+    """Wraps an embed function and raises after `fail_after` batches (simulated crash)."""
+
+    def __init__(self, embed, fail_after):
+        self.embed = embed
+        self.fail_after = fail_after
+
+    def __call__(self, texts):
+        if self.fail_after <= 0:
+            raise RuntimeError("simulated embedding failure")
+        self.fail_after -= 1
+        return self.embed(texts)
+
+
+def run(label, root, client, embed, dim, state_path, batch_size, **kwargs):
+    writer = ingest.Ingestor(client, "bench_chunks", embed, dim, batch_size=batch_size)
+    state = ingest.IngestState(state_path, "bench_chunks").load()
+    start = time.perf_counter()
+    summary = ingest.ingest(root, writer, state, **kwargs)
+    row = {"run": label, "seconds": round(time.perf_counter() - start, 3)}
+    row.update({k: summary[k] for k in ("documents", "skipped", "chunks", "embedded", "unchanged", "deleted")})
+    row["failed"] = len(summary["failed"])
+    print(f"{label:8s} {row['seconds']:7.3f} s  docs {row['documents']:3d} (skipped {row['skipped']:3d}, "
+          f"failed {row['failed']})  embedded {row['embedded']:5d}  unchanged {row['unchanged']:5d}  "
+          f"deleted {row['deleted']:4d}")
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=40)
+    parser.add_argument("--sections", type=int, default=12)
+    parser.add_argument("--batch-size", type=int, default=16, help="Chunks per embed/upsert batch")
+    parser.add_argument("--embed-ms", type=float, default=20.0, help="Stub embedding time per batch")
+    parser.add_argument("--real-model", action="store_true", help="Embed with the configured backend")
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    if args.real_model:
+        import query_bot_lite as bot
+
+        embed, dim = bot.embed_texts, bot.EMBEDDING_DIM
+    else:
+        from stubs import StubEmbedder
+
+        model = StubEmbedder(latency_ms=args.embed_ms)
+        embed, dim = (lambda texts: model.encode(texts).tolist()), model.dim
+
+    client = QdrantClient(":memory:")
+    with tempfile.TemporaryDirectory() as tmp:
+        root, state_path = Path(tmp) / "manual", Path(tmp) / "state.json"
+        root.mkdir()
+        write_manual(root, args.docs, args.sections)
+        rows = [run("full", root, client, embed, dim, state_path, args.batch_size),
+                run("no-op", root, client, embed, dim, state_path, args.batch_size)]
+
+        doc = root / "chapter_000.md"
+        lines = doc.read_text(encoding="utf-8").splitlines()
+        lines[1] = "Rewritten: to approve a purchase order click Approve in the toolbar."
+        doc.write_text("\n".join(lines), encoding="utf-8")
+        rows.append(run("edit", root, client, embed, dim, state_path, args.batch_size))
+
+        client.delete_collection("bench_chunks")
+        rows.append(run("crash", root, client, FailingEmbed(embed, fail_after=5), dim, state_path, args.batch_size))
+        rows.append(run("resume", root, client, embed, dim, state_path, args.batch_size))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"docs": args.docs, "sections": args.sections, "rows": rows}, indent=2),
+                                  encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: system prompt variants, provider prompt caching and time to first token
+
+Offline (default) it prints the estimated token count of every system prompt
+variant. With --llm it streams --repeats calls per variant against the
+primary provider (uses real credits) with a fixed question and context, and
+reports median time to first token plus the provider-reported prompt and
+cached prompt tokens. The first call of a variant warms the provider cache;
+cached tokens should appear from the second call on for prompts longer than
+the provider's minimum (1024 tokens for OpenAI).
+
+Usage:
+    python benchmarks/bench_prompt.py [--llm] [--repeats 5] [--variants full,compact] [--out results.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import query_bot_lite as bot
+from context_builder import count_tokens
+
+QUESTION = "How do I create a purchase order?"
+CONTEXT = (
+    "[1] To create a purchase order, open Purchase > Purchase Orders and click New. Select the vendor, "
+    "add items with quantity and rate, then click Save & Approve to send it for approval."
+)
+
+
+def _stream_once(provider, system_prompt):
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": f"CONTEXT:\n{CONTEXT}\n\nQuestion: {QUESTION}"},
+    ]
+    usage = {}
+    start = time.perf_counter()
+    ttft = None
+    for _ in provider.stream(messages, usage=usage):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+    return ttft, usage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", default=",".join(bot.SYSTEM_PROMPTS))
+    parser.add_argument("--llm", action="store_true", help="Stream real calls and read provider usage")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--out", help="Write results as JSON")
+    args = parser.parse_args()
+
+    provider = next((p for p in bot.CHAT_PROVIDERS if p.available), None)
+    rows = []
+    for variant in args.variants.split(","):
+        prompt = bot.SYSTEM_PROMPTS[variant]
+        row = {"variant": variant, "system_tokens_est": count_tokens(prompt)}
+        if args.llm:
+            if provider is None:
+                raise SystemExit("[bench] no chat provider configured")
+            calls = [_stream_once(provider, prompt) for _ in range(args.repeats)]
+            row.update({
+                "provider": provider.name,
+                "first_call_ttft_ms": round(calls[0][0] * 1000, 1),
+                "median_ttft_ms": round(statistics.median(c[0] for c in calls[1:] or calls) * 1000, 1),
+                "prompt_tokens": calls[-1][1].get("prompt_tokens"),
+                "cached_tokens": calls[-1][1].get("cached_tokens"),
+            })
+        rows.append(row)
+        print(json.dumps(row))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"rows": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
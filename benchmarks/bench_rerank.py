@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cross-encoder rerank cost vs. prompt token savings
+
+For every question in the fixed set, retrieves RERANK_CANDIDATES chunks once,
+then builds the prompt two ways:
+- before: first top_k chunks in vector order through select_context
+- after:  cross-encoder scores for all candidates (one batched forward pass),
+          best --keep chunks through select_context
+
+Reports the median forward-pass time per question (model already loaded, so
+this is the steady-state cost counted against RERANK_BUDGET_MS), prompt
+tokens for both prompts and, with --llm, chat latency for both (uses real
+provider credits).
+
+Usage:
+    python benchmarks/bench_rerank.py [--backend onnx|torch] [--top-k 5] [--keep 3] [--llm] [--out results.json]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+
+import chat_providers
+import query_bot_lite as bot
+from context_builder import count_tokens, format_context
+from reranker import load_cross_encoder
+
+
+def _messages(question, chunks):
+    selected, _ = bot.select_context(chunks)
+    return [
+        {"role": "system", "content": bot.RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": f"CONTEXT:\n{format_context(selected)}\n\nQuestion: {question}"},
+    ], len(selected)
+
+
+def _prompt_tokens(messages):
+    return sum(count_tokens(m["content"]) for m in messages)
+
+
+def _timed_chat(messages):
+    start = time.perf_counter()
+    chat_providers.complete_with_fallback(bot.CHAT_PROVIDERS, messages, "Bench")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.txt"))
+    parser.add_argument("--backend", default=None, help="RERANK_BACKEND (default: EMBED_BACKEND)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=bot.RERANK_CANDIDATES)
+    parser.add_argument("--keep", type=int, default=bot.RERANK_KEEP)
+    parser.add_argument("--repeats", type=int, default=5, help="Forward passes per question (median)")
+    parser.add_argument("--llm", action="store_true", help="Also time real LLM calls for both prompts")
+    parser.add_argument("--out", help="Write full results as JSON")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = load_cross_encoder(args.backend)
+    load_s = time.perf_counter() - start
+    model.score("warm up", ["warm up"])
+    print(f"[bench] {model.name} cross-encoder loaded in {load_s:.2f}s")
+
+    questions = [q.strip() for q in Path(args.questions).read_text(encoding="utf-8").splitlines() if q.strip()]
+    rows = []
+    for question in questions:
+        candidates = [c for c in bot.search_qdrant(bot.embed_text(question), top_k=args.candidates,
+                                                   query_text=question) if c.get("text")]
+        texts = [c["text"] for c in candidates]
+        times = []
+        for _ in range(args.repeats):
+            t = time.perf_counter()
+            scores = model.score(question, texts)
+            times.append(time.perf_counter() - t)
+        order = np.argsort(-scores)[:args.keep]
+        reranked = [dict(candidates[i], rerank_score=float(scores[i])) for i in order]
+
+        before, n_before = _messages(question, candidates[:args.top_k])
+        after, n_after = _messages(question, reranked)
+        row = {
+            "question": question,
+            "candidates": len(candidates),
+            "rerank_ms": round(statistics.median(times) * 1000, 1),
+            "chunks_before": n_before,
+            "chunks_after": n_after,
+            "tokens_before": _prompt_tokens(before),
+            "tokens_after": _prompt_tokens(after),
+            "top_changed": bool(reranked and candidates and reranked[0]["id"] != candidates[0]["id"]),
+        }
+        if args.llm:
+            row["llm_before_s"] = round(_timed_chat(before), 3)
+            row["llm_after_s"] = round(_timed_chat(after), 3)
+        rows.append(row)
+        print(f"{row['rerank_ms']:7.1f} ms  {row['tokens_before']:5d} -> {row['tokens_after']:5d} tokens  "
+              f"({row['chunks_before']} -> {row['chunks_after']} chunks)  {question}")
+
+    summary = {
+        "backend": model.name,
+        "questions": len(rows),
+        "candidates": args.candidates,
+        "top_k": args.top_k,
+        "keep": args.keep,
+        "model_load_s": round(load_s, 2),
+        "median_rerank_ms": round(statistics.median(r["rerank_ms"] for r in rows), 1),
+        "max_rerank_ms": max(r["rerank_ms"] for r in rows),
+        "within_budget": sum(r["rerank_ms"] <= bot.RERANK_BUDGET_MS for r in rows),
+        "mean_tokens_before": round(statistics.mean(r["tokens_before"] for r in rows), 1),
+        "mean_tokens_after": round(statistics.mean(r["tokens_after"] for r in rows), 1),
+        "top_chunk_changed": sum(r["top_changed"] for r in rows),
+    }
+    if args.llm:
+        summary["mean_llm_before_s"] = round(statistics.mean(r["llm_before_s"] for r in rows), 3)
+        summary["mean_llm_after_s"] = round(statistics.mean(r["llm_after_s"] for r in rows), 3)
+    print(json.dumps(summary, indent=2))
+
+    if args.out:
+        Path(args.out).write_text(json.dumps({"summary": summary, "rows": rows}, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Offline load test for app_lite (no API credits, no Qdrant, no model download)
+
+Starts a stub OpenAI-compatible chat server (benchmarks/stubs.py), swaps the
+Qdrant client and embedding model of query_bot_lite for in-memory stand-ins,
+serves app_lite on a local port and replays the question corpus against
+/api (or /api/stream) at a fixed concurrency.
+
+Reports p50/p95/p99 latency (and time to first token when streaming),
+throughput, error/timeout/fallback/rejection (429/503) rates and peak RSS of this process
+(server + stubs + load generator), and writes everything to a JSON file so
+runs can be compared across changes.
+
+Usage:
+    python benchmarks/loadtest.py [--requests 200] [--concurrency 8] [--stream]
+        [--llm-first-token-ms 400] [--llm-error-rate 0.05] [--qdrant-ms 5]
+        [--embed stub|model] [--env HEDGING=1] [--out run.json] [--compare base.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "backend"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from stubs import StubChatServer, StubEmbedder, StubQdrant  # noqa: E402
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _latency_summary(values):
+    if not values:
+        return {}
+    return {
+        "p50_ms": round(_percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(values, 0.99) * 1000, 1),
+        "mean_ms": round(statistics.mean(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def _counter_total(metrics_text, name):
+    """Sum every sample of a counter in Prometheus text output."""
+    total = 0.0
+    for line in metrics_text.splitlines():
+        if line.startswith(name + "{") or line.startswith(name + " "):
+            total += float(line.rsplit(" ", 1)[1])
+    return total
+
+
+class RssSampler(threading.Thread):
+    """Polls the process RSS and keeps the maximum."""
+
+    def __init__(self, interval=0.02):
+        super().__init__(name="rss-sampler", daemon=True)
+        import metrics
+        self._rss = metrics.rss_bytes
+        self.interval = interval
+        self.peak = self._rss()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, self._rss())
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def start_app(args, questions):
+    """Configure the environment, import app_lite with stubbed dependencies and serve it."""
+    chat = StubChatServer(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms,
+                          jitter_ms=args.llm_jitter_ms, error_rate=args.llm_error_rate).start()
+    os.environ.update({
+        "OPENAI_API_KEY": "stub", "OPENAI_API_URL": chat.url,
+        "OPENROUTER_API_KEY": "stub", "OPENROUTER_API_URL": chat.url,
+        "ANSWER_CACHE": "1" if args.answer_cache else "0",
+        "PROVIDER_BACKOFF": "0",
+        "WARMUP": "off",  # the stub embedder is swapped in after import
+        "RATE_LIMIT_PER_MINUTE": "0",  # every simulated user comes from 127.0.0.1
+    })
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+
+    import app_lite
+    import query_bot_lite as bot
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no per-request access log
+
+    chunks = [f"Manual section {i + 1}. {q}\n" + "Open the module, fill in the form and click Save. " * 20
+              for i, q in enumerate(questions)]
+    bot.qdrant = StubQdrant(chunks, keys=questions, latency_ms=args.qdrant_ms, jitter_ms=args.qdrant_ms / 2)
+    if args.embed == "stub":
+        bot._embedding_model = StubEmbedder(dim=bot.EMBEDDING_DIM, latency_ms=args.embed_ms)
+    else:
+        bot.get_embedding_model()  # load once so model loading is not part of the measurement
+
+    server = make_server("127.0.0.1", 0, app_lite.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="app-server", daemon=True).start()
+    return server, chat, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_load(base_url, questions, args, count):
+    """Send count questions with args.concurrency workers; one record per request."""
+    local = threading.local()
+    route = "/api/stream" if args.stream else "/api"
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session_id = uuid.uuid4().hex
+        payload = {"question": questions[i % len(questions)], "session_id": local.session_id}
+        start = time.perf_counter()
+        record = {"status": None, "success": False, "ttft": None}
+        try:
+            resp = local.session.post(base_url + route, json=payload, timeout=args.timeout, stream=args.stream)
+            record["status"] = resp.status_code
+            if args.stream:
+                final = {}
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event.get("type") == "token" and record["ttft"] is None:
+                        record["ttft"] = time.perf_counter() - start
+                    if event.get("type") in ("done", "error"):
+                        final = event
+                record["success"] = bool(final.get("success"))
+            else:
+                record["success"] = bool(resp.json().get("success"))
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency"] = time.perf_counter() - start
+        return record
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        start = time.perf_counter()
+        records = list(pool.map(one, range(count)))
+        elapsed = time.perf_counter() - start
+    return records, elapsed
+
+
+def summarize(records, elapsed, counters, rss, args):
+    latencies = [r["latency"] for r in records if r["status"] == 200]
+    ttfts = [r["ttft"] for r in records if r["ttft"] is not None]
+    n = len(records)
+    summary = {
+        "requests": n,
+        "concurrency": args.concurrency,
+        "route": "/api/stream" if args.stream else "/api",
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(n / elapsed, 2) if elapsed else None,
+        "success_rate": round(sum(r["success"] for r in records) / n, 4) if n else None,
+        "http_error_rate": round(sum(1 for r in records if r["status"] not in (200, 429, 503)) / n, 4) if n else None,
+        "rejected_rate": round(sum(1 for r in records if r["status"] in (429, 503)) / n, 4) if n else None,
+        "timeout_rate": round(counters["timeouts"] / n, 4) if n else None,
+        "fallback_rate": round(counters["fallbacks"] / n, 4) if n else None,
+        "latency": _latency_summary(latencies),
+        "peak_rss_mb": round(rss["peak"] / 1024 / 1024, 1),
+        "start_rss_mb": round(rss["start"] / 1024 / 1024, 1),
+    }
+    if ttfts:
+        summary["first_token"] = _latency_summary(ttfts)
+    return summary
+
+
+def compare(summary, baseline_path):
+    """Print the change of the headline numbers against a previous results file."""
+    base = json.loads(Path(baseline_path).read_text(encoding="utf-8"))["summary"]
+    rows = [("throughput_rps", summary.get("throughput_rps"), base.get("throughput_rps")),
+            ("peak_rss_mb", summary.get("peak_rss_mb"), base.get("peak_rss_mb")),
+            ("timeout_rate", summary.get("timeout_rate"), base.get("timeout_rate"))]
+    for key in ("p50_ms", "p95_ms", "p99_ms"):
+        rows.append((f"latency.{key}", summary["latency"].get(key), base.get("latency", {}).get(key)))
+    print(f"\nvs {baseline_path}")
+    for name, new, old in rows:
+        if new is None or old is None:
+            continue
+        delta = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"  {name:16s} {old:>10} -> {new:>10}  ({delta})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--questions", default=str(BENCH_DIR / "questions.txt"))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--stream", action="store_true", help="Load /api/stream instead of /api")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Client-side request timeout (s)")
+    parser.add_argument("--llm-first-token-ms", type=float, default=400.0)
+    parser.add_argument("--llm-token-ms", type=float, default=15.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--qdrant-ms", type=float, default=5.0)
+    parser.add_argument("--embed", choices=("stub", "model"), default="stub",
+                        help="stub: hash vectors (no download); model: the configured EMBED_BACKEND")
+    parser.add_argument("--embed-ms", type=float, default=10.0, help="Latency of the stub embedder")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache on")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the app (repeatable), e.g. HEDGING=1")
+    parser.add_argument("--out", help="Results JSON (default: benchmarks/results/loadtest-<time>.json)")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    questions = [q.strip() for q in Path(args.questions).read_text(encoding="utf-8").splitlines() if q.strip()]
+    server, chat, base_url = start_app(args, questions)
+    sampler = RssSampler()
+    start_rss = sampler.peak
+    sampler.start()
+
+    try:
+        # Warm-up (not measured): connection pools, lazy imports
+        run_load(base_url, questions, args, args.warmup)
+        before = requests.get(base_url + "/metrics", timeout=10).text
+        records, elapsed = run_load(base_url, questions, args, args.requests)
+        after = requests.get(base_url + "/metrics", timeout=10).text
+    finally:
+        peak_rss = sampler.stop()
+        server.shutdown()
+        chat.stop()
+
+    counters = {name: _counter_total(after, f"quoteplan_{name}_total") - _counter_total(before, f"quoteplan_{name}_total")
+                for name in ("timeouts", "fallbacks")}
+    summary = summarize(records, elapsed, counters, {"peak": peak_rss, "start": start_rss}, args)
+    print(json.dumps(summary, indent=2))
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "compare")}
+    out = Path(args.out) if args.out else BENCH_DIR / "results" / f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": _git_revision(),
+        "config": config,
+        "llm_calls": chat.calls,
+        "summary": summary,
+    }, indent=2), encoding="utf-8")
+    print(f"Results written to {out}")
+
+    if args.compare:
+        compare(summary, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the external services used by the answer pipeline
+
+- StubChatServer: OpenAI-compatible /v1/chat/completions over real HTTP
+  (JSON and SSE streaming) with configurable latency, jitter and error rate
+- StubQdrant: duck-typed QdrantClient (query_points, query_batch_points,
+  get_collection, scroll, retrieve) over an in-memory NumPy matrix
+- StubEmbedder: deterministic hash-based "model" with an encode() method
+
+Used by benchmarks/loadtest.py so throughput and latency can be measured
+without API credits, a Qdrant server or the embedding model download.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import numpy as np
+
+STUB_ANSWER = (
+    "To do this in QuotePlan, open the relevant module from the main menu, "
+    "fill in the required fields and click Save. The record is then listed "
+    "with its status and can be edited or exported at any time."
+)
+
+
+def _sleep_ms(mean_ms, jitter_ms=0.0):
+    delay = mean_ms + (random.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+    if delay > 0:
+        time.sleep(delay / 1000.0)
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        cfg = self.server.config
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.calls += 1
+
+        if cfg["error_rate"] and random.random() < cfg["error_rate"]:
+            self._send(503, b'{"error": {"message": "stub overloaded"}}')
+            return
+
+        words = cfg["answer"].split(" ")
+        usage = {"prompt_tokens": sum(len(m.get("content", "")) // 4 for m in body.get("messages", [])),
+                 "completion_tokens": len(words)}
+        _sleep_ms(cfg["first_token_ms"], cfg["jitter_ms"])
+
+        if not body.get("stream"):
+            _sleep_ms(cfg["token_ms"] * len(words))
+            out = {"choices": [{"message": {"role": "assistant", "content": cfg["answer"]}}], "usage": usage}
+            self._send(200, json.dumps(out).encode("utf-8"))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i:
+                _sleep_ms(cfg["token_ms"])
+            delta = {"choices": [{"delta": {"content": (" " if i else "") + word}}]}
+            self._chunk("data: " + json.dumps(delta) + "\n\n")
+        self._chunk("data: " + json.dumps({"choices": [], "usage": usage}) + "\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+
+class StubChatServer:
+    """OpenAI-compatible chat completions endpoint on 127.0.0.1 (port 0 = any free port)."""
+
+    def __init__(self, first_token_ms=400.0, token_ms=15.0, jitter_ms=100.0, error_rate=0.0,
+                 answer=STUB_ANSWER, port=0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), _ChatHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.calls = 0
+        self.httpd.config = {
+            "first_token_ms": first_token_ms,
+            "token_ms": token_ms,
+            "jitter_ms": jitter_ms,
+            "error_rate": error_rate,
+            "answer": answer,
+        }
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}/v1/chat/completions"
+
+    @property
+    def calls(self):
+        return self.httpd.calls
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="stub-chat", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def hash_vector(text, dim=384):
+    """Deterministic unit vector for a text (same text -> same vector)."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+class StubEmbedder:
+    """Stands in for the embedding backend: encode(texts) -> (n, dim) array."""
+
+    def __init__(self, dim=384, latency_ms=0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+
+    def encode(self, texts):
+        texts = list(texts)
+        _sleep_ms(self.latency_ms)
+        return np.stack([hash_vector(t, self.dim) for t in texts]) if texts else np.zeros((0, self.dim))
+
+
+class StubQdrant:
+    """Minimal in-memory QdrantClient replacement with per-call latency.
+
+    Each chunk's vector is hash_vector(key); pass the benchmark questions as
+    keys so every question retrieves "its" chunk with score 1.0.
+    """
+
+    def __init__(self, texts, keys=None, dim=384, latency_ms=5.0, jitter_ms=2.0):
+        self.texts = list(texts)
+        self.ids = list(range(1, len(self.texts) + 1))
+        keys = list(keys) if keys is not None else self.texts
+        self.matrix = np.stack([hash_vector(k, dim) for k in keys]) if keys else np.zeros((0, dim))
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+
+    def _top(self, query, limit):
+        q = np.asarray(query, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        scores = self.matrix @ q
+        order = np.argsort(-scores)[:limit]
+        return [SimpleNamespace(id=self.ids[i], score=float(scores[i]), payload={"text": self.texts[i]},
+                                vector=self.matrix[i].tolist()) for i in order]
+
+    def query_points(self, collection_name, query, limit=10, with_payload=True, **kwargs):
+        self.calls += 1
+        _sleep_ms(self.latency_ms, self.jitter_ms)
+        return SimpleNamespace(points=self._top(query, limit))
+
+    def query_batch_points(self, collection_name, requests, **kwargs):
+        self.calls += 1
+        _sleep_ms(self.latency_ms, self.jitter_ms)
+        return [SimpleNamespace(points=self._top(r.query, r.limit)) for r in requests]
+
+    def get_collection(self, collection_name):
+        return SimpleNamespace(points_count=len(self.ids), indexed_vectors_count=len(self.ids), segments_count=1)
+
+    def scroll(self, collection_name, limit=256, offset=None, with_payload=True, with_vectors=False, **kwargs):
+        start = offset or 0
+        points = [SimpleNamespace(id=self.ids[i], payload={"text": self.texts[i]},
+                                  vector=self.matrix[i].tolist() if with_vectors else None)
+                  for i in range(start, min(start + limit, len(self.ids)))]
+        next_offset = start + limit if start + limit < len(self.ids) else None
+        return points, next_offset
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        index = {pid: i for i, pid in enumerate(self.ids)}
+        return [SimpleNamespace(id=pid, payload={"text": self.texts[index[pid]]},
+                                vector=self.matrix[index[pid]].tolist() if with_vectors else None)
+                for pid in ids if pid in index]
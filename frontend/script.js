@@ -212,6 +212,19 @@ function removeLoadingIndicator() {
    ================================================================ */
 let lastQuestion = ""
 
+/* One id per browser tab so follow-ups use this user's previous answer */
+function getSessionId() {
+  let id = sessionStorage.getItem("quoteplanSessionId")
+  if (!id) {
+    id = (window.crypto && crypto.randomUUID)
+      ? crypto.randomUUID()
+      : Date.now().toString(36) + Math.random().toString(36).slice(2)
+    sessionStorage.setItem("quoteplanSessionId", id)
+  }
+  return id
+}
+const sessionId = getSessionId()
+
 async function sendMessage(event) {
   if (event) event.preventDefault()
   const question = questionInput.value.trim()
@@ -225,21 +238,28 @@ async function sendMessage(event) {
   sendBtn.disabled = true
 
   try {
-    const response = await fetch("/api", {
+    const response = await fetch("/api/stream", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ question }),
+      body: JSON.stringify({ question, session_id: sessionId }),
     })
 
     if (!response.ok) throw new Error(`API error: ${response.status}`)
-    const data = await response.json()
-    removeLoadingIndicator()
 
-    if (data.success) {
-      addStructuredResponse(data)
-    } else {
-      addMessage(data.error || data.answer || "Unable to fetch response. Please try again.", false, true)
+    // Older browsers without streaming fetch bodies: wait for the full answer
+    if (!response.body || !response.body.getReader) {
+      const events = (await response.text()).split("\n").filter(Boolean).map((l) => JSON.parse(l))
+      removeLoadingIndicator()
+      const last = events[events.length - 1] || {}
+      if (last.success) {
+        addStructuredResponse(last)
+      } else {
+        addMessage(last.error || last.answer || "Unable to fetch response. Please try again.", false, true)
+      }
+      return
     }
+
+    await renderStreamingResponse(response.body.getReader())
   } catch (err) {
     removeLoadingIndicator()
     console.error(err)
@@ -250,6 +270,61 @@ async function sendMessage(event) {
   }
 }
 
+/* ================================================================
+   STREAMING RESPONSE RENDERING (NDJSON events from /api/stream)
+   ================================================================ */
+async function renderStreamingResponse(reader) {
+  const decoder = new TextDecoder()
+  let buffered = ""
+  let answerText = ""
+  let contentDiv = null
+
+  const ensureBubble = () => {
+    if (contentDiv) return
+    removeLoadingIndicator()
+    addMessage("", false, false)
+    const bubbles = messagesContainer.querySelectorAll(".bot-message .message-content")
+    contentDiv = bubbles[bubbles.length - 1]
+  }
+
+  const handleEvent = (event) => {
+    if (event.type === "token") {
+      ensureBubble()
+      answerText += event.text
+      contentDiv.innerHTML = formatMessage(answerText) + '<span class="typing-cursor">|</span>'
+      scrollToBottom()
+    } else if (event.type === "done" || event.type === "error") {
+      ensureBubble()
+      const finalText = event.type === "done" && event.success !== false
+        ? (event.answer || answerText)
+        : (answerText || event.error || event.answer || "Unable to fetch response. Please try again.")
+      contentDiv.innerHTML = formatMessage(finalText)
+      scrollToBottom()
+    }
+  }
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffered += decoder.decode(value, { stream: true })
+    let newline
+    while ((newline = buffered.indexOf("\n")) >= 0) {
+      const line = buffered.slice(0, newline).trim()
+      buffered = buffered.slice(newline + 1)
+      if (line) handleEvent(JSON.parse(line))
+    }
+  }
+  if (buffered.trim()) handleEvent(JSON.parse(buffered))
+
+  // Stream closed without any event
+  if (!contentDiv) {
+    removeLoadingIndicator()
+    addMessage("Unable to fetch response. Please try again.", false, true)
+  } else if (contentDiv.querySelector(".typing-cursor")) {
+    contentDiv.innerHTML = formatMessage(answerText)
+  }
+}
+
 /* ================================================================
    STRUCTURED RESPONSE RENDERING WITH TYPING ANIMATION
    ================================================================ */
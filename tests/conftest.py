@@ -0,0 +1,90 @@
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# Backend modules import each other as top-level modules (as app_lite does)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import chat_providers  # noqa: E402
+
+
+class _ProviderHandler(BaseHTTPRequestHandler):
+    """Answers each POST with the next (status, text) of server.script; the last entry repeats.
+
+    Streaming requests get their text as SSE chunks after server.delay seconds
+    (headers go out immediately); every answer reports a usage block.
+    """
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.calls += 1
+            status, text = self.server.script[0] if len(self.server.script) == 1 else self.server.script.pop(0)
+        if status != 200:
+            self.send_response(status)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        usage = {"prompt_tokens": 7, "completion_tokens": len(text.split(" "))}
+        if not body.get("stream"):
+            payload = json.dumps({"choices": [{"message": {"content": text}}], "usage": usage}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        self.wfile.flush()
+        time.sleep(self.server.delay)
+        for word in text.split(" "):
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        if (body.get("stream_options") or {}).get("include_usage"):
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class _StubProvider:
+    def __init__(self, script, delay=0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ProviderHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.calls = 0
+        self.httpd.script = list(script)
+        self.httpd.delay = delay
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1/chat/completions"
+
+    @property
+    def calls(self):
+        return self.httpd.calls
+
+    def client(self, name, **options):
+        options.setdefault("backoff_factor", 0.0)
+        return chat_providers.ProviderClient(name, self.url, "k", "m", **options)
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def make(script, delay=0.0):
+        server = _StubProvider(script, delay)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.httpd.shutdown()
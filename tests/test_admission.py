@@ -0,0 +1,29 @@
+import os
+
+os.environ.setdefault("WARMUP", "off")
+
+import app_lite
+from admission import AdmissionController, AdmissionRejected, client_key
+
+
+def test_client_key_uses_the_hop_added_by_the_proxy():
+    assert client_key("1.2.3.4, 203.0.113.7", "10.0.0.1") == "203.0.113.7"
+    assert client_key("spoof, 1.2.3.4, 203.0.113.7", "10.0.0.1", trusted_proxies=2) == "1.2.3.4"
+    assert client_key("203.0.113.7", "10.0.0.1", trusted_proxies=2) == "203.0.113.7"
+    assert client_key("", "10.0.0.1") == "10.0.0.1"
+    assert client_key("1.2.3.4", "10.0.0.1", trusted_proxies=0) == "10.0.0.1"
+
+
+def test_spoofed_leading_hop_lands_in_the_same_bucket():
+    controller = AdmissionController(max_concurrent=10, rate_per_minute=60, burst=2)
+    outcomes = []
+    for n in range(3):
+        # Each request claims a different origin; Render appends the real one last
+        headers = {"X-Forwarded-For": f"10.9.8.{n}, 203.0.113.7"}
+        with app_lite.app.test_request_context("/api", method="POST", headers=headers):
+            try:
+                controller.admit(app_lite._client_id()).release()
+                outcomes.append("ok")
+            except AdmissionRejected as e:
+                outcomes.append(e.status)
+    assert outcomes == ["ok", "ok", 429]
@@ -0,0 +1,32 @@
+import numpy as np
+
+from answer_cache import SemanticAnswerCache
+
+DIM = 4
+
+
+def _vector(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i % DIM] = 1.0
+    return v
+
+
+def test_large_retrieved_chunks_count_towards_the_byte_budget():
+    cache = SemanticAnswerCache(DIM, max_entries=16, max_bytes=64 * 1024)
+    chunks = [{"id": n, "text": "x" * 10_000, "score": 0.9} for n in range(3)]  # ~30 KB per entry
+
+    for i in range(4):
+        cache.put(f"question {i}", _vector(i), "short answer", chunks)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert cache.evictions == 2
+    assert stats["bytes"] - cache._vectors.nbytes <= 64 * 1024
+    assert cache.get(_vector(3))["question"] == "question 3"
+    assert cache.get(_vector(0)) is None
+
+
+def test_entry_larger_than_the_budget_is_not_cached():
+    cache = SemanticAnswerCache(DIM, max_bytes=16 * 1024)
+    cache.put("q", _vector(0), "a", [{"id": 1, "text": "y" * 20_000, "score": 0.5}])
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,29 @@
+import os
+
+os.environ.setdefault("WARMUP", "off")
+
+import pytest
+
+import app_lite
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_lite, "BATCH_API_TOKEN", "tok")
+    return app_lite.app.test_client()
+
+
+AUTH = {"Authorization": "Bearer tok"}
+
+
+@pytest.mark.parametrize("body", [[{"question": "How do I create a PO?"}], "questions", 3])
+def test_non_object_json_body_is_rejected(client, body):
+    r = client.post("/api/batch", json=body, headers=AUTH)
+    assert r.status_code == 400
+    assert "must be an object" in r.get_json()["error"]
+
+
+def test_non_integer_options_are_rejected(client):
+    r = client.post("/api/batch", json={"questions": ["How do I create a PO?"], "top_k": "five"}, headers=AUTH)
+    assert r.status_code == 400
+    assert r.is_json
@@ -0,0 +1,40 @@
+import os
+
+os.environ.setdefault("WARMUP", "off")
+
+import pytest
+
+import app_lite
+
+
+@pytest.fixture
+def client():
+    return app_lite.app.test_client()
+
+
+@pytest.mark.parametrize("route", ["/api", "/api/stream"])
+@pytest.mark.parametrize("body, error", [
+    ([], "must be a JSON object"),
+    ("hi", "must be a JSON object"),
+    ({"question": 42}, "Question is required"),
+    ({"question": "   "}, "Question is required"),
+    ({"question": "How do I create a PO?", "top_k": "x"}, "top_k must be an integer"),
+    ({"question": "How do I create a PO?", "top_k": None}, "top_k must be an integer"),
+])
+def test_invalid_body_is_a_json_400(client, route, body, error):
+    r = client.post(route, json=body)
+    assert r.status_code == 400
+    assert error in r.get_json()["error"]
+
+
+@pytest.mark.parametrize("route", ["/api", "/api/stream"])
+def test_malformed_json_is_a_json_400(client, route):
+    r = client.post(route, data="{not json", content_type="application/json")
+    assert r.status_code == 400
+    assert r.get_json()["error"] == "Invalid JSON in request"
+
+
+def test_rejected_body_does_not_hold_an_admission_slot(client):
+    for _ in range(app_lite.ADMISSION_MAX_CONCURRENT + 1):
+        client.post("/api", json={"question": "How do I create a PO?", "top_k": "x"})
+    assert app_lite.admission.stats()["active"] == 0
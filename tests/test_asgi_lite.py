@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+
+os.environ.setdefault("WARMUP", "off")
+
+import pytest
+
+import asgi_lite
+import metrics
+
+QUESTION = json.dumps({"question": "How do I create a PO?", "debug": True}).encode()
+
+
+def _call(path, forwarded_for="203.0.113.7"):
+    """POST QUESTION to the ASGI app; returns (status, headers, body bytes)."""
+
+    async def main():
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": QUESTION, "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": "POST", "path": path, "client": ("10.0.0.1", 5000),
+                 "headers": [(b"x-forwarded-for", forwarded_for.encode())]}
+        await asgi_lite.app(scope, receive, send)
+        return messages
+
+    messages = asyncio.run(main())
+    return (messages[0]["status"], dict(messages[0]["headers"]),
+            b"".join(m.get("body", b"") for m in messages[1:]))
+
+
+@pytest.fixture
+def answered(monkeypatch):
+    """Pipeline stand-in that records a stage and some token usage like the real one."""
+
+    async def answer_structured(question, top_k=5, session_id=None):
+        with metrics.stage("embed"):
+            await asyncio.sleep(0)
+        metrics.current_usage()["calls"] = 1
+        return {"success": True, "question": question, "answer": "Open Purchase > New.", "retrieved": [],
+                "timings": metrics.end_trace(), "usage": metrics.end_usage()}
+
+    async def answer_stream(question, top_k=5, session_id=None):
+        yield {"type": "token", "text": "Open Purchase > New."}
+        out = await answer_structured(question, top_k, session_id)
+        yield dict(out, type="done")
+
+    monkeypatch.setattr(asgi_lite.pipeline, "answer_structured", answer_structured)
+    monkeypatch.setattr(asgi_lite.pipeline, "answer_stream", answer_stream)
+    monkeypatch.setattr(asgi_lite.admission, "_buckets", type(asgi_lite.admission._buckets)())
+
+
+@pytest.mark.parametrize("path", ["/api", "/api/stream"])
+def test_requests_are_traced_and_release_their_slot(answered, path):
+    status, _, body = _call(path)
+    assert status == 200
+    done = json.loads(body.decode().strip().splitlines()[-1])
+    assert "embed" in done["timings"] and done["usage"] == {"calls": 1}
+    assert asgi_lite.admission.stats()["active"] == 0
+
+
+@pytest.mark.parametrize("path", ["/api", "/api/stream"])
+def test_client_over_its_rate_gets_429(answered, monkeypatch, path):
+    monkeypatch.setattr(asgi_lite.admission, "burst", 1)
+    assert _call(path)[0] == 200
+    status, headers, body = _call(path)
+    assert status == 429 and int(headers[b"retry-after"]) >= 1
+    assert json.loads(body)["success"] is False
+    # The bucket is picked by the hop our proxy appended, not by what the client sent before it
+    assert _call(path, "198.51.100.1, 203.0.113.7")[0] == 429
+    assert _call(path, "203.0.113.7, 203.0.113.8")[0] == 200
+
+
+def test_full_server_gets_503(answered, monkeypatch):
+    monkeypatch.setattr(asgi_lite.admission, "max_concurrent", 0)
+    monkeypatch.setattr(asgi_lite.admission, "max_queue", 0)
+    status, headers, _ = _call("/api")
+    assert status == 503 and b"retry-after" in headers
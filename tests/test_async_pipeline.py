@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+
+import metrics
+import query_bot_lite as bot
+from async_pipeline import AsyncPipeline, AsyncProviderClient
+
+MESSAGES = [{"role": "user", "content": "How do I create a PO?"}]
+
+
+def _run(providers, coro_fn):
+    """Run coro_fn(pipeline) with AsyncProviderClients over the given sync providers."""
+
+    async def main():
+        pipeline = AsyncPipeline()
+        async with httpx.AsyncClient() as http:
+            pipeline.providers = [AsyncProviderClient(p, http) for p in providers]
+            return await coro_fn(pipeline)
+
+    return asyncio.run(main())
+
+
+def test_traces_are_kept_per_task():
+    async def request(name):
+        metrics.start_trace()
+        with metrics.stage(name):
+            await asyncio.sleep(0.01)
+        return metrics.end_trace()
+
+    async def main():
+        return await asyncio.gather(request("embed"), request("search"))
+
+    first, second = asyncio.run(main())
+    assert list(first) == ["embed"] and list(second) == ["search"]
+
+
+def test_async_calls_record_latency_outcome_and_usage(stub):
+    provider = stub([(200, "fast answer")]).client("async-ok")
+
+    async def ask(pipeline):
+        metrics.start_trace()
+        answer = await pipeline.complete(MESSAGES, "test")
+        streamed = "".join([t async for t in pipeline.stream(MESSAGES, "test")])
+        return answer, streamed, metrics.end_usage()
+
+    answer, streamed, usage = _run([provider], ask)
+    assert answer == "fast answer" and streamed.strip() == "fast answer"
+    assert provider.latency.count == 2 and provider.first_token.count == 1
+    assert usage == {"prompt_tokens": 14, "cached_tokens": 0, "completion_tokens": 4, "calls": 2}
+    assert 'quoteplan_provider_calls_total{outcome="ok",provider="async-ok"} 2' in metrics.render()
+
+
+def test_async_stream_is_hedged(stub, monkeypatch):
+    monkeypatch.setattr(bot, "HEDGING", True)
+    monkeypatch.setattr(bot, "HEDGE_DEFAULT_DELAY", 0.1)
+    primary = stub([(200, "slow answer")], delay=10.0).client("async-stalled")
+    backup = stub([(200, "fast answer")]).client("async-quick")
+
+    async def ask(pipeline):
+        tokens = [t async for t in pipeline.stream(MESSAGES, "test")]
+        await asyncio.sleep(0)  # let the cancelled loser unwind
+        return "".join(tokens)
+
+    assert _run([primary, backup], ask).strip() == "fast answer"
+    assert primary.breaker.state == "closed" and primary.breaker.allow()
+    rendered = metrics.render()
+    assert 'quoteplan_provider_calls_total{outcome="cancelled",provider="async-stalled"} 1' in rendered
+    assert 'quoteplan_provider_calls_total{outcome="ok",provider="async-quick"} 1' in rendered
@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+
+import chat_providers
+import metrics
+
+MESSAGES = [{"role": "user", "content": "How do I create a PO?"}]
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retryable_status_is_retried(stub, status):
+    server = stub([(status, ""), (200, "fast answer")])
+    provider = server.client("retry", max_retries=2)
+    assert provider.complete(MESSAGES) == "fast answer"
+    assert server.calls == 2
+    assert provider.breaker.state == "closed"
+
+
+def test_retries_are_bounded_and_count_as_one_failure(stub):
+    server = stub([(503, "")])
+    provider = server.client("down", max_retries=2, failure_threshold=5)
+    with pytest.raises(Exception):
+        provider.complete(MESSAGES)
+    assert server.calls == 3  # first attempt + 2 retries
+    assert provider.breaker._failures == 1
+
+
+def test_client_error_is_not_retried(stub):
+    server = stub([(400, "")])
+    provider = server.client("bad", max_retries=2)
+    with pytest.raises(Exception):
+        provider.complete(MESSAGES)
+    assert server.calls == 1
+
+
+def test_circuit_opens_after_threshold_and_closes_after_successful_probe(stub):
+    server = stub([(500, ""), (500, ""), (200, "back again")])
+    provider = server.client("flaky", max_retries=0, failure_threshold=2, reset_seconds=0.2)
+    for _ in range(2):
+        with pytest.raises(Exception):
+            provider.complete(MESSAGES)
+    assert provider.breaker.state == "open"
+
+    with pytest.raises(chat_providers.CircuitOpenError):
+        provider.complete(MESSAGES)
+    assert server.calls == 2  # open circuit: the provider is not called at all
+
+    time.sleep(0.25)
+    assert provider.breaker.state == "half-open"
+    assert provider.complete(MESSAGES) == "back again"
+    assert provider.breaker.state == "closed"
+
+
+def test_failed_probe_reopens_the_circuit(stub):
+    server = stub([(500, "")])
+    provider = server.client("dead", max_retries=0, failure_threshold=1, reset_seconds=0.2)
+    with pytest.raises(Exception):
+        provider.complete(MESSAGES)
+    time.sleep(0.25)
+    with pytest.raises(Exception):
+        provider.complete(MESSAGES)  # the half-open probe fails
+    assert provider.breaker.state == "open"
+    assert server.calls == 2
+
+
+def test_fallback_chain_uses_the_next_provider(stub):
+    primary = stub([(500, "")]).client("primary", max_retries=0)
+    backup_server = stub([(200, "backup answer")])
+    backup = backup_server.client("backup")
+    unconfigured = chat_providers.ProviderClient("none", backup_server.url, "", "m")
+
+    assert chat_providers.complete_with_fallback([unconfigured, primary, backup], MESSAGES, "test") == "backup answer"
+    assert "".join(chat_providers.stream_with_fallback([primary, backup], MESSAGES, "test")).strip() == "backup answer"
+    assert backup_server.calls == 2
+
+
+def test_fallback_chain_skips_an_open_circuit(stub):
+    primary_server = stub([(500, "")])
+    primary = primary_server.client("primary", max_retries=0, failure_threshold=1, reset_seconds=60)
+    backup = stub([(200, "backup answer")]).client("backup")
+    with pytest.raises(Exception):
+        primary.complete(MESSAGES)
+
+    assert chat_providers.complete_with_fallback([primary, backup], MESSAGES, "test") == "backup answer"
+    assert primary_server.calls == 1
+
+
+def test_fallback_chain_raises_when_exhausted(stub):
+    providers = [stub([(500, "")]).client(name, max_retries=0) for name in ("a", "b")]
+    with pytest.raises(Exception, match="All chat API options exhausted"):
+        chat_providers.complete_with_fallback(providers, MESSAGES, "test")
+
+
+def test_losing_hedge_is_closed_without_tripping_breaker(stub):
+    primary = stub([(200, "slow answer")], delay=10.0).client("stalled")
+    backup = stub([(200, "fast answer")]).client("quick")
+
+    answer = "".join(chat_providers.stream_hedged([primary, backup], MESSAGES, "test", delay=0.1))
+    assert answer.strip() == "fast answer"
+
+    # The loser's blocked read is aborted, not left running until the provider times out
+    deadline = time.monotonic() + 2.0
+    while time.monotonic() < deadline and any("_race_worker" in t.name for t in threading.enumerate()):
+        time.sleep(0.02)
+    assert not any("_race_worker" in t.name for t in threading.enumerate())
+    assert primary.breaker.allow()
+    assert 'quoteplan_provider_calls_total{outcome="cancelled",provider="stalled"} 1' in metrics.render()
+
+
+def test_half_open_lets_exactly_one_probe_through():
+    breaker = chat_providers.CircuitBreaker(failure_threshold=1, reset_seconds=0.1)
+    breaker.record_failure()
+    time.sleep(0.15)
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def caller():
+        barrier.wait()
+        results.append(breaker.allow())
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 1
+    assert breaker.state == "open"  # everyone else fails fast while the probe is out
+
+    breaker.record_failure()  # probe failed: a new cooldown, then one new probe
+    assert not breaker.allow()
+    time.sleep(0.15)
+    assert breaker.allow() and not breaker.allow()
+
+    breaker.release_probe()  # probe cancelled without a verdict
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
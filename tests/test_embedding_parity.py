@@ -0,0 +1,41 @@
+"""ONNX (fp32 and int8) vectors must match sentence-transformers; skipped without the models."""
+
+from pathlib import Path
+
+import pytest
+
+import embedding_backends as eb
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("tokenizers")
+pytest.importorskip("sentence_transformers")
+huggingface_hub = pytest.importorskip("huggingface_hub")
+
+
+@pytest.fixture(scope="module")
+def model_dir():
+    try:
+        # Never download in tests: only use a model already in the local Hugging Face cache
+        return Path(huggingface_hub.snapshot_download(eb.MODEL_NAME, local_files_only=True))
+    except Exception:
+        pytest.skip(f"{eb.MODEL_NAME} is not in the local Hugging Face cache")
+
+
+@pytest.fixture(scope="module")
+def torch_vectors(model_dir):
+    if not (model_dir / "modules.json").exists():
+        pytest.skip("sentence-transformers files are not in the local cache")
+    return eb.TorchBackend(str(model_dir)).encode(eb.PARITY_SENTENCES)
+
+
+@pytest.mark.parametrize("onnx_file", [eb.ONNX_FP32_FILE, eb.ONNX_INT8_FILE])
+def test_onnx_matches_torch(model_dir, torch_vectors, onnx_file):
+    model_path = model_dir / onnx_file
+    if not model_path.exists() or not (model_dir / "tokenizer.json").exists():
+        pytest.skip(f"{onnx_file} is not in the local cache")
+    backend = eb.OnnxBackend(model_path=str(model_path), tokenizer_path=str(model_dir / "tokenizer.json"))
+    onnx_vectors = backend.encode(eb.PARITY_SENTENCES)
+
+    assert onnx_vectors.shape == torch_vectors.shape
+    sims = (torch_vectors * onnx_vectors).sum(axis=1)
+    assert sims.min() >= 0.99, dict(zip(eb.PARITY_SENTENCES, sims.round(4)))
@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from qdrant_client import QdrantClient
+
+import ingest
+
+DIM = 8
+
+
+def _embed(texts):
+    return [[float(len(t) % 7 + 1)] * DIM for t in texts]
+
+
+class _Killed(BaseException):
+    """Stands in for the process dying (not caught like a per-document Exception)."""
+
+
+def test_revision_is_bumped_by_the_run_after_a_crash(tmp_path, monkeypatch):
+    manual = tmp_path / "manual"
+    manual.mkdir()
+    (manual / "po.md").write_text("## Purchase orders\nOpen Purchase > New and fill in the vendor.\n",
+                                  encoding="utf-8")
+    state_path = tmp_path / "state.json"
+    client = QdrantClient(":memory:")
+
+    # First run upserts the chunks, then dies before recording the new revision
+    writer = ingest.Ingestor(client, "chunks", _embed, DIM)
+    monkeypatch.setattr(writer, "bump_revision", lambda: (_ for _ in ()).throw(_Killed()))
+    with pytest.raises(_Killed):
+        ingest.ingest(manual, writer, ingest.IngestState(state_path, "chunks").load())
+    assert json.loads(state_path.read_text())["dirty"] is True
+
+    # Next run has nothing to write (checkpoint says po.md is done) but still bumps the revision
+    bumped = []
+    writer = ingest.Ingestor(client, "chunks", _embed, DIM)
+    monkeypatch.setattr(writer, "bump_revision", lambda: bumped.append(1) or "rev-2")
+    summary = ingest.ingest(manual, writer, ingest.IngestState(state_path, "chunks").load())
+    assert summary["skipped"] == 1 and summary["embedded"] == 0
+    assert bumped and summary["revision"] == "rev-2"
+    assert json.loads(state_path.read_text())["dirty"] is False
+
+    # A clean run with no changes leaves the revision alone
+    writer = ingest.Ingestor(client, "chunks", _embed, DIM)
+    monkeypatch.setattr(writer, "bump_revision", lambda: pytest.fail("unexpected revision bump"))
+    assert "revision" not in ingest.ingest(manual, writer, ingest.IngestState(state_path, "chunks").load())
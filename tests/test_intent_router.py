@@ -0,0 +1,35 @@
+import pytest
+
+from intent_router import FOLLOW_UP, GREETING, RAG, IntentRouter
+
+router = IntentRouter()
+
+
+@pytest.mark.parametrize("question", [
+    "How do I repeat a purchase order?",
+    "How to continue a project after approval?",
+    "How to simplify BOM?",
+    "simplify the BOM approval flow",
+    "Can you rephrase the vendor approval steps?",
+    "What are the steps to create a PO?",
+])
+def test_manual_questions_with_follow_up_verbs_are_retrieved(question):
+    assert router.classify(question) == RAG
+
+
+@pytest.mark.parametrize("question", [
+    "simplify",
+    "can you repeat that",
+    "rephrase it please",
+    "continue",
+    "continue karo",
+    "phir se",
+    "explain in detail",
+])
+def test_short_anaphoric_messages_are_follow_ups(question):
+    assert router.classify(question) == FOLLOW_UP
+
+
+def test_greetings():
+    assert router.classify("hello there") == GREETING
+    assert router.classify("hi, how do I create a BOM?") == RAG
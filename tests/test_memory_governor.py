@@ -0,0 +1,34 @@
+import memory_governor
+from memory_governor import MemoryGovernor
+
+MB = 1024 * 1024
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rss_stuck_above_hard_limit_is_rate_limited(monkeypatch):
+    clock = _Clock()
+    collections = []
+    monkeypatch.setattr(memory_governor.time, "monotonic", clock)
+    monkeypatch.setattr(memory_governor.gc, "collect", lambda *a: collections.append(1) or 0)
+    # The resident model keeps RSS at 95% of the budget whatever is collected or shrunk
+    governor = MemoryGovernor(100 * MB, rss=lambda: 95 * MB, check_interval=1.0,
+                              collect_interval=30.0, shrink_interval=300.0)
+    shrinks = []
+    governor.add_shrinker("cache", lambda: shrinks.append(clock.now))
+
+    actions = []
+    for _ in range(600):  # one request per second for ten minutes
+        actions.append(governor.check())
+        clock.now += 1.0
+
+    assert actions[0] == "shrink"
+    assert shrinks == [1000.0, 1300.0]
+    assert actions.count("collect") + actions.count("shrink") == 20  # once per collect_interval
+    assert len(collections) == 22  # one per action, plus the post-shrink collection
@@ -0,0 +1,18 @@
+import os
+
+os.environ.setdefault("WARMUP", "off")
+
+import query_bot_lite as bot
+
+
+def test_known_variant_is_used(monkeypatch):
+    monkeypatch.setenv("RAG_PROMPT_VARIANT", " Compact ")
+    assert bot._prompt_variant("RAG_PROMPT_VARIANT", "full") == "compact"
+
+
+def test_unknown_variant_falls_back(monkeypatch, capsys):
+    monkeypatch.setenv("RAG_PROMPT_VARIANT", "compcat")
+    assert bot._prompt_variant("RAG_PROMPT_VARIANT", "full") == "full"
+    assert "unknown RAG_PROMPT_VARIANT='compcat'" in capsys.readouterr().out
+    monkeypatch.setenv("FOLLOWUP_PROMPT_VARIANT", "short")
+    assert bot._prompt_variant("FOLLOWUP_PROMPT_VARIANT", "followup") == "followup"
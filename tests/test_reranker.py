@@ -0,0 +1,56 @@
+import threading
+import time
+
+import numpy as np
+
+from reranker import Reranker
+
+
+class _SlowModel:
+    """Scores by text length after `delay` seconds."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def score(self, query, texts):
+        time.sleep(self.delay)
+        return np.array([len(t) for t in texts], dtype=np.float32)
+
+
+CHUNKS = [{"text": "a"}, {"text": "ccc"}, {"text": "bb"}]
+
+
+def _rerank_concurrently(reranker, n):
+    outcomes = []
+    threads = [threading.Thread(target=lambda: outcomes.append(reranker.rerank("q", CHUNKS, top_k=2)[1]))
+               for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sorted(outcomes)
+
+
+def test_concurrent_requests_each_get_a_worker():
+    reranker = Reranker(loader=lambda: _SlowModel(0.05), budget_ms=500, keep=2, workers=2)
+    reranker.warm()
+    assert _rerank_concurrently(reranker, 2) == ["reranked", "reranked"]
+    chunks, outcome = reranker.rerank("q", CHUNKS, top_k=2)
+    assert outcome == "reranked" and [c["text"] for c in chunks] == ["ccc", "bb"]
+
+
+def test_request_waits_for_a_worker_within_budget():
+    # One worker, two requests: the second queues briefly instead of skipping
+    reranker = Reranker(loader=lambda: _SlowModel(0.05), budget_ms=500, keep=2, workers=1)
+    reranker.warm()
+    assert _rerank_concurrently(reranker, 2) == ["reranked", "reranked"]
+
+
+def test_busy_when_workers_outlast_the_budget():
+    reranker = Reranker(loader=lambda: _SlowModel(0.0), budget_ms=50, keep=2, workers=1)
+    reranker.warm()
+    reranker.model.delay = 0.3
+    assert _rerank_concurrently(reranker, 2) == ["busy", "timeout"]
+    chunks, _ = reranker.rerank("q", CHUNKS, top_k=2)
+    assert [c["text"] for c in chunks] == ["a", "ccc"]  # vector order kept
+    assert reranker.stats()["busy"] >= 1
@@ -0,0 +1,27 @@
+import os
+
+os.environ.setdefault("WARMUP", "off")
+
+import query_bot_lite as bot
+import session_memory
+
+
+def test_invalid_ids_have_no_session():
+    for value in (None, "", "   ", 42, "x" * 65, "bad id!"):
+        assert session_memory.normalize_session_id(value) is None
+    assert session_memory.normalize_session_id(" abc-123_X ") == "abc-123_X"
+
+
+def test_anonymous_requests_do_not_share_state():
+    bot._remember(None, "How do I create a PO?", "secret answer for user A")
+    bot._remember("", "How do I create a BOM?", "secret answer for user B")
+    assert bot._previous_answer(None) is None
+    assert bot._previous_answer("") is None
+    assert bot._previous_answer("not a valid id!") is None
+
+
+def test_named_sessions_are_isolated():
+    bot._remember("session-a", "q", "answer a")
+    bot._remember("session-b", "q", "answer b")
+    assert bot._previous_answer("session-a") == "answer a"
+    assert bot._previous_answer("session-b") == "answer b"
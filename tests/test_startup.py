@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+BENCH_DIR = BACKEND_DIR.parent / "benchmarks"
+
+# Must load on first use, not when the web app is imported (see benchmarks/bench_import.py)
+HEAVY_MODULES = ["torch", "sentence_transformers", "onnxruntime", "tokenizers", "qdrant_client", "requests", "httpx"]
+
+
+# Prefix for _run: counts embedding model loads and serves a stub model (no download, no torch)
+STUB_MODEL = """
+import json, sys
+import embedding_backends
+from stubs import StubEmbedder
+loads = []
+embedding_backends.load_backend = lambda name=None: loads.append(name) or StubEmbedder()
+"""
+
+# Nothing listens here: warm-up connection steps fail fast instead of waiting on a real Qdrant
+OFFLINE = {"QDRANT_HOST": "http://127.0.0.1:9", "OPENAI_API_KEY": "", "OPENROUTER_API_KEY": ""}
+
+
+def _run(code, **env):
+    """Run code in a fresh interpreter next to the backend modules; returns its last stdout line as JSON."""
+    path = os.pathsep.join([str(BACKEND_DIR), str(BENCH_DIR)])
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+                          env=dict(os.environ, PYTHONPATH=path, **env), timeout=120)
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_app_loads_no_heavy_modules():
+    loaded = _run(
+        "import json, sys, app_lite; "
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))",
+        WARMUP="off",
+    )
+    assert loaded == []
+
+
+def test_gunicorn_config_defers_preload_until_the_port_is_bound():
+    before, after = _run(STUB_MODEL + """
+import runpy
+hooks = runpy.run_path("gunicorn.conf.py")  # what gunicorn -c does before importing the app
+import app_lite, query_bot_lite
+before = {"ready": query_bot_lite.readiness()["ready"], "loads": len(loads)}
+hooks["when_ready"](None)  # gunicorn: listening socket created, workers not forked yet
+print(json.dumps([before, {"ready": query_bot_lite.readiness()["ready"], "loads": len(loads)}]))
+""", WARMUP="preload", **OFFLINE)
+    assert before == {"ready": False, "loads": 0}
+    assert after == {"ready": True, "loads": 1}
+
+
+def test_preload_warms_the_model_before_the_first_request():
+    state = _run(STUB_MODEL + """
+import app_lite, query_bot_lite
+ready = app_lite.app.test_client().get("/ready").status_code
+query_bot_lite.embed_text("How do I create a PO?")  # first request's embedding: no load left to pay
+print(json.dumps({"ready": ready, "loads": len(loads)}))
+""", WARMUP="preload", **OFFLINE)
+    assert state == {"ready": 200, "loads": 1}
+
+
+def test_off_stays_lazy_until_the_first_request():
+    state = _run(STUB_MODEL + """
+import app_lite, query_bot_lite
+at_import = len(loads)
+query_bot_lite.embed_text("How do I create a PO?")
+print(json.dumps({"ready": query_bot_lite.readiness()["ready"], "at_import": at_import, "loads": len(loads)}))
+""", WARMUP="off", **OFFLINE)
+    assert state == {"ready": True, "at_import": 0, "loads": 1}
+
+
+def test_background_warmup_reports_not_ready_until_warm():
+    statuses = _run(STUB_MODEL + """
+import time
+slow = embedding_backends.load_backend
+def load(name=None):
+    time.sleep(0.5)  # model load in progress
+    return slow(name)
+embedding_backends.load_backend = load
+import app_lite
+client = app_lite.app.test_client()
+statuses = [client.get("/ready").status_code]
+deadline = time.time() + 30
+while statuses[-1] != 200 and time.time() < deadline:
+    time.sleep(0.05)
+    statuses.append(client.get("/ready").status_code)
+print(json.dumps(sorted(set(statuses))))
+""", WARMUP="background", **OFFLINE)
+    assert statuses == [200, 503]